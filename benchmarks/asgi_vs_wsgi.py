@@ -0,0 +1,205 @@
+"""
+Compares the sync views under gunicorn WSGI workers with the async views
+under gunicorn uvicorn (ASGI) workers on a synthetic fleet. Every server
+gets the same number of workers, fast clients request the detail and list
+pages in a loop while slow clients keep connections busy by sending their
+requests byte by byte.
+
+Usage: python -m benchmarks.asgi_vs_wsgi [--workers N] [--clients N]
+       [--slow-clients N] [--duration SECONDS] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from benchmarks.common import (
+    HOST,
+    create_fleet,
+    get_free_port,
+    migrate,
+    setup_django,
+    start_gunicorn,
+)
+
+
+SERVERS = {
+    'wsgi': {
+        'application': 'vehicle_scheduler.wsgi:application',
+        'worker_class': 'sync',
+        'async_views': '0',
+    },
+    'asgi': {
+        'application': 'vehicle_scheduler.asgi:application',
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'async_views': '1',
+    },
+}
+
+
+def prepare_database(options) -> tuple[str, list[str]]:
+    """
+    Returns the session cookie of the benchmark user and the paths of the
+    requested pages.
+    """
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+
+    from maintenance.models import Vehicle
+
+    migrate()
+    create_fleet(options.owners, options.vehicles, options.years,
+                 options.seed)
+    user = User.objects.get(username='benchmark_0')
+    client = Client()
+    client.force_login(user)
+    vin_code = Vehicle.objects.filter(owner=user).order_by('pk').first() \
+        .vin_code
+    paths = [
+        reverse('index'),
+        reverse('vehicle_detail', args=[vin_code]),
+        reverse('events_list', args=[vin_code]),
+        reverse('mileage_events_list', args=[vin_code]),
+    ]
+    return client.cookies['sessionid'].value, paths
+
+
+def start_server(name: str, port: int, database: str,
+                 workers: int) -> subprocess.Popen:
+    server = SERVERS[name]
+    return start_gunicorn(
+        server['application'], port, workers, server['worker_class'],
+        environment={
+            'DB_NAME': database,
+            'ASYNC_VIEWS': server['async_views'],
+        },
+    )
+
+
+def build_request(path: str, session: str) -> bytes:
+    return (
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {HOST}\r\n'
+        f'Cookie: sessionid={session}\r\n'
+        'Connection: close\r\n\r\n'
+    ).encode()
+
+
+async def send_request(port: int, request: bytes,
+                       byte_delay: float = 0.0) -> int:
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        if byte_delay:
+            for byte in request:
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(byte_delay)
+        else:
+            writer.write(request)
+            await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run_fast_client(port: int, requests: list[bytes],
+                          deadline: float, latencies: list[float],
+                          errors: list[int]) -> None:
+    index = 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await send_request(port, requests[index % len(requests)])
+        except OSError:
+            status = 0
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(status)
+        index += 1
+
+
+async def run_slow_client(port: int, request: bytes, deadline: float,
+                          byte_delay: float) -> None:
+    while time.monotonic() < deadline:
+        try:
+            await send_request(port, request, byte_delay)
+        except OSError:
+            await asyncio.sleep(byte_delay)
+
+
+async def run_load(port: int, requests: list[bytes], options) -> dict:
+    latencies: list[float] = []
+    errors: list[int] = []
+    deadline = time.monotonic() + options.duration
+    await asyncio.gather(
+        *(
+            run_slow_client(port, requests[0], deadline, options.byte_delay)
+            for _ in range(options.slow_clients)
+        ),
+        *(
+            run_fast_client(port, requests, deadline, latencies, errors)
+            for _ in range(options.clients)
+        ),
+    )
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / options.duration, 2),
+        'median_ms': round(statistics.median(latencies) * 1000, 2)
+        if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2)
+        if latencies else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--owners', type=int, default=5)
+    parser.add_argument('--vehicles', type=int, default=20,
+                        help='Number of vehicles of every owner.')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8,
+                        help='Number of concurrent fast clients.')
+    parser.add_argument('--slow-clients', type=int, default=0)
+    parser.add_argument('--byte-delay', type=float, default=0.01,
+                        help='Delay of the slow clients between bytes.')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--output', help='Path of the JSON results.')
+    options = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'benchmark.sqlite3')
+        setup_django(database)
+        session, paths = prepare_database(options)
+        requests = [build_request(path, session) for path in paths]
+        for name in SERVERS:
+            port = get_free_port()
+            server = start_server(name, port, database, options.workers)
+            try:
+                results[name] = asyncio.run(run_load(port, requests,
+                                                     options))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f'{name}: {json.dumps(results[name])}')
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output:
+            json.dump({'options': vars(options), 'results': results},
+                      output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
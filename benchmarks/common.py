@@ -0,0 +1,84 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import django
+
+
+HOST = '127.0.0.1'
+
+
+def setup_django(database_name: str) -> None:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                          'vehicle_scheduler.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['DB_NAME'] = database_name
+    django.setup()
+
+
+def migrate(target: tuple[str, str] | None = None) -> None:
+    """
+    Migrates all applications to their latest migrations, the maintenance
+    application is migrated to the target when it is given.
+    """
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    targets = executor.loader.graph.leaf_nodes()
+    if target:
+        targets = [node for node in targets if node[0] != target[0]]
+        targets.append(target)
+    executor.migrate(targets)
+
+
+def create_fleet(owners: int, vehicles: int, years: int, seed: int = 0):
+    from maintenance.services.synthetic import SyntheticFleetGenerator
+
+    return SyntheticFleetGenerator(
+        owners=owners, vehicles_per_owner=vehicles, years=years, seed=seed,
+        prefix='benchmark',
+    ).generate()
+
+
+def get_free_port() -> int:
+    with socket.socket() as server_socket:
+        server_socket.bind((HOST, 0))
+        return server_socket.getsockname()[1]
+
+
+def start_gunicorn(application: str, port: int, workers: int,
+                   worker_class: str = 'sync',
+                   environment: dict[str, str] | None = None,
+                   stderr=None) -> subprocess.Popen:
+    """
+    Starts gunicorn with the project settings and the given environment
+    and waits until it accepts connections.
+    """
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', application,
+            '--bind', f'{HOST}:{port}', '--workers', str(workers),
+            '--worker-class', worker_class,
+            '--log-level', 'warning',
+        ],
+        env={
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'vehicle_scheduler.settings',
+            'ALLOWED_HOSTS': HOST,
+            'REQUEST_LOG_LEVEL': 'WARNING',
+            **(environment or {}),
+        },
+        stderr=stderr,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{application} server did not start')
@@ -0,0 +1,245 @@
+"""
+Runs concurrent writers against gunicorn sync workers on SQLite, first
+with the SQLite defaults and then with the tuned profile (WAL, IMMEDIATE
+transactions, busy timeout, persistent connections). The clients post
+event forms, whose due state update reads before writing in one
+transaction, and telematics readings batches. Failed requests and the
+"database is locked" errors in the server log are counted.
+
+Usage: python -m benchmarks.concurrent_writers [--workers N]
+       [--clients N] [--duration SECONDS] [--output results.json]
+"""
+import argparse
+import http.client
+import http.cookies
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    HOST,
+    create_fleet,
+    get_free_port,
+    migrate,
+    setup_django,
+    start_gunicorn,
+)
+
+
+PROFILES = {
+    'default': {'SQLITE_TUNING': '0', 'DB_CONN_MAX_AGE': '0'},
+    'tuned': {},
+}
+READINGS_BATCH_SIZE = 50
+
+
+def prepare_database(
+    options,
+) -> tuple[str, str, list[tuple[str, int, int]]]:
+    """
+    Returns the session cookie and the API key of the benchmark user and
+    the VIN, vehicle and work ids of the works of the user.
+    """
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from maintenance.models import ApiToken, Work
+
+    migrate()
+    create_fleet(options.owners, options.vehicles, years=1)
+    user = User.objects.get(username='benchmark_0')
+    client = Client()
+    client.force_login(user)
+    _, api_key = ApiToken.create_token(user, 'benchmark')
+    works = list(
+        Work.objects.filter(vehicle__owner=user)
+        .values_list('vehicle__vin_code', 'vehicle_id', 'pk')
+    )
+    return client.cookies['sessionid'].value, api_key, works
+
+
+class WriterClient:
+    def __init__(self, port: int, session: str, api_key: str,
+                 works: list[tuple[str, int, int]], seed: int) -> None:
+        self.port = port
+        self.session = session
+        self.api_key = api_key
+        self.works = works
+        self.random = random.Random(seed)
+        self.csrf_token: str | None = None
+        self.mileage = 1000000
+
+    def request(self, method: str, path: str, body: str | None,
+                headers: dict[str, str]) -> http.client.HTTPResponse | None:
+        connection = http.client.HTTPConnection(HOST, self.port, timeout=60)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response
+        except OSError:
+            return None
+        finally:
+            connection.close()
+
+    def get_csrf_token(self, path: str) -> str | None:
+        """
+        Returns the CSRF cookie which the event form page sets.
+        """
+        if self.csrf_token is not None:
+            return self.csrf_token
+        response = self.request(
+            'GET', path, None, {'Cookie': f'sessionid={self.session}'}
+        )
+        if response is None:
+            return None
+        cookies: http.cookies.SimpleCookie = http.cookies.SimpleCookie()
+        for header in response.msg.get_all('Set-Cookie') or []:
+            cookies.load(header)
+        if 'csrftoken' in cookies:
+            self.csrf_token = cookies['csrftoken'].value
+        return self.csrf_token
+
+    def post_event(self) -> int:
+        vin_code, vehicle_id, work_id = self.random.choice(self.works)
+        path = f'/add_event/{vin_code}/'
+        csrf_token = self.get_csrf_token(path)
+        if csrf_token is None:
+            return 0
+        self.mileage += 10
+        response = self.request(
+            'POST',
+            path,
+            urllib.parse.urlencode({
+                'vehicle': vehicle_id,
+                'work': work_id,
+                'work_date': '2024-01-01',
+                'mileage': self.mileage,
+                'part_price': 0,
+                'work_price': 0,
+            }),
+            {
+                'Cookie': f'sessionid={self.session}; '
+                          f'csrftoken={csrf_token}',
+                'X-CSRFToken': csrf_token,
+                'Content-Type': 'application/x-www-form-urlencoded',
+            },
+        )
+        return response.status if response else 0
+
+    def post_readings(self) -> int:
+        self.mileage += 10
+        response = self.request(
+            'POST',
+            '/api/telematics/',
+            json.dumps([
+                {
+                    'vin_code': self.random.choice(self.works)[0],
+                    'mileage': self.mileage,
+                }
+                for _ in range(READINGS_BATCH_SIZE)
+            ]),
+            {
+                'Authorization': f'Token {self.api_key}',
+                'Content-Type': 'application/json',
+            },
+        )
+        return response.status if response else 0
+
+
+def run_writers(port: int, session: str, api_key: str, works,
+                options) -> dict:
+    statuses: dict[int, int] = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + options.duration
+
+    def run_client(seed: int) -> None:
+        client = WriterClient(port, session, api_key, works, seed)
+        while time.monotonic() < deadline:
+            if client.random.random() < 0.5:
+                status = client.post_event()
+            else:
+                status = client.post_readings()
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=options.clients) as executor:
+        list(executor.map(run_client, range(options.clients)))
+    requests_number = sum(statuses.values())
+    failed = sum(
+        number for status, number in statuses.items()
+        if status == 0 or status >= 400
+    )
+    return {
+        'requests': requests_number,
+        'failed': failed,
+        'requests_per_second': round(requests_number / options.duration, 2),
+        'statuses': {str(status): number
+                     for status, number in sorted(statuses.items())},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--owners', type=int, default=2)
+    parser.add_argument('--vehicles', type=int, default=10,
+                        help='Number of vehicles of every owner.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--output', help='Path of the JSON results.')
+    options = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # The database is created in the rollback journal mode, every
+        # profile gets its own copy, the tuned one switches it to WAL.
+        database = os.path.join(directory, 'benchmark.sqlite3')
+        os.environ.update(PROFILES['default'])
+        setup_django(database)
+        session, api_key, works = prepare_database(options)
+        from django.db import connections
+
+        connections.close_all()
+        for name, environment in PROFILES.items():
+            profile_database = os.path.join(directory, f'{name}.sqlite3')
+            shutil.copy(database, profile_database)
+            log_path = os.path.join(directory, f'{name}.log')
+            port = get_free_port()
+            with open(log_path, 'w+', encoding='utf-8') as log:
+                server = start_gunicorn(
+                    'vehicle_scheduler.wsgi:application', port,
+                    options.workers,
+                    environment={
+                        'SQLITE_TUNING': '1',
+                        **environment,
+                        'DB_NAME': profile_database,
+                    },
+                    stderr=log,
+                )
+                try:
+                    results[name] = run_writers(port, session, api_key,
+                                                works, options)
+                finally:
+                    server.terminate()
+                    server.wait()
+                log.seek(0)
+                results[name]['database_locked'] = log.read().count(
+                    'database is locked'
+                )
+            print(f'{name}: {json.dumps(results[name])}')
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output:
+            json.dump({'options': vars(options), 'results': results},
+                      output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Measures the multi-year maintenance plan of a synthetic fleet: loading the
+works, projecting them over arrays, and projecting them step by step with
+relativedelta for comparison. Both projections must give the same monthly
+totals.
+
+Usage: python -m benchmarks.projection [--owners N] [--vehicles N]
+       [--plan-years N]
+"""
+import argparse
+import datetime
+import math
+import os
+import tempfile
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from benchmarks.common import create_fleet, migrate, setup_django
+
+
+def project_by_steps(plan_works, start_date: datetime.date,
+                     end_date: datetime.date) -> dict[datetime.date, int]:
+    """
+    Projects the works by a date object per occurrence, returns the number
+    of occurrences of every month.
+    """
+    from maintenance.services.projection import AVERAGE_MONTH_DAYS
+
+    totals: dict[datetime.date, int] = {}
+    for index in range(len(plan_works.work_ids)):
+        interval_months = int(plan_works.interval_months[index])
+        mileage_rate = plan_works.mileage_rates[index]
+        first = math.inf
+        step_days = math.inf
+        if plan_works.interval_km[index] > 0 and mileage_rate > 0:
+            step_days = plan_works.interval_km[index] / mileage_rate
+            if not math.isnan(plan_works.planed_mileages[index]):
+                first = plan_works.update_dates[index] + math.ceil(round(
+                    (plan_works.planed_mileages[index]
+                     - plan_works.vehicle_mileages[index]) / mileage_rate, 6
+                ))
+        if interval_months and not math.isnan(plan_works.planed_dates[index]):
+            first = min(first, plan_works.planed_dates[index])
+        if math.isinf(first):
+            continue
+        first_date = max(datetime.date.fromordinal(int(first)), start_date)
+        by_months = bool(interval_months) and (
+            interval_months * AVERAGE_MONTH_DAYS <= step_days
+        )
+        step_days = max(step_days, 1)
+        step = 0
+        while True:
+            if by_months:
+                date = first_date + relativedelta(
+                    months=step * interval_months
+                )
+            else:
+                date = first_date + datetime.timedelta(
+                    days=math.ceil(round(step * step_days, 6))
+                )
+            if date > end_date:
+                break
+            month = date.replace(day=1)
+            totals[month] = totals.get(month, 0) + 1
+            step += 1
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--owners', type=int, default=10)
+    parser.add_argument('--vehicles', type=int, default=100,
+                        help='Number of vehicles of every owner.')
+    parser.add_argument('--years', type=int, default=2,
+                        help='Years of the generated history.')
+    parser.add_argument('--plan-years', type=int, default=10)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+        from django.utils import timezone
+
+        from maintenance.models import Vehicle
+        from maintenance.services.projection import (
+            load_plan_works,
+            project_plan,
+        )
+
+        migrate()
+        create_fleet(options.owners, options.vehicles, options.years)
+        start_date = timezone.now().date()
+        end_date = (
+            start_date + relativedelta(years=options.plan_years)
+            - datetime.timedelta(days=1)
+        )
+
+        started = time.perf_counter()
+        plan_works = load_plan_works(Vehicle.objects.all(), start_date)
+        load_duration = time.perf_counter() - started
+        started = time.perf_counter()
+        plan = project_plan(plan_works, start_date, end_date)
+        monthly_totals = plan.get_monthly_totals()
+        arrays_duration = time.perf_counter() - started
+        started = time.perf_counter()
+        step_totals = project_by_steps(plan_works, start_date, end_date)
+        steps_duration = time.perf_counter() - started
+
+    mismatched_months = sum(
+        monthly_total.occurrences != step_totals.get(monthly_total.month, 0)
+        for monthly_total in monthly_totals
+    )
+    print(f'Vehicles: {options.owners * options.vehicles}, '
+          f'works: {len(plan_works.work_ids)}, '
+          f'occurrences: {len(plan)} in {options.plan_years} years')
+    print(f'Load: {load_duration:.2f} s, arrays: {arrays_duration:.3f} s, '
+          f'steps: {steps_duration:.3f} s')
+    print(f'Months with different totals: {mismatched_months}')
+    if mismatched_months:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
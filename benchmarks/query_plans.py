@@ -0,0 +1,102 @@
+"""
+Shows SQLite query plans of the schedule and list queries before and
+after the 0004_schedule_indexes migration on a synthetic fleet.
+
+Usage: python -m benchmarks.query_plans [--owners N] [--vehicles N]
+       [--years N] [--seed N]
+"""
+import argparse
+import importlib
+import os
+import tempfile
+import time
+
+from benchmarks.common import create_fleet, migrate, setup_django
+
+
+INDEXES_MIGRATION = 'maintenance.migrations.0004_schedule_indexes'
+
+
+def set_schedule_indexes(enabled: bool) -> None:
+    """
+    Removes or adds back the indexes of the 0004_schedule_indexes migration,
+    the rest of the schema stays at the latest migration.
+    """
+    from django.apps import apps
+    from django.db import connection
+
+    migration = importlib.import_module(INDEXES_MIGRATION).Migration
+    with connection.schema_editor() as schema_editor:
+        for operation in migration.operations:
+            model = apps.get_model('maintenance', operation.model_name)
+            if enabled:
+                schema_editor.add_index(model, operation.index)
+            else:
+                schema_editor.remove_index(model, operation.index)
+
+
+def get_queries() -> dict:
+    from maintenance.models import Event, MileageEvent, Vehicle, Work
+    from maintenance.services.maintenance import (
+        annotate_due_states,
+        annotate_last_events,
+    )
+
+    vehicle = Vehicle.objects.order_by('pk').last()
+    work = Work.objects.filter(vehicle=vehicle).first()
+    maintenance_works = Work.objects.filter(
+        vehicle=vehicle, work_type=Work.WorkType.MAINTENANCE
+    )
+    return {
+        'schedule (due states)': annotate_due_states(maintenance_works),
+        'schedule (events history)': annotate_last_events(
+            maintenance_works
+        ),
+        'events list': Event.objects.filter(
+            vehicle=vehicle
+        ).order_by('-work_date', '-pk')[:51],
+        'events by type': Event.objects.filter(
+            work=work
+        ).order_by('-work_date', '-pk')[:51],
+        'mileage list': MileageEvent.objects.filter(
+            vehicle=vehicle
+        ).order_by('-mileage_date', '-pk')[:51],
+    }
+
+
+def explain_queries(repeat: int) -> None:
+    for name, queryset in get_queries().items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        print(f'-- {name}: {elapsed:.2f} ms')
+        print(queryset.explain())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--owners', type=int, default=20)
+    parser.add_argument('--vehicles', type=int, default=10,
+                        help='Number of vehicles of every owner.')
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+        migrate()
+        create_fleet(options.owners, options.vehicles, options.years,
+                     options.seed)
+
+        set_schedule_indexes(False)
+        print('=== Before indexes ===')
+        explain_queries(options.repeat)
+        set_schedule_indexes(True)
+        print('=== After indexes ===')
+        explain_queries(options.repeat)
+
+
+if __name__ == '__main__':
+    main()
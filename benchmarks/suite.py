@@ -0,0 +1,390 @@
+"""
+Benchmarks every route of maintenance/urls.py and the schedule services on
+a synthetic fleet. Every benchmark has a budget of SQL queries, the suite
+fails when a budget is exceeded or a route has no budget.
+
+Usage: python -m benchmarks.suite [--owners N] [--vehicles N] [--years N]
+       [--seed N] [--repeat N] [--output results.json]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+from urllib.parse import urlencode
+
+from benchmarks.common import create_fleet, migrate, setup_django
+
+
+BENCHMARK_USERNAME = 'benchmark_0'
+
+# Query budgets of the cold (empty cache) requests of the routes on the
+# default fleet. The list pages do not depend on the number of rendered
+# rows. The telematics readings of ten vehicles cost an UPDATE per vehicle.
+ROUTE_BUDGETS = {
+    'index': 2,
+    'login': 0,
+    'fleet_dashboard': 6,
+    'add_vehicle': 2,
+    'vehicle_detail': 7,
+    'edit_vehicle': 3,
+    'delete_vehicle': 3,
+    'add_work': 3,
+    'edit_work': 3,
+    'delete_work': 3,
+    'list_of_works': 3,
+    'work_detail': 7,
+    'add_event': 5,
+    'add_current_event': 6,
+    'edit_event': 5,
+    'delete_event': 3,
+    'events_list': 2,
+    'event_detail': 4,
+    'event_by_type': 5,
+    'add_mileage': 4,
+    'edit_mileage': 4,
+    'delete_mileage': 3,
+    'mileage_events_list': 4,
+    'schedule_cache_stats': 1,
+    'api_vehicle_schedule': 4,
+    'api_maintenance_plan': 3,
+    'api_vehicle_maintenance_plan': 4,
+    'calendar_feed': 3,
+    'vehicle_calendar_feed': 3,
+    'api_onboard_vehicles': 4,
+    'api_telematics_readings': 13,
+    'api_vehicle_choices': 1,
+    'api_work_choices': 1,
+    'export_history': 4,
+    'export_vehicle_history': 4,
+}
+
+SERVICE_BUDGETS = {
+    'get_vehicle_maintenance_limits': 3,
+    'get_fleet_maintenance_limits': 3,
+    'get_fleet_expired_events': 2,
+    'get_outdate_mileage_level': 2,
+    'fit_mileage_rates': 1,
+    'get_works_statistics': 1,
+    'iter_history_records': 4,
+}
+
+
+class QueryCounter:
+    """
+    Database execute wrapper, unlike the queries log it keeps counting
+    when the request handler closes the connection.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(function: Callable[[], object], repeat: int) -> dict:
+    """
+    Runs the function once against the empty cache and then repeatedly,
+    returns timings in milliseconds and the cold run query count.
+    """
+    from django.core.cache import cache
+    from django.db import connection
+
+    cache.clear()
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        started = time.perf_counter()
+        result = function()
+        cold_time = time.perf_counter() - started
+    warm_times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        warm_times.append(time.perf_counter() - started)
+    return {
+        'result': result,
+        'cold_ms': round(cold_time * 1000, 3),
+        'warm_ms': (
+            round(statistics.median(warm_times) * 1000, 3)
+            if warm_times else None
+        ),
+        'queries': queries.count,
+    }
+
+
+def get_route_kwargs() -> dict[str, dict]:
+    from maintenance.models import Event, MileageEvent, Vehicle
+    from maintenance.services.calendar_feed import get_calendar_token
+
+    vehicle = Vehicle.objects.filter(
+        owner__username=BENCHMARK_USERNAME
+    ).order_by('pk').first()
+    work = vehicle.works_list.order_by('pk').first()
+    event = Event.objects.filter(vehicle=vehicle).order_by('pk').first()
+    mileage_event = MileageEvent.objects.filter(
+        vehicle=vehicle
+    ).order_by('pk').first()
+    return {
+        'vin_code': {'vin_code': vehicle.vin_code},
+        'vehicle': {'pk': vehicle.pk},
+        'work': {'pk': work.pk},
+        'current_work': {'vin_code': vehicle.vin_code, 'work_id': work.pk},
+        'event': {'pk': event.pk},
+        'mileage': {'pk': mileage_event.pk},
+        'export': {'export_format': 'csv'},
+        'vehicle_export': {
+            'export_format': 'csv', 'vin_code': vehicle.vin_code
+        },
+        'calendar': {'token': get_calendar_token(vehicle.owner_id)},
+        'vehicle_calendar': {
+            'token': get_calendar_token(vehicle.owner_id),
+            'vin_code': vehicle.vin_code,
+        },
+        'vehicle_choices': {'q': vehicle.vin_code[:3]},
+        'work_choices': {'vehicle': vehicle.pk, 'q': work.title[:1]},
+    }
+
+
+ROUTE_KWARGS = {
+    'vehicle_detail': 'vin_code',
+    'edit_vehicle': 'vehicle',
+    'delete_vehicle': 'vehicle',
+    'add_work': 'vin_code',
+    'edit_work': 'work',
+    'delete_work': 'work',
+    'list_of_works': 'vin_code',
+    'work_detail': 'work',
+    'add_event': 'vin_code',
+    'add_current_event': 'current_work',
+    'edit_event': 'event',
+    'delete_event': 'event',
+    'events_list': 'vin_code',
+    'event_detail': 'event',
+    'event_by_type': 'work',
+    'add_mileage': 'vin_code',
+    'edit_mileage': 'mileage',
+    'delete_mileage': 'mileage',
+    'mileage_events_list': 'vin_code',
+    'api_vehicle_schedule': 'vin_code',
+    'api_vehicle_maintenance_plan': 'vin_code',
+    'calendar_feed': 'calendar',
+    'vehicle_calendar_feed': 'vehicle_calendar',
+    'export_history': 'export',
+    'export_vehicle_history': 'vehicle_export',
+}
+
+# Query strings of the routes, samples by the same keys.
+ROUTE_QUERIES = {
+    'api_vehicle_choices': 'vehicle_choices',
+    'api_work_choices': 'work_choices',
+}
+
+
+ONBOARD_VIN_PREFIX = 'ONBOARD'
+
+
+# JSON bodies of the routes benchmarked by POST requests. The warm
+# requests of the onboarding repeat the cold one, so they only find the
+# existing vehicles. The readings go to the onboarded vehicles, which are
+# removed with them after the routes.
+ROUTE_PAYLOADS = {
+    'api_onboard_vehicles': [
+        {
+            'vin_code': f'{ONBOARD_VIN_PREFIX}{number:010}',
+            'vehicle_manufacturer': 'Kia',
+            'vehicle_model': 'Rio',
+            'vehicle_body': 'Hatchback',
+            'vehicle_year': 2020,
+            'vehicle_mileage': 0,
+        }
+        for number in range(100)
+    ],
+    'api_telematics_readings': [
+        {
+            'vin_code': f'{ONBOARD_VIN_PREFIX}{number % 10:010}',
+            'mileage': number * 100,
+        }
+        for number in range(100)
+    ],
+}
+
+
+def get(client, path: str) -> Callable[[], int]:
+    def request() -> int:
+        response = client.get(path)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+    return request
+
+
+def post(client, path: str, payload: object,
+         authorization: str) -> Callable[[], int]:
+    def request() -> int:
+        return client.post(
+            path, payload, content_type='application/json',
+            HTTP_AUTHORIZATION=authorization,
+        ).status_code
+    return request
+
+
+def benchmark_routes(repeat: int) -> list[dict]:
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+
+    from maintenance.models import ApiToken, Vehicle
+    from maintenance.urls import urlpatterns
+
+    user = User.objects.get(username=BENCHMARK_USERNAME)
+    user.is_staff = True
+    user.save(update_fields=['is_staff'])
+    client = Client()
+    client.force_login(user)
+    # The JSON API is posted to by the machine clients with their tokens.
+    _, api_key = ApiToken.create_token(user, 'benchmark')
+    # Session and user lookups are made by every request.
+    base_queries = measure(get(client, reverse('login')), 1)['queries']
+
+    samples = get_route_kwargs()
+    results = []
+    for pattern in urlpatterns:
+        sample = ROUTE_KWARGS.get(pattern.name)
+        path = reverse(pattern.name, kwargs=samples[sample] if sample else {})
+        if pattern.name in ROUTE_QUERIES:
+            path += f'?{urlencode(samples[ROUTE_QUERIES[pattern.name]])}'
+        if pattern.name in ROUTE_PAYLOADS:
+            request = post(client, path, ROUTE_PAYLOADS[pattern.name],
+                           f'Token {api_key}')
+        else:
+            request = get(client, path)
+        measurement = measure(request, repeat)
+        status = measurement.pop('result')
+        queries = measurement['queries'] - base_queries
+        budget = ROUTE_BUDGETS.get(pattern.name)
+        results.append({
+            'name': pattern.name,
+            'path': path,
+            'status': status,
+            **measurement,
+            'queries': queries,
+            'budget': budget,
+            'passed': (
+                status < 400 and budget is not None and queries <= budget
+            ),
+        })
+    # The onboarded vehicles must not change the service benchmarks.
+    Vehicle.objects.filter(vin_code__startswith=ONBOARD_VIN_PREFIX).delete()
+    return results
+
+
+def benchmark_services(repeat: int) -> list[dict]:
+    from maintenance.models import Vehicle, Work
+    from maintenance.services.exporter import iter_history_records
+    from maintenance.services.forecast import fit_mileage_rates
+    from maintenance.services.maintenance import (
+        get_fleet_expired_events,
+        get_fleet_maintenance_limits,
+        get_outdate_mileage_level,
+        get_vehicle_maintenance_limits,
+    )
+    from maintenance.services.statistics import get_works_statistics
+
+    vehicles = Vehicle.objects.filter(owner__username=BENCHMARK_USERNAME)
+    vehicle = vehicles.order_by('pk').first()
+    vehicle_ids = list(vehicles.values_list('pk', flat=True))
+    services = {
+        'get_vehicle_maintenance_limits': lambda: (
+            get_vehicle_maintenance_limits(vehicle, forecast=True)
+        ),
+        'get_fleet_maintenance_limits': lambda: (
+            get_fleet_maintenance_limits(vehicles.all(), forecast=True)
+        ),
+        'get_fleet_expired_events': lambda: (
+            get_fleet_expired_events(vehicles.all())
+        ),
+        'get_outdate_mileage_level': lambda: (
+            get_outdate_mileage_level(vehicle.vin_code)
+        ),
+        'fit_mileage_rates': lambda: fit_mileage_rates(vehicle_ids),
+        'get_works_statistics': lambda: get_works_statistics(
+            Work.objects.filter(vehicle=vehicle)
+        ),
+        'iter_history_records': lambda: sum(
+            1 for _ in iter_history_records(vehicles.all())
+        ),
+    }
+    results = []
+    for name, function in services.items():
+        measurement = measure(function, repeat)
+        measurement.pop('result')
+        budget = SERVICE_BUDGETS.get(name)
+        results.append({
+            'name': name,
+            **measurement,
+            'budget': budget,
+            'passed': (
+                budget is not None and measurement['queries'] <= budget
+            ),
+        })
+    return results
+
+
+def print_results(title: str, results: list[dict]) -> None:
+    print(f'=== {title} ===')
+    for result in results:
+        print(
+            f'{"ok  " if result["passed"] else "FAIL"} {result["name"]:32}'
+            f' cold {result["cold_ms"]:9.2f} ms'
+            f' warm {result["warm_ms"]:9.2f} ms'
+            f' queries {result["queries"]:3}/{result["budget"]}'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--owners', type=int, default=5)
+    parser.add_argument('--vehicles', type=int, default=20,
+                        help='Number of vehicles of every owner.')
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='Path of the JSON results.')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+        from django.conf import settings
+
+        settings.ALLOWED_HOSTS = ['testserver']
+        logging.getLogger('maintenance.requests').setLevel(logging.WARNING)
+        migrate()
+        report = create_fleet(options.owners, options.vehicles,
+                              options.years, options.seed)
+        results = {
+            'fleet': vars(report),
+            'routes': benchmark_routes(options.repeat),
+            'services': benchmark_services(options.repeat),
+        }
+
+    print_results('Routes', results['routes'])
+    print_results('Services', results['services'])
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    if not all(
+        result['passed']
+        for result in results['routes'] + results['services']
+    ):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Measures the throughput of the telematics odometer ingestion by concurrent
+writer processes on a synthetic fleet and checks that no mileage update is
+lost. Every process sends batches of increasing readings of all vehicles.
+SQLITE_TUNING=0 measures the SQLite defaults.
+
+Usage: python -m benchmarks.telematics [--owners N] [--vehicles N]
+       [--workers N] [--batches N] [--batch-size N]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import create_fleet, migrate, setup_django
+
+
+def send_readings(worker: int, vin_codes: list[str], batches: int,
+                  batch_size: int) -> tuple[int, dict[str, int]]:
+    """
+    Ingests the batches of one writer, returns the number of stored
+    readings and the highest sent mileages of the vehicles.
+    """
+    from maintenance.models import Vehicle
+    from maintenance.services.telematics import ingest_readings
+
+    generator = random.Random(worker)
+    readings_number = 0
+    max_mileages: dict[str, int] = {}
+    for batch in range(batches):
+        # Mileages grow with the batch, the writers interleave them.
+        readings = [
+            (
+                generator.choice(vin_codes),
+                1000000 + batch * 1000 + generator.randint(0, 999),
+            )
+            for _ in range(batch_size)
+        ]
+        report = ingest_readings(Vehicle.objects.all(), enumerate(
+            {'vin_code': vin_code, 'mileage': mileage}
+            for vin_code, mileage in readings
+        ))
+        readings_number += report.readings_stored
+        for vin_code, mileage in readings:
+            max_mileages[vin_code] = max(
+                max_mileages.get(vin_code, 0), mileage
+            )
+    return readings_number, max_mileages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--owners', type=int, default=5)
+    parser.add_argument('--vehicles', type=int, default=20,
+                        help='Number of vehicles of every owner.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batches', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=500)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+        from django.db import connection, connections
+
+        from maintenance.models import Vehicle
+
+        migrate()
+        create_fleet(options.owners, options.vehicles, years=1)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        vin_codes = list(Vehicle.objects.values_list('vin_code', flat=True))
+        connections.close_all()
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=options.workers,
+            mp_context=multiprocessing.get_context('fork'),
+        ) as executor:
+            results = list(executor.map(
+                send_readings,
+                range(options.workers),
+                [vin_codes] * options.workers,
+                [options.batches] * options.workers,
+                [options.batch_size] * options.workers,
+            ))
+        duration = time.perf_counter() - started
+
+        readings_number = sum(number for number, _ in results)
+        max_mileages: dict[str, int] = {}
+        for _, worker_max_mileages in results:
+            for vin_code, mileage in worker_max_mileages.items():
+                max_mileages[vin_code] = max(
+                    max_mileages.get(vin_code, 0), mileage
+                )
+        stored_mileages = dict(
+            Vehicle.objects.values_list('vin_code', 'vehicle_mileage')
+        )
+        lost_updates = sum(
+            stored_mileages[vin_code] != mileage
+            for vin_code, mileage in max_mileages.items()
+        )
+
+    print(f'Journal mode: {journal_mode}, '
+          f'writers: {options.workers}')
+    print(f'Readings: {readings_number} in {duration:.2f} s, '
+          f'{readings_number / duration:.0f} readings/s')
+    print(f'Vehicles with lost mileage updates: {lost_updates}')
+    if lost_updates:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,47 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-from maintenance.models import Vehicle, WorkPattern, Work, Event
+from maintenance.models import (
+    ApiToken,
+    Event,
+    Vehicle,
+    Work,
+    WorkAlert,
+    WorkPattern,
+)
+from maintenance.services.pattern_sync import sync_work_patterns
+
+
+@admin.action(description='Apply to the works of all vehicles')
+def sync_patterns(modeladmin, request, queryset):
+    # Missing works may have been deleted by their owners, so the action
+    # only updates the existing ones.
+    report = sync_work_patterns(queryset, create_missing=False)
+    modeladmin.message_user(
+        request,
+        f'Updated works: {report.works_updated}, linked works: '
+        f'{report.works_linked}, created works: {report.works_created}, '
+        f'affected vehicles: {report.vehicles_affected}.',
+        messages.SUCCESS,
+    )
+
+
+class WorkPatternAdmin(admin.ModelAdmin):
+    list_display = ('title', 'interval_month', 'interval_km')
+    actions = [sync_patterns]
+
+
+class ApiTokenAdmin(admin.ModelAdmin):
+    # Tokens are created by the create_api_token command, which shows the
+    # key once.
+    list_display = ('name', 'user', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
 
 
 admin.site.register(Vehicle)
-admin.site.register(WorkPattern)
+admin.site.register(WorkPattern, WorkPatternAdmin)
 admin.site.register(Work)
 admin.site.register(Event)
+admin.site.register(WorkAlert)
+admin.site.register(ApiToken, ApiTokenAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MaintenanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'maintenance'
+
+    def ready(self):
+        from maintenance import signals  # noqa: F401
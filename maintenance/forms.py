@@ -1,4 +1,6 @@
 from django import forms
+from django.contrib.auth.models import User
+from django.urls import reverse_lazy
 
 from maintenance.models import Event, MileageEvent, Vehicle, Work
 
@@ -7,13 +9,63 @@ class DateInput(forms.DateInput):
     input_type = 'date'
 
 
+class AutocompleteSelect(forms.Select):
+    """
+    Select rendering only the selected option, the other choices are
+    loaded on demand from the JSON endpoint. The forwarded field value of
+    the form is sent along with the search prefix.
+    """
+    class Media:
+        js = ('maintenance/js/autocomplete.js',)
+
+    def __init__(self, url: str, forward: str = '', attrs=None) -> None:
+        super().__init__(attrs)
+        self.url = url
+        self.forward = forward
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = str(self.url)
+        if self.forward:
+            attrs['data-autocomplete-forward'] = self.forward
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [item for item in value if item]
+        options = [
+            self.create_option(name, '', self.choices.field.empty_label,
+                               not selected, 0)
+        ]
+        if selected:
+            for index, instance in enumerate(
+                self.choices.queryset.filter(pk__in=selected), start=1
+            ):
+                options.append(self.create_option(
+                    name, instance.pk, self.choices.field.label_from_instance(
+                        instance
+                    ), True, index, attrs=attrs,
+                ))
+        return [(None, options, 0)]
+
+
 class EventForm(forms.ModelForm):
-    def __init__(self, *args, **kwargs):
-        vehicle_instance = kwargs['initial'].get('vehicle')
-        super(EventForm, self).__init__(*args, **kwargs)
-        self.fields['work'].queryset = Work.objects.filter(
-            vehicle=vehicle_instance
-        )
+    def __init__(self, *args, owner: User | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if owner is not None:
+            self.fields['vehicle'].queryset = Vehicle.objects.filter(
+                owner=owner
+            )
+            self.fields['work'].queryset = Work.objects.filter(
+                vehicle__owner=owner
+            )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        vehicle = cleaned_data.get('vehicle')
+        work = cleaned_data.get('work')
+        if vehicle and work and work.vehicle_id != vehicle.pk:
+            self.add_error('work', 'The work belongs to another vehicle.')
+        return cleaned_data
 
     class Meta:
         model = Event
@@ -21,6 +73,18 @@ class EventForm(forms.ModelForm):
         widgets = {
             'work_date': DateInput(),
             'vehicle': forms.HiddenInput(),
+            'work': AutocompleteSelect(reverse_lazy('api_work_choices'),
+                                       forward='vehicle'),
+        }
+
+
+class EventEditForm(EventForm):
+    class Meta(EventForm.Meta):
+        widgets = {
+            **EventForm.Meta.widgets,
+            'vehicle': AutocompleteSelect(
+                reverse_lazy('api_vehicle_choices')
+            ),
         }
 
 
@@ -46,7 +110,7 @@ class VehicleForm(forms.ModelForm):
 class WorkForm(forms.ModelForm):
     class Meta:
         model = Work
-        fields = '__all__'
+        exclude = ('pattern',)
         widgets = {
             'vehicle': forms.HiddenInput(),
         }
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from maintenance.services.compaction import (
+    COMPACTION_BATCH_SIZE,
+    compact_mileage_events,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rolls up the mileage readings older than the raw retention into '
+        'daily rows and the daily rows older than the daily retention into '
+        'monthly rows, batch by batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int,
+                            default=settings.MILEAGE_RAW_RETENTION_DAYS)
+        parser.add_argument('--daily-days', type=int,
+                            default=settings.MILEAGE_DAILY_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int,
+                            default=COMPACTION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        report = compact_mileage_events(
+            raw_days=options['raw_days'],
+            daily_days=options['daily_days'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted rows: {report.compacted} in {report.batches} '
+            f'batches, created rollups: {report.created}, updated rollups: '
+            f'{report.updated}.'
+        ))
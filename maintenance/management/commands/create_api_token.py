@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates an API token of the user for the machine clients of the '
+        'JSON API and prints its key, which is not stored.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='API client',
+                            help='Name of the client of the token.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'Unknown user {options["username"]!r}.')
+
+        _, key = ApiToken.create_token(user, options['name'])
+        self.stdout.write(key)
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.models import Vehicle
+from maintenance.services.exporter import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    iter_history_records,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports events and mileage events of vehicles to CSV or JSONL '
+        'in the format read by import_history.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS.keys(),
+                            default='csv')
+        parser.add_argument('--vin', action='append', dest='vin_codes',
+                            help='VIN of the exported vehicle, repeatable.')
+        parser.add_argument('--owner', help='Username of the owner.')
+        parser.add_argument('--output', type=Path,
+                            help='Defaults to the standard output.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        vehicles = Vehicle.objects.all()
+        if options['vin_codes']:
+            vehicles = vehicles.filter(
+                vin_code__in=[vin.upper() for vin in options['vin_codes']]
+            )
+        if options['owner']:
+            vehicles = vehicles.filter(owner__username=options['owner'])
+        if not vehicles.exists():
+            raise CommandError('No vehicles to export.')
+
+        iter_lines, _ = EXPORT_FORMATS[options['format']]
+        lines = iter_lines(
+            iter_history_records(vehicles, options['chunk_size'])
+        )
+        if options['output']:
+            with options['output'].open(
+                'w', encoding='utf-8', newline=''
+            ) as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.services.synthetic import SyntheticFleetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a reproducible synthetic fleet with maintenance works '
+        'from the work patterns, events and mileage history.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=10)
+        parser.add_argument('--vehicles', type=int, default=10,
+                            help='Number of vehicles of every owner.')
+        parser.add_argument('--years', type=int, default=5,
+                            help='Length of the generated history.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Username prefix of the generated owners.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+            username__startswith=f'{options["prefix"]}_'
+        ).exists():
+            raise CommandError(
+                f'Owners with the prefix {options["prefix"]!r} '
+                'already exist.'
+            )
+        report = SyntheticFleetGenerator(
+            owners=options['owners'],
+            vehicles_per_owner=options['vehicles'],
+            years=options['years'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+        ).generate()
+        self.stdout.write(
+            f'Owners: {report.owners}, vehicles: {report.vehicles}, '
+            f'works: {report.works}, events: {report.events}, '
+            f'mileage events: {report.mileage_events}.'
+        )
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.services.importer import (
+    IMPORT_CHUNK_SIZE,
+    HistoryImporter,
+    read_csv_rows,
+    read_jsonl_rows,
+)
+
+
+ROW_READERS = {
+    'csv': read_csv_rows,
+    'jsonl': read_jsonl_rows,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports events and mileage readings from CSV or JSONL file. '
+        'Each record has type (event or mileage), vin_code, date, mileage '
+        'and for events work, part_price, work_price and note.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument('--format', choices=ROW_READERS.keys(),
+                            help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ROW_READERS:
+            raise CommandError(f'Unknown file format {file_format!r}.')
+
+        importer = HistoryImporter(
+            chunk_size=options['chunk_size'],
+            on_error=lambda line_number, message: self.stderr.write(
+                f'Line {line_number}: {message}'
+            ),
+        )
+        with path.open(encoding='utf-8', newline='') as stream:
+            report = importer.run(ROW_READERS[file_format](stream))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Events: {report.events_created}, '
+            f'mileage events: {report.mileage_events_created}, '
+            f'updated vehicles: {report.updated_vehicles}, '
+            f'errors: {report.errors_number}.'
+        ))
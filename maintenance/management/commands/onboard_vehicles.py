@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.services.importer import read_csv_rows, read_jsonl_rows
+from maintenance.services.onboarding import (
+    ONBOARDING_CHUNK_SIZE,
+    VEHICLE_FIELDS,
+    VehicleOnboarder,
+)
+
+
+ROW_READERS = {
+    'csv': read_csv_rows,
+    'jsonl': read_jsonl_rows,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates vehicles of the owner from CSV or JSONL file together with '
+        'their works from the patterns. Each record has '
+        f'{", ".join(VEHICLE_FIELDS)}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument('--owner', required=True,
+                            help='Username of the vehicles owner.')
+        parser.add_argument('--format', choices=ROW_READERS.keys(),
+                            help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=ONBOARDING_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ROW_READERS:
+            raise CommandError(f'Unknown file format {file_format!r}.')
+        owner = User.objects.filter(username=options['owner']).first()
+        if owner is None:
+            raise CommandError(f'Unknown owner {options["owner"]!r}.')
+
+        onboarder = VehicleOnboarder(
+            owner,
+            chunk_size=options['chunk_size'],
+            on_error=lambda line_number, message: self.stderr.write(
+                f'Line {line_number}: {message}'
+            ),
+        )
+        with path.open(encoding='utf-8', newline='') as stream:
+            report = onboarder.run(ROW_READERS[file_format](stream))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Vehicles: {report.vehicles_created}, '
+            f'works: {report.works_created}, '
+            f'errors: {report.errors_number}.'
+        ))
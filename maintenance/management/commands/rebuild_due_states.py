@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.services.due_state import (
+    find_due_state_drift,
+    rebuild_due_states,
+    repair_due_state_drift,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Validates the work due states against the events history, '
+        'repairs the drift or rebuilds the whole table.'
+    )
+
+    def add_arguments(self, parser):
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--check', action='store_true',
+            help='Only report the drift, exit with an error if found.',
+        )
+        mode.add_argument(
+            '--full', action='store_true',
+            help='Drop and recreate the whole table.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['full']:
+            created = rebuild_due_states(batch_size=options['batch_size'])
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt {created} due states.')
+            )
+            return
+
+        drift = find_due_state_drift()
+        self.stdout.write(
+            f'Missing: {len(drift.missing)}, '
+            f'changed: {len(drift.changed)}, '
+            f'redundant: {len(drift.redundant)}.'
+        )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Due states are valid.'))
+            return
+        if options['check']:
+            raise CommandError('Due states drift from the events history.')
+        repair_due_state_drift(drift, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Due states are repaired.'))
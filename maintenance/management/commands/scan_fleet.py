@@ -0,0 +1,54 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from maintenance.services.fleet_scan import (
+    SCAN_CHUNK_SIZE,
+    scan_fleet,
+    send_alert_digests,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Periodically recomputes the schedules of the changed vehicles in '
+        'a process pool, stores the new MILEAGE and DATE triggers in the '
+        'alert outbox and sends them as digests per owner.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=300,
+                            help='Seconds between the scan starts.')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single scan and exit.')
+        parser.add_argument('--workers', type=int,
+                            default=multiprocessing.cpu_count())
+        parser.add_argument('--chunk-size', type=int,
+                            default=SCAN_CHUNK_SIZE)
+
+    def run_scan(self, executor, chunk_size):
+        started = time.monotonic()
+        report = scan_fleet(executor, chunk_size)
+        digests_number = send_alert_digests()
+        self.stdout.write(
+            f'Scanned vehicles: {report.vehicles} in {report.chunks} '
+            f'chunks, new alerts: {report.alerts}, digests: '
+            f'{digests_number}, {time.monotonic() - started:.1f} s.'
+        )
+
+    def handle(self, *args, **options):
+        # Workers are forked with the configured Django.
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('fork'),
+        ) as executor:
+            while True:
+                started = time.monotonic()
+                self.run_scan(executor, options['chunk_size'])
+                if options['once']:
+                    return
+                time.sleep(
+                    max(options['interval'] - (time.monotonic() - started), 0)
+                )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.models import WorkPattern
+from maintenance.services.pattern_sync import (
+    PATTERN_SYNC_CHUNK_SIZE,
+    sync_work_patterns,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Applies the intervals of the work patterns to the linked works of '
+        'all vehicles, chunk by chunk of vehicles. With --create-missing it '
+        'creates the works of the patterns missing on the vehicles too.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pattern', type=int, action='append',
+                            dest='pattern_ids',
+                            help='Id of the synced pattern, all patterns '
+                                 'are synced by default.')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Create the works of the patterns missing '
+                                 'on the vehicles, including the ones '
+                                 'deleted by their owners.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=PATTERN_SYNC_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        patterns = WorkPattern.objects.all()
+        if options['pattern_ids']:
+            patterns = patterns.filter(pk__in=options['pattern_ids'])
+            if patterns.count() != len(set(options['pattern_ids'])):
+                raise CommandError('Unknown work pattern.')
+
+        report = sync_work_patterns(
+            patterns,
+            create_missing=options['create_missing'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated works: {report.works_updated}, linked works: '
+            f'{report.works_linked}, created works: {report.works_created}, '
+            f'affected vehicles: {report.vehicles_affected}.'
+        ))
@@ -0,0 +1,220 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.response import SimpleTemplateResponse
+
+
+logger = logging.getLogger("maintenance.requests")
+
+MAX_RECORDED_QUERIES = 1000
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    view_started: float | None = None
+    view_finished: float | None = None
+    render_finished: float | None = None
+    finished: float | None = None
+    queries_number: int = 0
+    queries_time: float = 0.0
+    max_query_time: float = 0.0
+    queries: list[tuple[str, float]] = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries_number += 1
+            self.queries_time += duration
+            self.max_query_time = max(self.max_query_time, duration)
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append((sql, duration))
+
+    @property
+    def total_time(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def view_time(self) -> float | None:
+        view_finished = self.view_finished or self.finished
+        if self.view_started is None or view_finished is None:
+            return None
+        return view_finished - self.view_started
+
+    @property
+    def render_time(self) -> float:
+        if self.view_finished is None or self.render_finished is None:
+            return 0.0
+        return self.render_finished - self.view_finished
+
+    def get_server_timing(self) -> str:
+        """
+        Returns the Server-Timing header value, the view metric is skipped
+        when no view was called, e.g. for the responses of middlewares.
+        """
+        timings = (
+            ("db", self.queries_time, f"{self.queries_number} queries"),
+            ("view", self.view_time, "View"),
+            ("render", self.render_time, "Template rendering"),
+            ("total", self.total_time, "Total"),
+        )
+        return ", ".join(
+            f'{name};dur={duration * 1000:.1f};desc="{description}"'
+            for name, duration, description in timings
+            if duration is not None
+        )
+
+    def as_dict(self) -> dict:
+        view_time = self.view_time
+        return {
+            "queries": self.queries_number,
+            "db_ms": round(self.queries_time * 1000, 3),
+            "max_query_ms": round(self.max_query_time * 1000, 3),
+            "view_ms": (
+                None if view_time is None else round(view_time * 1000, 3)
+            ),
+            "render_ms": round(self.render_time * 1000, 3),
+            "total_ms": round(self.total_time * 1000, 3),
+        }
+
+
+def render_response(request: HttpRequest,
+                    response: SimpleTemplateResponse) -> None:
+    """
+    Renders the template response inside the view, e.g. in a database
+    routing context, timing the rendering apart from the view.
+    """
+    metrics = getattr(request, "metrics", None)
+    if metrics is not None:
+        metrics.view_finished = time.perf_counter()
+    response.render()
+    if metrics is not None:
+        metrics.render_finished = time.perf_counter()
+
+
+class RequestMetricsMiddleware:
+    """
+    Counts and times the SQL queries of every request by an execute
+    wrapper, so it works without DEBUG, times the view and the template
+    rendering and reports them in the Server-Timing header and the
+    maintenance.requests log, at DEBUG level. Slow requests are logged as
+    warnings with their queries.
+
+    The queries of synchronous streaming bodies are counted while the body
+    is consumed and the request is logged after it. The Server-Timing
+    header is sent before the body, so it covers the view only. The
+    queries of asynchronous streaming bodies are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.slow_request_time = settings.SLOW_REQUEST_MS / 1000
+        self.server_timing = settings.SERVER_TIMING_HEADER
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def wrap_connections(metrics: RequestMetrics) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        with self.wrap_connections(metrics):
+            response = self.get_response(request)
+        return self.finish_request(request, response, metrics)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        # Connections are per thread, the queries of the request run in
+        # its sync thread, so the wrappers are installed there.
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        stack = await sync_to_async(self.wrap_connections)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish_request(request, response, metrics)
+
+    def finish_request(self, request: HttpRequest, response: HttpResponse,
+                       metrics: RequestMetrics) -> HttpResponse:
+        metrics.finished = time.perf_counter()
+        if self.server_timing:
+            response["Server-Timing"] = metrics.get_server_timing()
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.iter_streaming_content(
+                request, response, metrics, response.streaming_content
+            )
+            return response
+        self.log_request(request, response, metrics)
+        return response
+
+    def iter_streaming_content(self, request: HttpRequest,
+                               response: HttpResponse,
+                               metrics: RequestMetrics,
+                               content: Iterator[bytes]) -> Iterator[bytes]:
+        # Synchronous bodies are consumed in one thread, also by the ASGI
+        # handler, so the wrappers are installed in the thread of the
+        # queries.
+        try:
+            with self.wrap_connections(metrics):
+                yield from content
+        finally:
+            metrics.finished = time.perf_counter()
+            self.log_request(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        if response.is_rendered:
+            # Rendered by the view with render_response().
+            return response
+        metrics = request.metrics
+        metrics.view_finished = time.perf_counter()
+
+        def finish_rendering(response):
+            metrics.render_finished = time.perf_counter()
+
+        response.add_post_render_callback(finish_rendering)
+        return response
+
+    def log_request(self, request: HttpRequest, response: HttpResponse,
+                    metrics: RequestMetrics) -> None:
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            **metrics.as_dict(),
+        }
+        if metrics.total_time < self.slow_request_time:
+            logger.debug(json.dumps(record))
+            return
+        record["slow"] = True
+        record["sql"] = [
+            {"sql": sql, "ms": round(duration * 1000, 3)}
+            for sql, duration in metrics.queries
+        ]
+        logger.warning(json.dumps(record))
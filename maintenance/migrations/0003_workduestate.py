@@ -0,0 +1,70 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:50
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_work_due_states(apps, schema_editor):
+    Event = apps.get_model('maintenance', 'Event')
+    Work = apps.get_model('maintenance', 'Work')
+    WorkDueState = apps.get_model('maintenance', 'WorkDueState')
+    work_events = Event.objects.filter(
+        vehicle=OuterRef('vehicle'), work=OuterRef('pk')
+    )
+    last_work_events = work_events.order_by('-work_date', '-pk')
+    works = Work.objects.annotate(
+        last_event_date=Subquery(last_work_events.values('work_date')[:1]),
+        last_event_mileage=Subquery(last_work_events.values('mileage')[:1]),
+        event_counter=Subquery(
+            work_events.order_by().values('work')
+            .annotate(counter=Count('pk')).values('counter')
+        ),
+    ).filter(last_event_date__isnull=False)
+    WorkDueState.objects.bulk_create(
+        (
+            WorkDueState(
+                work_id=work.pk,
+                vehicle_id=work.vehicle_id,
+                last_event_date=work.last_event_date,
+                last_event_mileage=work.last_event_mileage,
+                event_counter=work.event_counter,
+                planed_mileage=(
+                    work.last_event_mileage + work.interval_km
+                    if work.interval_km else None
+                ),
+                planed_date=(
+                    work.last_event_date
+                    + relativedelta(months=work.interval_month)
+                    if work.interval_month else None
+                ),
+            )
+            for work in works.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0002_vehicle_vehicle_last_update_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkDueState',
+            fields=[
+                ('work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='due_state', serialize=False, to='maintenance.work')),
+                ('last_event_date', models.DateField(verbose_name='Last event date')),
+                ('last_event_mileage', models.IntegerField(verbose_name='Last event mileage')),
+                ('event_counter', models.IntegerField(verbose_name='Event counter')),
+                ('planed_mileage', models.IntegerField(blank=True, null=True, verbose_name='Planed mileage')),
+                ('planed_date', models.DateField(blank=True, null=True, verbose_name='Planed date')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='due_states', to='maintenance.vehicle')),
+            ],
+        ),
+        migrations.RunPython(fill_work_due_states,
+                             migrations.RunPython.noop),
+    ]
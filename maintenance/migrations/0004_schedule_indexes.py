@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0003_workduestate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['vehicle', '-work_date', '-id'], name='event_vehicle_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['work', '-work_date', '-id'], name='event_work_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mileageevent',
+            index=models.Index(fields=['vehicle', '-mileage_date', '-id'], name='mileage_vehicle_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['vehicle', 'work_type'], name='work_vehicle_type_idx'),
+        ),
+    ]
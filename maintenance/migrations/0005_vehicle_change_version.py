@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+import maintenance.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0004_schedule_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='change_version',
+            field=models.BigIntegerField(default=maintenance.models.get_change_version, editable=False, verbose_name='Change version'),
+        ),
+    ]
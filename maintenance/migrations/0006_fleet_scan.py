@@ -0,0 +1,52 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('maintenance', '0005_vehicle_change_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkAlertState',
+            fields=[
+                ('work', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='alert_state', serialize=False, to='maintenance.work')),
+                ('trigger', models.IntegerField(verbose_name='Trigger')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='maintenance.vehicle')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VehicleScanState',
+            fields=[
+                ('vehicle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scan_state', serialize=False, to='maintenance.vehicle')),
+                ('scanned_version', models.BigIntegerField(verbose_name='Scanned change version')),
+                ('next_scan_date', models.DateField(blank=True, null=True, verbose_name='Next scan date')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['next_scan_date'], name='scan_state_next_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigger', models.IntegerField(verbose_name='Trigger')),
+                ('planed_mileage', models.IntegerField(blank=True, null=True, verbose_name='Planed mileage')),
+                ('planed_date', models.DateField(blank=True, null=True, verbose_name='Planed date')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent at')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_alerts', to=settings.AUTH_USER_MODEL)),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_alerts', to='maintenance.vehicle')),
+                ('work', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='maintenance.work')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sent_at', 'owner'], name='work_alert_outbox_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0006_fleet_scan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mileageevent',
+            name='first_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='First date'),
+        ),
+        migrations.AddField(
+            model_name='mileageevent',
+            name='min_mileage',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Min mileage'),
+        ),
+        migrations.AddField(
+            model_name='mileageevent',
+            name='period',
+            field=models.CharField(choices=[('RAW', 'Reading'), ('DAY', 'Day'), ('MONTH', 'Month')], default='RAW', editable=False, max_length=5, verbose_name='Period'),
+        ),
+        migrations.AddField(
+            model_name='mileageevent',
+            name='readings_number',
+            field=models.IntegerField(default=1, editable=False, verbose_name='Readings number'),
+        ),
+        migrations.AddIndex(
+            model_name='mileageevent',
+            index=models.Index(fields=['period', 'mileage_date'], name='mileage_period_date_idx'),
+        ),
+    ]
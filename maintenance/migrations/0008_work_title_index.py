@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0007_mileage_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['vehicle', 'title'], name='work_vehicle_title_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_pattern_works(apps, schema_editor):
+    # Works were copied from the patterns with their titles.
+    Work = apps.get_model('maintenance', 'Work')
+    WorkPattern = apps.get_model('maintenance', 'WorkPattern')
+    for pattern in WorkPattern.objects.order_by('pk'):
+        Work.objects.filter(
+            pattern=None, work_type='MAINTENANCE', title=pattern.title
+        ).update(pattern=pattern)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0008_work_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='work',
+            name='pattern',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='works', to='maintenance.workpattern', verbose_name='Pattern'),
+        ),
+        migrations.RunPython(link_pattern_works,
+                             migrations.RunPython.noop),
+    ]
@@ -1,4 +1,21 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpRequest, JsonResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+
+from maintenance.middleware import render_response
+from maintenance.models import ApiToken
+from maintenance.routers import is_replica_configured, read_from_replica
 
 
 class TitleMixin(object):
@@ -17,3 +34,260 @@ class SuccessUrlMixin:
 
     def get_success_url(self):
         return self.request.GET.get('next', self.success_url)
+
+
+class ReplicaReadMixin:
+    """
+    Makes the GET requests of the view read from the replica database when
+    it is configured. The response is rendered inside, so the queries of
+    the template go to the replica too. Put it after LoginRequiredMixin,
+    the session and the user are read from the default database.
+    """
+    replica_methods = ('get', 'head')
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            request.method.lower() not in self.replica_methods
+            or not is_replica_configured()
+        ):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.adispatch_from_replica(request, *args, **kwargs)
+        with read_from_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                render_response(request, response)
+        return response
+
+    async def adispatch_from_replica(self, request, *args, **kwargs):
+        with read_from_replica():
+            response = await super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                await sync_to_async(render_response)(request, response)
+        return response
+
+
+def get_api_token_user(authorization: str):
+    """
+    Returns the active user of the "Token <key>" authorization header,
+    None when the key is missing or unknown.
+    """
+    scheme, _, key = authorization.partition(' ')
+    if scheme.lower() != 'token' or not key.strip():
+        return None
+    token = (
+        ApiToken.objects.select_related('user')
+        .filter(key_digest=ApiToken.get_key_digest(key.strip()),
+                user__is_active=True)
+        .first()
+    )
+    return token.user if token else None
+
+
+class ApiTokenRequiredMixin:
+    """
+    Authenticates the machine clients of the view by their API tokens
+    instead of the session. The view is exempt from the CSRF check, which
+    only guards cookie sessions. With allow_session the requests without
+    the Authorization header may use the session login for safe methods.
+    """
+    allow_session = False
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        authorization = request.headers.get('Authorization')
+        if (
+            authorization is None
+            and self.allow_session
+            and request.method in ('GET', 'HEAD', 'OPTIONS')
+            and request.user.is_authenticated
+        ):
+            return super().dispatch(request, *args, **kwargs)
+        user = get_api_token_user(authorization or '')
+        if user is None:
+            response = JsonResponse({'error': 'invalid API token'},
+                                    status=401)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        request.user = user
+        return super().dispatch(request, *args, **kwargs)
+
+
+@dataclass
+class KeysetPage:
+    next_query: str | None = None
+    previous_query: str | None = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_query is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_query is not None
+
+
+def encode_cursor(value, pk) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([str(value), pk]).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(value), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise Http404('Invalid cursor')
+
+
+class KeysetPaginationMixin:
+    """
+    Paginates ListView by (keyset_field, pk) in descending order. Pages
+    are addressed by ?after= and ?before= cursors, so every page costs
+    one indexed range query. ?format=json renders the page as JSON.
+    """
+    request: HttpRequest
+    paginate_by = 50
+    keyset_field = ''
+    json_fields: list[str] | None = None
+    # Columns rendered by the template, the other ones are deferred when
+    # the page is not rendered as JSON.
+    template_fields: tuple[str, ...] = ()
+
+    def get_page_query(self, cursor_name: str, item) -> str:
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query[cursor_name] = encode_cursor(
+            getattr(item, self.keyset_field), item.pk
+        )
+        return query.urlencode()
+
+    def decode_page_cursor(self, queryset, cursor: str) -> tuple[object, int]:
+        """
+        Returns the keyset value of the cursor converted by its model field,
+        so a malformed value is a missing page, not a database error.
+        """
+        value, pk = decode_cursor(cursor)
+        field = queryset.model._meta.get_field(self.keyset_field)
+        try:
+            return field.to_python(value), pk
+        except ValidationError:
+            raise Http404('Invalid cursor')
+
+    def get_page_queryset(self, queryset, page_size):
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+        field = self.keyset_field
+        if self.template_fields and self.request.GET.get('format') != 'json':
+            queryset = queryset.only(field, *self.template_fields)
+        ordering = (f'-{field}', '-pk')
+        if before:
+            value, pk = self.decode_page_cursor(queryset, before)
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': value})
+                | Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')
+        elif after:
+            value, pk = self.decode_page_cursor(queryset, after)
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'pk__lt': pk})
+            ).order_by(*ordering)
+        else:
+            queryset = queryset.order_by(*ordering)
+        return queryset[:page_size + 1]
+
+    def build_page(self, items, page_size):
+        after = self.request.GET.get('after')
+        before = self.request.GET.get('before')
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if before:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(after)
+
+        page = KeysetPage()
+        if items and has_next:
+            page.next_query = self.get_page_query('after', items[-1])
+        if items and has_previous:
+            page.previous_query = self.get_page_query('before', items[0])
+        return None, page, items, has_next or has_previous
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.build_page(
+            list(self.get_page_queryset(queryset, page_size)), page_size
+        )
+
+    async def apaginate_queryset(self, queryset, page_size):
+        items = [
+            item
+            async for item in self.get_page_queryset(queryset, page_size)
+        ]
+        return self.build_page(items, page_size)
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') != 'json':
+            return super().render_to_response(context, **response_kwargs)
+        page = context['page_obj']
+        return JsonResponse({
+            'results': [
+                model_to_dict(item, fields=self.json_fields)
+                for item in context['object_list']
+            ],
+            'next': page.next_query,
+            'previous': page.previous_query,
+        })
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """
+    LoginRequiredMixin of async views. The lazy user is loaded in a thread,
+    as the session and user lookups are synchronous.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        is_authenticated = await sync_to_async(
+            lambda: request.user.is_authenticated
+        )()
+        if not is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(
+            request, *args, **kwargs
+        )
+
+
+class AsyncListMixin(AsyncLoginRequiredMixin):
+    """
+    Async get() of the ListView based views. The page is fetched by the
+    async ORM before rendering, the template is rendered in a thread.
+    Paginated views have to provide apaginate_queryset().
+    """
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        page_size = self.get_paginate_by(queryset)
+        if page_size:
+            self.fetched_page = await self.apaginate_queryset(
+                queryset, page_size
+            )
+            self.object_list = self.fetched_page[2]
+        else:
+            self.object_list = [item async for item in queryset]
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        # The page is already fetched by get() with apaginate_queryset().
+        return self.fetched_page
+
+    def get_template_names(self):
+        if self.template_name:
+            return [self.template_name]
+        opts = self.model._meta
+        return [
+            f'{opts.app_label}/{opts.model_name}{self.template_name_suffix}'
+            '.html'
+        ]
@@ -1,3 +1,8 @@
+import enum
+import hashlib
+import secrets
+import time
+
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from django.db import models
@@ -6,6 +11,10 @@ from django.dispatch import receiver
 from django.urls import reverse_lazy
 
 
+def get_change_version() -> int:
+    return time.time_ns()
+
+
 class Vehicle(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE,
                               related_name='vehicles')
@@ -22,6 +31,9 @@ class Vehicle(models.Model):
     vehicle_mileage = models.IntegerField(verbose_name='Mileage')
     vehicle_last_update_date = models.DateField(
         verbose_name='Last update date', auto_now=True)
+    change_version = models.BigIntegerField(
+        verbose_name='Change version', default=get_change_version,
+        editable=False)
 
     def __str__(self) -> str:
         return ' '.join((self.vehicle_manufacturer, self.vehicle_model,
@@ -29,6 +41,11 @@ class Vehicle(models.Model):
 
     def save(self, *args, **kwargs) -> None:
         self.vin_code = self.vin_code.upper()
+        self.change_version = max(self.change_version + 1,
+                                  get_change_version())
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'],
+                                       'change_version'}
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -53,6 +70,17 @@ class Work(models.Model):
     interval_km = models.IntegerField(verbose_name='Interval in kilometers',
                                       null=True, blank=True)
     note = models.CharField(max_length=255, verbose_name='Note', blank=True)
+    pattern = models.ForeignKey(
+        'WorkPattern', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='works', verbose_name='Pattern')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vehicle', 'work_type'],
+                         name='work_vehicle_type_idx'),
+            models.Index(fields=['vehicle', 'title'],
+                         name='work_vehicle_title_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
@@ -74,6 +102,12 @@ class Event(models.Model):
 
     class Meta:
         ordering = ['-work_date']
+        indexes = [
+            models.Index(fields=['vehicle', '-work_date', '-id'],
+                         name='event_vehicle_date_idx'),
+            models.Index(fields=['work', '-work_date', '-id'],
+                         name='event_work_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.work_date} {self.work} ({self.mileage})'
@@ -88,15 +122,65 @@ class Event(models.Model):
         return super().save(*args, **kwargs)
 
 
+class WorkDueState(models.Model):
+    work = models.OneToOneField(Work, on_delete=models.CASCADE,
+                                primary_key=True, related_name='due_state')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE,
+                                related_name='due_states')
+    last_event_date = models.DateField(verbose_name='Last event date')
+    last_event_mileage = models.IntegerField(
+        verbose_name='Last event mileage')
+    event_counter = models.IntegerField(verbose_name='Event counter')
+    planed_mileage = models.IntegerField(verbose_name='Planed mileage',
+                                         null=True, blank=True)
+    planed_date = models.DateField(verbose_name='Planed date', null=True,
+                                   blank=True)
+
+    def __str__(self) -> str:
+        return f'{self.work_id} ({self.last_event_date})'
+
+
 class MileageEvent(models.Model):
+    # Enum is listed for the type checkers, which see TextChoices as Any
+    # and its members as their (value, label) definitions otherwise.
+    class Period(models.TextChoices, enum.Enum):
+        RAW = 'RAW', 'Reading'
+        DAY = 'DAY', 'Day'
+        MONTH = 'MONTH', 'Month'
+
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE,
                                 related_name='mileage_events',
                                 verbose_name='Vehicle')
     mileage_date = models.DateField(verbose_name='Mileage Date')
     mileage = models.IntegerField(verbose_name='Mileage')
+    # Compacted readings are kept as rollups of the period, the mileage
+    # and the mileage date are the highest ones of the period.
+    period = models.CharField(
+        max_length=5, choices=Period.choices, default=Period.RAW,
+        verbose_name='Period', editable=False)
+    first_date = models.DateField(verbose_name='First date', null=True,
+                                  blank=True, editable=False)
+    min_mileage = models.IntegerField(verbose_name='Min mileage', null=True,
+                                      blank=True, editable=False)
+    readings_number = models.IntegerField(verbose_name='Readings number',
+                                          default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vehicle', '-mileage_date', '-id'],
+                         name='mileage_vehicle_date_idx'),
+            models.Index(fields=['period', 'mileage_date'],
+                         name='mileage_period_date_idx'),
+        ]
 
     def __str__(self) -> str:
-        return f'{self.mileage_date} {self.vehicle} ({self.mileage})'
+        if self.period == self.Period.RAW:
+            return f'{self.mileage_date} {self.vehicle} ({self.mileage})'
+        return (
+            f'{self.first_date} - {self.mileage_date} {self.vehicle} '
+            f'({self.min_mileage} - {self.mileage}, '
+            f'{self.readings_number} readings)'
+        )
     
     def save(self, *args, **kwargs) -> None:
         if self.mileage > self.vehicle.vehicle_mileage:
@@ -105,6 +189,63 @@ class MileageEvent(models.Model):
         return super().save(*args, **kwargs)
 
 
+class VehicleScanState(models.Model):
+    vehicle = models.OneToOneField(Vehicle, on_delete=models.CASCADE,
+                                   primary_key=True,
+                                   related_name='scan_state')
+    scanned_version = models.BigIntegerField(
+        verbose_name='Scanned change version')
+    next_scan_date = models.DateField(verbose_name='Next scan date',
+                                      null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_scan_date'],
+                         name='scan_state_next_date_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.vehicle_id} ({self.scanned_version})'
+
+
+class WorkAlertState(models.Model):
+    work = models.OneToOneField(Work, on_delete=models.CASCADE,
+                                primary_key=True, related_name='alert_state')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE,
+                                related_name='alert_states')
+    trigger = models.IntegerField(verbose_name='Trigger')
+
+    def __str__(self) -> str:
+        return f'{self.work_id} ({self.trigger})'
+
+
+class WorkAlert(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE,
+                              related_name='work_alerts')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE,
+                                related_name='work_alerts')
+    work = models.ForeignKey(Work, on_delete=models.CASCADE,
+                             related_name='alerts')
+    trigger = models.IntegerField(verbose_name='Trigger')
+    planed_mileage = models.IntegerField(verbose_name='Planed mileage',
+                                         null=True, blank=True)
+    planed_date = models.DateField(verbose_name='Planed date', null=True,
+                                   blank=True)
+    created_at = models.DateTimeField(verbose_name='Created at',
+                                      auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name='Sent at', null=True,
+                                   blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'owner'],
+                         name='work_alert_outbox_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.work} ({self.trigger})'
+
+
 class WorkPattern(models.Model):
     title = models.CharField(max_length=255, verbose_name='Title')
     interval_month = models.IntegerField(verbose_name='Interval in month',
@@ -116,13 +257,55 @@ class WorkPattern(models.Model):
         return self.title
 
 
+class ApiToken(models.Model):
+    """
+    Key of the machine clients of the JSON API, e.g. telematics trackers.
+    Only the digest of the key is stored.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='api_tokens')
+    name = models.CharField(max_length=255, verbose_name='Name')
+    key_digest = models.CharField(max_length=64, unique=True,
+                                  editable=False)
+    created_at = models.DateTimeField(verbose_name='Created at',
+                                      auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.user})'
+
+    @staticmethod
+    def get_key_digest(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def create_token(cls, user: User, name: str) -> tuple['ApiToken', str]:
+        """
+        Creates the token of the user, returns it with its key, which can
+        not be recovered later.
+        """
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(user=user, name=name,
+                                   key_digest=cls.get_key_digest(key))
+        return token, key
+
+
+def build_pattern_works(vehicles, work_patterns) -> list[Work]:
+    # Unsaved patterns, like the ones of the fixture file, are not linked.
+    return [
+        Work(vehicle=vehicle, work_type=Work.WorkType.MAINTENANCE,
+             title=pattern.title, interval_month=pattern.interval_month,
+             interval_km=pattern.interval_km,
+             pattern=pattern if pattern.pk else None)
+        for vehicle in vehicles
+        for pattern in work_patterns
+    ]
+
+
 @receiver(post_save, sender=Vehicle)
 def create_works_list_from_patterns(sender, instance, created, **kwargs):
+    # Vehicles created by bulk_create do not send the signal, the bulk
+    # onboarding creates their works itself.
     if created:
-        objects_to_create = (
-            Work(vehicle=instance, work_type=Work.WorkType.MAINTENANCE,
-                title=pattern.title, interval_month=pattern.interval_month,
-                interval_km=pattern.interval_km)
-            for pattern in WorkPattern.objects.all()
+        Work.objects.bulk_create(
+            objs=build_pattern_works([instance], WorkPattern.objects.all())
         )
-        Work.objects.bulk_create(objs=objects_to_create)
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA_DATABASE = 'replica'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def is_replica_configured() -> bool:
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+@contextmanager
+def read_from_replica():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Sends the reads made under read_from_replica() to the replica database
+    when it is configured. The other reads and all writes go to the
+    default database, the replica is not migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and is_replica_configured():
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DATABASE:
+            return False
+        return None
@@ -0,0 +1,168 @@
+import datetime
+import hashlib
+
+from django.core import signing
+from django.core.cache import cache
+
+from maintenance.models import Vehicle
+from maintenance.services.schedule_cache import (
+    get_cached_schedules,
+    get_seconds_until_midnight,
+)
+
+
+CALENDAR_TOKEN_SALT = "maintenance.calendar"
+CALENDAR_PRODID = "-//Vehicle maintenance scheduler//EN"
+CALENDAR_LINE_LENGTH = 75
+
+
+def get_calendar_token(owner_id: int) -> str:
+    """
+    Signed owner id of the feed URLs, calendar clients poll them without
+    a session.
+    """
+    return signing.Signer(salt=CALENDAR_TOKEN_SALT).sign(str(owner_id))
+
+
+def get_calendar_owner_id(token: str) -> int | None:
+    try:
+        return int(signing.Signer(salt=CALENDAR_TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def get_feed_version(vehicles: list[Vehicle]) -> str:
+    """
+    Digest of the change versions of the vehicles, which changes with any
+    of their schedules.
+    """
+    versions = ",".join(
+        f"{vehicle.pk}-{vehicle.change_version}"
+        for vehicle in sorted(vehicles, key=lambda vehicle: vehicle.pk)
+    )
+    return hashlib.sha1(versions.encode()).hexdigest()
+
+
+def get_feed_key(scope: str, vehicles: list[Vehicle],
+                 current_date: datetime.date) -> str:
+    return (
+        f"calendar:{scope}:{get_feed_version(vehicles)}:"
+        f"{current_date.isoformat()}"
+    )
+
+
+def get_feed_etag(vehicles: list[Vehicle],
+                  current_date: datetime.date) -> str:
+    return f'"{get_feed_version(vehicles)}-{current_date.isoformat()}"'
+
+
+def get_feed_last_modified(vehicles: list[Vehicle],
+                           current_date: datetime.date) -> int:
+    """
+    Timestamp of the last change of the vehicles or of the start of the
+    date, which the feed is built for. Change versions are nanoseconds.
+    """
+    day_start = datetime.datetime.combine(current_date, datetime.time())
+    return max(
+        [int(day_start.timestamp())]
+        + [vehicle.change_version // 10 ** 9 for vehicle in vehicles]
+    )
+
+
+def escape_text(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """
+    Folds the content line into lines of at most 75 octets, continuation
+    lines start with a space.
+    """
+    parts = []
+    part = ""
+    part_length = 0
+    for char in line:
+        char_length = len(char.encode())
+        if part_length + char_length > CALENDAR_LINE_LENGTH:
+            parts.append(part)
+            part = " "
+            part_length = 1
+        part += char
+        part_length += char_length
+    parts.append(part)
+    return "\r\n".join(parts)
+
+
+def build_calendar(name: str, vehicles: list[Vehicle],
+                   last_modified: int) -> bytes:
+    """
+    Builds the iCalendar of the planed dates of the works of the vehicles,
+    one all-day event per planed work.
+    """
+    stamp = datetime.datetime.fromtimestamp(
+        last_modified, datetime.timezone.utc
+    ).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{CALENDAR_PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+    ]
+    for vehicle, schedule in get_cached_schedules(vehicles).items():
+        for planed_work in schedule.planed_works:
+            planed_date = planed_work.planed_date
+            if planed_date is None:
+                continue
+            work = planed_work.work
+            description = [f"VIN: {vehicle.vin_code}"]
+            if planed_work.planed_mileage:
+                description.append(
+                    f"Planed mileage: {planed_work.planed_mileage} km"
+                )
+            description.append(
+                f"Last event: {planed_work.last_event_date.isoformat()}"
+            )
+            start = planed_date.strftime("%Y%m%d")
+            end = (planed_date + datetime.timedelta(days=1)).strftime(
+                "%Y%m%d"
+            )
+            lines += [
+                "BEGIN:VEVENT",
+                f"UID:work-{work.pk}-{start}@vehicle-maintenance-scheduler",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART;VALUE=DATE:{start}",
+                f"DTEND;VALUE=DATE:{end}",
+                f"SUMMARY:{escape_text(work.title)} - "
+                f"{escape_text(str(vehicle))}",
+                "DESCRIPTION:" + "\\n".join(
+                    escape_text(line) for line in description
+                ),
+                "TRANSP:TRANSPARENT",
+                "END:VEVENT",
+            ]
+    lines.append("END:VCALENDAR")
+    return "".join(f"{fold_line(line)}\r\n" for line in lines).encode()
+
+
+def get_cached_calendar(scope: str, name: str, vehicles: list[Vehicle],
+                        current_date: datetime.date) -> bytes:
+    """
+    Returns the prebuilt calendar of the vehicles, which is cached by the
+    change versions of the vehicles until midnight. The schedules are
+    only computed when the calendar is rebuilt.
+    """
+    key = get_feed_key(scope, vehicles, current_date)
+    content = cache.get(key)
+    if content is None:
+        content = build_calendar(
+            name, vehicles, get_feed_last_modified(vehicles, current_date)
+        )
+        cache.set(key, content, get_seconds_until_midnight())
+    return content
@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+
+from maintenance.models import Vehicle, Work
+
+
+CHOICES_LIMIT = 20
+
+
+def get_choices_limit(limit: str | int | None) -> int:
+    if limit is None:
+        return CHOICES_LIMIT
+    try:
+        choices_limit = int(limit)
+    except ValueError:
+        return CHOICES_LIMIT
+    return min(max(choices_limit, 1), CHOICES_LIMIT)
+
+
+def search_vehicle_choices(owner: User, prefix: str = "",
+                           limit: int = CHOICES_LIMIT) -> list[dict]:
+    """
+    Vehicles of the owner whose VIN starts with the prefix, looked up by
+    the VIN index.
+    """
+    vehicles = Vehicle.objects.filter(
+        owner=owner, vin_code__startswith=prefix.strip().upper()
+    ).only(
+        "vin_code",
+        "vehicle_manufacturer",
+        "vehicle_model",
+        "vehicle_body",
+        "vehicle_year",
+    ).order_by("vin_code")[:limit]
+    return [
+        {"id": vehicle.pk, "text": f"{vehicle} ({vehicle.vin_code})"}
+        for vehicle in vehicles
+    ]
+
+
+def search_work_choices(owner: User, vehicle_id: int, prefix: str = "",
+                        limit: int = CHOICES_LIMIT) -> list[dict]:
+    """
+    Works of the vehicle of the owner whose title starts with the prefix,
+    looked up by the vehicle and title index.
+    """
+    works = Work.objects.filter(
+        vehicle_id=vehicle_id,
+        vehicle__owner=owner,
+        title__startswith=prefix.strip(),
+    ).values_list("pk", "title").order_by("title", "pk")[:limit]
+    return [{"id": pk, "text": title} for pk, title in works]
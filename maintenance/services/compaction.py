@@ -0,0 +1,167 @@
+import datetime
+from dataclasses import dataclass
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from maintenance.models import MileageEvent
+from maintenance.services.versions import (
+    bump_change_versions,
+    defer_change_version_bumps,
+)
+
+
+COMPACTION_BATCH_SIZE = 1000
+ROLLUP_FIELDS = ("mileage_date", "mileage", "first_date", "min_mileage",
+                 "readings_number")
+
+
+@dataclass
+class CompactionReport:
+    compacted: int = 0
+    created: int = 0
+    updated: int = 0
+    batches: int = 0
+
+
+def get_period_start(period: MileageEvent.Period,
+                     date: datetime.date) -> datetime.date:
+    if period == MileageEvent.Period.MONTH:
+        return date.replace(day=1)
+    return date
+
+
+def get_period_end(period: MileageEvent.Period,
+                   date: datetime.date) -> datetime.date:
+    if period == MileageEvent.Period.MONTH:
+        return date.replace(day=1) + relativedelta(months=1)
+    return date + datetime.timedelta(days=1)
+
+
+def get_first_reading(
+    mileage_event: MileageEvent
+) -> tuple[datetime.date, int]:
+    if mileage_event.period == MileageEvent.Period.RAW:
+        return mileage_event.mileage_date, mileage_event.mileage
+    return mileage_event.first_date, mileage_event.min_mileage
+
+
+def build_rollup(period: MileageEvent.Period, mileage_event: MileageEvent
+                 ) -> MileageEvent:
+    first_date, min_mileage = get_first_reading(mileage_event)
+    return MileageEvent(
+        vehicle_id=mileage_event.vehicle_id,
+        period=period,
+        mileage_date=mileage_event.mileage_date,
+        mileage=mileage_event.mileage,
+        first_date=first_date,
+        min_mileage=min_mileage,
+        readings_number=mileage_event.readings_number,
+    )
+
+
+def merge_into_rollup(rollup: MileageEvent, mileage_event: MileageEvent
+                      ) -> None:
+    first_date, min_mileage = get_first_reading(mileage_event)
+    rollup.mileage_date = max(rollup.mileage_date, mileage_event.mileage_date)
+    rollup.mileage = max(rollup.mileage, mileage_event.mileage)
+    rollup.first_date = min(rollup.first_date, first_date)
+    rollup.min_mileage = min(rollup.min_mileage, min_mileage)
+    rollup.readings_number += mileage_event.readings_number
+
+
+def compact_batch(source_period: MileageEvent.Period,
+                  target_period: MileageEvent.Period,
+                  before_date: datetime.date, batch_size: int,
+                  report: CompactionReport) -> bool:
+    """
+    Rolls up the oldest batch of the source period rows dated before the
+    date into the target period rows of their vehicles, merging them with
+    the existing rollups. Returns False when there is nothing to compact.
+    """
+    with transaction.atomic():
+        mileage_events = list(
+            MileageEvent.objects.filter(
+                period=source_period, mileage_date__lt=before_date
+            ).order_by("pk")[:batch_size]
+        )
+        if not mileage_events:
+            return False
+        vehicle_ids = {event.vehicle_id for event in mileage_events}
+        dates = [event.mileage_date for event in mileage_events]
+        rollups = {
+            (rollup.vehicle_id,
+             get_period_start(target_period, rollup.mileage_date)): rollup
+            for rollup in MileageEvent.objects.filter(
+                period=target_period,
+                vehicle__in=vehicle_ids,
+                mileage_date__gte=get_period_start(target_period, min(dates)),
+                mileage_date__lt=get_period_end(target_period, max(dates)),
+            )
+        }
+        existing_keys = set(rollups)
+        for event in mileage_events:
+            key = (
+                event.vehicle_id,
+                get_period_start(target_period, event.mileage_date),
+            )
+            if key in rollups:
+                merge_into_rollup(rollups[key], event)
+                continue
+            rollups[key] = build_rollup(target_period, event)
+        updated = [rollups[key] for key in existing_keys]
+        created = [
+            rollup for key, rollup in rollups.items()
+            if key not in existing_keys
+        ]
+        MileageEvent.objects.bulk_update(updated, ROLLUP_FIELDS)
+        MileageEvent.objects.bulk_create(created)
+        # The source rows are deleted by the key range of the batch, new
+        # rows get greater keys. The versions bumped by the post_delete
+        # signals are bumped once per vehicle.
+        with defer_change_version_bumps():
+            MileageEvent.objects.filter(
+                period=source_period,
+                mileage_date__lt=before_date,
+                pk__lte=mileage_events[-1].pk,
+            ).delete()
+            bump_change_versions(*vehicle_ids)
+    report.compacted += len(mileage_events)
+    report.created += len(created)
+    report.updated += len(updated)
+    report.batches += 1
+    return True
+
+
+def compact_mileage_events(
+    raw_days: int | None = None,
+    daily_days: int | None = None,
+    batch_size: int = COMPACTION_BATCH_SIZE,
+    current_date: datetime.date | None = None,
+) -> CompactionReport:
+    """
+    Keeps the raw readings of the last raw_days, rolls up the older ones
+    into daily rows and the daily rows older than daily_days into monthly
+    rows. Every batch is compacted in its own transaction.
+    """
+    current_date = current_date or timezone.now().date()
+    if raw_days is None:
+        raw_days = settings.MILEAGE_RAW_RETENTION_DAYS
+    if daily_days is None:
+        daily_days = settings.MILEAGE_DAILY_RETENTION_DAYS
+    report = CompactionReport()
+    raw_before = current_date - datetime.timedelta(days=raw_days)
+    while compact_batch(MileageEvent.Period.RAW, MileageEvent.Period.DAY,
+                        raw_before, batch_size, report):
+        pass
+    # Only whole months are rolled up.
+    daily_before = get_period_start(
+        MileageEvent.Period.MONTH,
+        current_date - datetime.timedelta(days=daily_days),
+    )
+    while compact_batch(MileageEvent.Period.DAY, MileageEvent.Period.MONTH,
+                        daily_before, batch_size, report):
+        pass
+    return report
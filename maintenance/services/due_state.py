@@ -0,0 +1,159 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from django.db import transaction
+from django.db.models.query import QuerySet
+
+from maintenance.models import Vehicle, Work, WorkDueState
+from maintenance.services.maintenance import (
+    annotate_last_events,
+    get_work_limits,
+)
+from maintenance.services.utils import iter_chunks
+from maintenance.services.versions import (
+    bump_change_versions,
+    bump_vehicles_change_versions,
+)
+
+DUE_STATE_FIELDS = (
+    "vehicle_id",
+    "last_event_date",
+    "last_event_mileage",
+    "event_counter",
+    "planed_mileage",
+    "planed_date",
+)
+
+
+@dataclass
+class DueStateDrift:
+    missing: list[WorkDueState] = field(default_factory=list)
+    changed: list[WorkDueState] = field(default_factory=list)
+    redundant: list[int] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.changed or self.redundant)
+
+
+def build_due_state(work: Work) -> WorkDueState:
+    """
+    Builds the due state of the work annotated by annotate_last_events.
+    """
+    planed_mileage, planed_date = get_work_limits(
+        work, work.last_event_mileage, work.last_event_date
+    )
+    return WorkDueState(
+        work_id=work.pk,
+        vehicle_id=work.vehicle_id,
+        last_event_date=work.last_event_date,
+        last_event_mileage=work.last_event_mileage,
+        event_counter=work.current_event_counter,
+        planed_mileage=planed_mileage,
+        planed_date=planed_date,
+    )
+
+
+def refresh_work_due_state(work_id: int) -> None:
+    """
+    Recomputes the due state of one work from its events.
+    """
+    work = annotate_last_events(Work.objects.filter(pk=work_id)).first()
+    if work is None or work.last_event_date is None:
+        WorkDueState.objects.filter(work_id=work_id).delete()
+        return
+    due_state = build_due_state(work)
+    WorkDueState.objects.update_or_create(
+        work_id=work_id,
+        defaults={
+            field_name: getattr(due_state, field_name)
+            for field_name in DUE_STATE_FIELDS
+        },
+    )
+
+
+def iter_expected_due_states(
+    works: QuerySet[Work], chunk_size: int = 2000
+) -> Iterator[WorkDueState]:
+    expected_works = annotate_last_events(works).filter(
+        last_event_date__isnull=False
+    )
+    for work in expected_works.iterator(chunk_size=chunk_size):
+        yield build_due_state(work)
+
+
+def find_due_state_drift(
+    works: QuerySet[Work] | None = None,
+) -> DueStateDrift:
+    """
+    Compares the stored due states with the states computed from the
+    events history.
+    """
+    if works is None:
+        works = Work.objects.all()
+    stored_due_states = {
+        due_state.work_id: due_state
+        for due_state in WorkDueState.objects.filter(work__in=works)
+    }
+    drift = DueStateDrift()
+    for expected in iter_expected_due_states(works):
+        stored = stored_due_states.pop(expected.work_id, None)
+        if stored is None:
+            drift.missing.append(expected)
+        elif any(
+            getattr(stored, field_name) != getattr(expected, field_name)
+            for field_name in DUE_STATE_FIELDS
+        ):
+            drift.changed.append(expected)
+    drift.redundant.extend(stored_due_states)
+    return drift
+
+
+def repair_due_state_drift(drift: DueStateDrift,
+                           batch_size: int = 500) -> None:
+    with transaction.atomic():
+        changed_vehicle_ids = set()
+        for work_ids in iter_chunks(drift.redundant, batch_size):
+            redundant = WorkDueState.objects.filter(work_id__in=work_ids)
+            changed_vehicle_ids.update(
+                redundant.values_list("vehicle_id", flat=True)
+            )
+            redundant.delete()
+        WorkDueState.objects.bulk_create(drift.missing,
+                                         batch_size=batch_size)
+        WorkDueState.objects.bulk_update(
+            drift.changed, DUE_STATE_FIELDS, batch_size=batch_size
+        )
+        changed_vehicle_ids.update(
+            due_state.vehicle_id
+            for due_state in drift.missing + drift.changed
+        )
+        bump_change_versions(*changed_vehicle_ids)
+
+
+def refresh_due_states(work_ids: Iterable[int],
+                       batch_size: int = 500) -> None:
+    """
+    Recomputes the due states of many works, used after bulk writes which
+    bypass the signals.
+    """
+    for works_chunk in iter_chunks(work_ids, batch_size):
+        repair_due_state_drift(
+            find_due_state_drift(Work.objects.filter(pk__in=works_chunk)),
+            batch_size=batch_size,
+        )
+
+
+def rebuild_due_states(batch_size: int = 500) -> int:
+    """
+    Recreates the whole due state table from the events history.
+    """
+    created_counter = 0
+    with transaction.atomic():
+        WorkDueState.objects.all().delete()
+        for due_states in iter_chunks(
+            iter_expected_due_states(Work.objects.all()), batch_size
+        ):
+            WorkDueState.objects.bulk_create(due_states)
+            created_counter += len(due_states)
+        bump_vehicles_change_versions(Vehicle.objects.all())
+    return created_counter
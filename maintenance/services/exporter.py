@@ -0,0 +1,117 @@
+import csv
+import json
+from typing import Iterator
+
+from django.db.models.query import QuerySet
+
+from maintenance.models import Event, MileageEvent, Vehicle
+from maintenance.services.importer import RecordType
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+HISTORY_FIELDS = (
+    "type",
+    "vin_code",
+    "date",
+    "mileage",
+    "work",
+    "part_price",
+    "work_price",
+    "note",
+    "period",
+    "first_date",
+    "min_mileage",
+    "readings_number",
+)
+
+
+class EchoBuffer:
+    """
+    File-like object which returns the written value instead of storing it.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_history_records(
+    vehicles: QuerySet[Vehicle], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[dict]:
+    """
+    Yields events and mileage events of the vehicles in the format read
+    by the history importer. Rows are fetched by chunks with the vehicle
+    and work columns joined in the same query.
+    """
+    vehicle_ids = vehicles.values("pk")
+    events = (
+        Event.objects.filter(vehicle__in=vehicle_ids)
+        .order_by("vehicle_id", "work_date", "pk")
+        .values_list(
+            "vehicle__vin_code",
+            "work_date",
+            "mileage",
+            "work__title",
+            "part_price",
+            "work_price",
+            "note",
+        )
+    )
+    for (vin_code, work_date, mileage, title,
+         part_price, work_price, note) in events.iterator(chunk_size):
+        yield {
+            "type": RecordType.EVENT,
+            "vin_code": vin_code,
+            "date": work_date.isoformat(),
+            "mileage": mileage,
+            "work": title,
+            "part_price": part_price,
+            "work_price": work_price,
+            "note": note,
+        }
+
+    # Compacted readings keep their period, the first reading and the
+    # number of the rolled up readings.
+    mileage_events = (
+        MileageEvent.objects.filter(vehicle__in=vehicle_ids)
+        .order_by("vehicle_id", "mileage_date", "pk")
+        .values_list(
+            "vehicle__vin_code",
+            "mileage_date",
+            "mileage",
+            "period",
+            "first_date",
+            "min_mileage",
+            "readings_number",
+        )
+    )
+    for (vin_code, mileage_date, mileage, period, first_date, min_mileage,
+         readings_number) in mileage_events.iterator(chunk_size):
+        yield {
+            "type": RecordType.MILEAGE,
+            "vin_code": vin_code,
+            "date": mileage_date.isoformat(),
+            "mileage": mileage,
+            "period": period,
+            "first_date": first_date.isoformat() if first_date else None,
+            "min_mileage": min_mileage,
+            "readings_number": readings_number,
+        }
+
+
+def iter_csv_lines(records: Iterator[dict]) -> Iterator[str]:
+    writer = csv.DictWriter(EchoBuffer(), fieldnames=HISTORY_FIELDS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+def iter_jsonl_lines(records: Iterator[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (iter_csv_lines, "text/csv"),
+    "jsonl": (iter_jsonl_lines, "application/jsonl"),
+}
@@ -0,0 +1,285 @@
+import datetime
+import itertools
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from maintenance.models import (
+    Vehicle,
+    VehicleScanState,
+    WorkAlert,
+    WorkAlertState,
+)
+from maintenance.services.maintenance import (
+    WorkTrigger,
+    get_fleet_maintenance_limits,
+)
+from maintenance.services.utils import iter_chunks
+
+
+logger = logging.getLogger(__name__)
+
+SCAN_CHUNK_SIZE = 1000
+DIGEST_BATCH_SIZE = 1000
+ALERT_TRIGGERS = (WorkTrigger.MILEAGE, WorkTrigger.DATE)
+
+
+@dataclass
+class ScanChunkResult:
+    # (vehicle_id, scanned_version, next_scan_date)
+    scan_states: list[tuple[int, int, datetime.date | None]] = field(
+        default_factory=list
+    )
+    # (work_id, vehicle_id, trigger)
+    alert_states: list[tuple[int, int, int]] = field(default_factory=list)
+    # (owner_id, vehicle_id, work_id, trigger, planed_mileage, planed_date)
+    alerts: list[tuple] = field(default_factory=list)
+    reset_work_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class ScanReport:
+    chunks: int = 0
+    vehicles: int = 0
+    alerts: int = 0
+
+
+def get_changed_vehicles(current_date: datetime.date) -> QuerySet[Vehicle]:
+    """
+    Vehicles to scan: never scanned, changed since the last scan or with
+    a date limit reached since then.
+    """
+    return Vehicle.objects.filter(
+        Q(scan_state__isnull=True)
+        | ~Q(scan_state__scanned_version=F("change_version"))
+        | Q(scan_state__next_scan_date__lte=current_date)
+    )
+
+
+def get_vehicle_id_ranges(
+    vehicles: QuerySet[Vehicle], chunk_size: int = SCAN_CHUNK_SIZE
+) -> list[tuple[int, int]]:
+    vehicle_ids = vehicles.order_by("pk").values_list("pk", flat=True)
+    return [
+        (chunk[0], chunk[-1])
+        for chunk in iter_chunks(vehicle_ids.iterator(), chunk_size)
+    ]
+
+
+def scan_vehicle_range(
+    first_id: int, last_id: int, current_date: datetime.date
+) -> ScanChunkResult:
+    """
+    Recomputes the schedules of the changed vehicles of the ID range and
+    returns the new trigger states and the alerts of the works which have
+    got a MILEAGE or DATE trigger. Runs in the worker processes, so it
+    only reads the database.
+    """
+    vehicles = list(
+        get_changed_vehicles(current_date).filter(
+            pk__gte=first_id, pk__lte=last_id
+        )
+    )
+    previous_triggers = {
+        work_id: trigger
+        for work_id, trigger in WorkAlertState.objects.filter(
+            vehicle__in=vehicles
+        ).values_list("work_id", "trigger")
+    }
+    result = ScanChunkResult()
+    for vehicle, planed_works in get_fleet_maintenance_limits(
+        vehicles, current_date=current_date
+    ).items():
+        next_scan_date = None
+        for planed_work in planed_works:
+            trigger = planed_work.trigger
+            work_id = planed_work.work.pk
+            if trigger == WorkTrigger.NONE and planed_work.planed_date:
+                next_scan_date = min(
+                    next_scan_date or planed_work.planed_date,
+                    planed_work.planed_date,
+                )
+            previous_trigger = previous_triggers.pop(
+                work_id, WorkTrigger.NONE.value
+            )
+            if previous_trigger == trigger.value:
+                continue
+            result.alert_states.append(
+                (work_id, vehicle.pk, trigger.value)
+            )
+            if trigger in ALERT_TRIGGERS:
+                result.alerts.append((
+                    vehicle.owner_id, vehicle.pk, work_id, trigger.value,
+                    planed_work.planed_mileage or None,
+                    planed_work.planed_date,
+                ))
+        result.scan_states.append(
+            (vehicle.pk, vehicle.change_version, next_scan_date)
+        )
+    # Works left without events or moved out of the maintenance type.
+    result.reset_work_ids = list(previous_triggers)
+    return result
+
+
+def get_upsert_options(unique_field: str, update_fields: list[str]) -> dict:
+    # MySQL updates on any unique key conflict and takes no target.
+    unique_fields = (
+        [unique_field]
+        if connection.features.supports_update_conflicts_with_target
+        else None
+    )
+    return {
+        "update_conflicts": True,
+        "unique_fields": unique_fields,
+        "update_fields": update_fields,
+    }
+
+
+def save_scan_result(result: ScanChunkResult) -> None:
+    with transaction.atomic():
+        WorkAlertState.objects.filter(
+            work_id__in=result.reset_work_ids
+        ).delete()
+        WorkAlertState.objects.bulk_create(
+            [
+                WorkAlertState(work_id=work_id, vehicle_id=vehicle_id,
+                               trigger=trigger)
+                for work_id, vehicle_id, trigger in result.alert_states
+            ],
+            **get_upsert_options("work", ["trigger"]),
+        )
+        VehicleScanState.objects.bulk_create(
+            [
+                VehicleScanState(vehicle_id=vehicle_id,
+                                 scanned_version=version,
+                                 next_scan_date=next_scan_date)
+                for vehicle_id, version, next_scan_date in result.scan_states
+            ],
+            **get_upsert_options(
+                "vehicle", ["scanned_version", "next_scan_date"]
+            ),
+        )
+        WorkAlert.objects.bulk_create(
+            WorkAlert(owner_id=owner_id, vehicle_id=vehicle_id,
+                      work_id=work_id, trigger=trigger,
+                      planed_mileage=planed_mileage,
+                      planed_date=planed_date)
+            for (owner_id, vehicle_id, work_id, trigger, planed_mileage,
+                 planed_date) in result.alerts
+        )
+
+
+def scan_fleet(
+    executor: Executor | None = None,
+    chunk_size: int = SCAN_CHUNK_SIZE,
+    current_date: datetime.date | None = None,
+) -> ScanReport:
+    """
+    Scans the changed vehicles by ID-range chunks, in the executor
+    processes when it is given. The results are written by the calling
+    process, one transaction per chunk.
+    """
+    current_date = current_date or timezone.now().date()
+    id_ranges = get_vehicle_id_ranges(
+        get_changed_vehicles(current_date), chunk_size
+    )
+    report = ScanReport()
+    if not id_ranges:
+        return report
+    results: Iterator[ScanChunkResult]
+    if executor is None:
+        results = (
+            scan_vehicle_range(first_id, last_id, current_date)
+            for first_id, last_id in id_ranges
+        )
+    else:
+        # Forked workers must not share the connection of this process.
+        connections.close_all()
+        first_ids, last_ids = zip(*id_ranges)
+        results = executor.map(
+            scan_vehicle_range, first_ids, last_ids,
+            itertools.repeat(current_date),
+        )
+    for result in results:
+        save_scan_result(result)
+        report.chunks += 1
+        report.vehicles += len(result.scan_states)
+        report.alerts += len(result.alerts)
+    return report
+
+
+def format_alert(alert: WorkAlert) -> str:
+    if alert.trigger == WorkTrigger.MILEAGE.value:
+        limit = f"mileage limit {alert.planed_mileage} km"
+    else:
+        limit = f"date limit {alert.planed_date}"
+    return (
+        f"{alert.vehicle} ({alert.vehicle.vin_code}): {alert.work}, "
+        f"{limit}"
+    )
+
+
+def send_alert_digests(batch_size: int = DIGEST_BATCH_SIZE) -> int:
+    """
+    Sends the unsent alerts as one digest per owner, by batches of owners.
+    The alerts are claimed by marking them as sent before sending, so a
+    retry after a failure can't send them twice, and concurrent senders
+    skip each other's alerts. Owners without email get the digest in the
+    log. Returns the number of digests.
+    """
+    digests_number = 0
+    while True:
+        owner_ids = list(
+            WorkAlert.objects.filter(sent_at__isnull=True)
+            .order_by("owner_id")
+            .values_list("owner_id", flat=True)
+            .distinct()[:batch_size]
+        )
+        if not owner_ids:
+            return digests_number
+        with transaction.atomic():
+            alert_ids = list(
+                WorkAlert.objects.select_for_update(skip_locked=True)
+                .filter(sent_at__isnull=True, owner_id__in=owner_ids)
+                .values_list("pk", flat=True)
+            )
+            WorkAlert.objects.filter(pk__in=alert_ids).update(
+                sent_at=timezone.now()
+            )
+        if not alert_ids:
+            # The alerts are being sent by another process.
+            return digests_number
+        alerts = list(
+            WorkAlert.objects.filter(pk__in=alert_ids)
+            .select_related("owner", "vehicle", "work")
+            .order_by("owner_id", "vehicle_id", "pk")
+        )
+        messages = []
+        for owner, owner_alerts in itertools.groupby(
+            alerts, key=lambda alert: alert.owner
+        ):
+            lines = "\n".join(format_alert(alert) for alert in owner_alerts)
+            digests_number += 1
+            if not owner.email:
+                logger.info("Digest of %s:\n%s", owner.username, lines)
+                continue
+            messages.append((
+                "Maintenance is due",
+                f"Maintenance is due for your vehicles:\n{lines}",
+                settings.DEFAULT_FROM_EMAIL,
+                [owner.email],
+            ))
+        try:
+            send_mass_mail(messages)
+        except Exception:
+            # The claim is released, so the next scan retries the digests.
+            WorkAlert.objects.filter(pk__in=alert_ids).update(sent_at=None)
+            raise
@@ -0,0 +1,109 @@
+import datetime
+
+import numpy as np
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from maintenance.models import Event, MileageEvent, Vehicle
+
+
+FORECAST_HISTORY_DAYS = 365
+MIN_READINGS_NUMBER = 2
+
+
+def get_odometer_readings(
+    vehicles: QuerySet[Vehicle] | list[int], since: datetime.date
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns vehicle ids, date ordinals and mileages of all odometer
+    readings (mileage events and events) of the vehicles since the date.
+    Vehicles are given by a queryset or by a list of ids.
+    """
+    vehicle_ids = vehicles
+    mileage_readings = MileageEvent.objects.filter(
+        vehicle__in=vehicle_ids, mileage_date__gte=since
+    ).values_list("vehicle_id", "mileage_date", "mileage")
+    event_readings = (
+        Event.objects.filter(vehicle__in=vehicle_ids, work_date__gte=since)
+        .order_by()
+        .values_list("vehicle_id", "work_date", "mileage")
+    )
+    readings = list(mileage_readings.union(event_readings, all=True))
+    readings_number = len(readings)
+    return (
+        np.fromiter(
+            (reading[0] for reading in readings), np.int64, readings_number
+        ),
+        np.fromiter(
+            (reading[1].toordinal() for reading in readings),
+            np.float64,
+            readings_number,
+        ),
+        np.fromiter(
+            (reading[2] for reading in readings), np.float64, readings_number
+        ),
+    )
+
+
+def fit_mileage_rates(
+    vehicles: QuerySet[Vehicle] | list[int],
+    current_date: datetime.date | None = None,
+    history_days: int = FORECAST_HISTORY_DAYS,
+) -> dict[int, float]:
+    """
+    Fits km/day rate of every vehicle by least squares over the odometer
+    readings of the last history_days. All vehicles are fitted at once,
+    vehicles without a positive rate are omitted.
+    """
+    current_date = current_date or timezone.now().date()
+    vehicle_ids, days, mileages = get_odometer_readings(
+        vehicles, current_date - datetime.timedelta(days=history_days)
+    )
+    if not vehicle_ids.size:
+        return {}
+
+    fitted_ids, groups = np.unique(vehicle_ids, return_inverse=True)
+    readings_numbers = np.bincount(groups)
+    mean_days = np.bincount(groups, weights=days) / readings_numbers
+    mean_mileages = np.bincount(groups, weights=mileages) / readings_numbers
+    days_deviations = days - mean_days[groups]
+    mileage_deviations = mileages - mean_mileages[groups]
+    days_variances = np.bincount(
+        groups, weights=days_deviations * days_deviations
+    )
+    covariances = np.bincount(
+        groups, weights=days_deviations * mileage_deviations
+    )
+
+    fitted = (readings_numbers >= MIN_READINGS_NUMBER) & (days_variances > 0)
+    rates = np.divide(
+        covariances,
+        days_variances,
+        out=np.zeros_like(covariances),
+        where=fitted,
+    )
+    fitted &= rates > 0
+    return dict(zip(fitted_ids[fitted].tolist(), rates[fitted].tolist()))
+
+
+def forecast_mileage_dates(
+    planed_mileages: np.ndarray,
+    current_mileages: np.ndarray,
+    rates: np.ndarray,
+    anchor_dates: np.ndarray,
+) -> list[datetime.date | None]:
+    """
+    Returns the dates when the planed mileages are reached with the given
+    rates, counting from the anchor date ordinals with current mileages.
+    """
+    # Rounding drops the float noise of the fitted rates before ceil.
+    due_ordinals = anchor_dates + np.ceil(
+        np.round((planed_mileages - current_mileages) / rates, 6)
+    )
+    reachable = (due_ordinals >= 1) & (
+        due_ordinals <= datetime.date.max.toordinal()
+    )
+    return [
+        datetime.date.fromordinal(int(ordinal)) if is_reachable else None
+        for ordinal, is_reachable in zip(due_ordinals, reachable)
+    ]
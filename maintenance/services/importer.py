@@ -0,0 +1,245 @@
+import csv
+import datetime
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+from django.db import transaction
+from django.utils import timezone
+
+from maintenance.models import Event, MileageEvent, Vehicle, Work
+from maintenance.services.due_state import refresh_due_states
+from maintenance.services.statistics import invalidate_work_statistics
+from maintenance.services.utils import iter_chunks
+from maintenance.services.versions import bump_change_versions
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+class RecordType:
+    EVENT = "event"
+    MILEAGE = "mileage"
+
+
+class RecordError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    events_created: int = 0
+    mileage_events_created: int = 0
+    errors_number: int = 0
+    updated_vehicles: int = 0
+    affected_works: set[int] = field(default_factory=set)
+
+
+@dataclass
+class ImportRecord:
+    line_number: int
+    record_type: str
+    vin_code: str
+    date: datetime.date
+    mileage: int
+    work_title: str = ""
+    part_price: float = 0.0
+    work_price: float = 0.0
+    note: str = ""
+    period: MileageEvent.Period = MileageEvent.Period.RAW
+    first_date: datetime.date | None = None
+    min_mileage: int | None = None
+    readings_number: int = 1
+
+
+def read_csv_rows(stream: TextIO) -> Iterator[tuple[int, Any]]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl_rows(stream: TextIO) -> Iterator[tuple[int, Any]]:
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_number, RecordError(f"invalid JSON: {error}")
+
+
+def parse_mileage_period(record: ImportRecord, row: dict) -> None:
+    """
+    Reads the period fields of the compacted readings, the readings
+    without them are raw ones.
+    """
+    period = str(row.get("period") or MileageEvent.Period.RAW).strip().upper()
+    if period not in MileageEvent.Period.values:
+        raise RecordError(f"unknown period {period!r}")
+    record.period = MileageEvent.Period(period)
+    if period == MileageEvent.Period.RAW:
+        return
+    record.first_date = datetime.date.fromisoformat(
+        str(row["first_date"]).strip()
+    )
+    record.min_mileage = int(row["min_mileage"])
+    record.readings_number = int(row.get("readings_number") or 1)
+
+
+def parse_record(line_number: int, row: Any) -> ImportRecord:
+    if isinstance(row, RecordError):
+        raise row
+    if not isinstance(row, dict):
+        raise RecordError("record is not an object")
+    record_type = str(row.get("type") or "").strip().lower()
+    if record_type not in (RecordType.EVENT, RecordType.MILEAGE):
+        raise RecordError(f"unknown record type {record_type!r}")
+    try:
+        record = ImportRecord(
+            line_number=line_number,
+            record_type=record_type,
+            vin_code=str(row["vin_code"]).strip().upper(),
+            date=datetime.date.fromisoformat(str(row["date"]).strip()),
+            mileage=int(row["mileage"]),
+        )
+        if record_type == RecordType.EVENT:
+            record.work_title = str(row["work"]).strip()
+            record.part_price = float(row.get("part_price") or 0)
+            record.work_price = float(row.get("work_price") or 0)
+            record.note = str(row.get("note") or "")
+        else:
+            parse_mileage_period(record, row)
+    except KeyError as error:
+        raise RecordError(f"missing field {error}") from error
+    except (TypeError, ValueError) as error:
+        raise RecordError(str(error)) from error
+    return record
+
+
+class HistoryImporter:
+    """
+    Imports events and mileage readings by chunks with bulk_create.
+    Vehicles and works are resolved by in-memory maps which are loaded
+    once per vehicle, the vehicle mileage is updated once at the end.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        on_error: Callable[[int, str], None] | None = None,
+    ) -> None:
+        self.chunk_size = chunk_size
+        self.on_error = on_error
+        self.report = ImportReport()
+        self.vehicle_ids: dict[str, int | None] = {}
+        self.work_ids: dict[int, dict[str, int]] = {}
+        self.max_mileages: dict[int, int] = {}
+
+    def report_error(self, line_number: int, message: str) -> None:
+        self.report.errors_number += 1
+        if self.on_error:
+            self.on_error(line_number, message)
+
+    def load_vehicles(self, vin_codes: Iterable[str]) -> None:
+        unknown_vin_codes = set(vin_codes) - self.vehicle_ids.keys()
+        if not unknown_vin_codes:
+            return
+        self.vehicle_ids.update(dict.fromkeys(unknown_vin_codes))
+        vehicles = Vehicle.objects.filter(
+            vin_code__in=unknown_vin_codes
+        ).values_list("vin_code", "pk")
+        new_vehicle_ids = []
+        for vin_code, vehicle_id in vehicles:
+            self.vehicle_ids[vin_code] = vehicle_id
+            new_vehicle_ids.append(vehicle_id)
+            self.work_ids[vehicle_id] = {}
+        works = Work.objects.filter(
+            vehicle__in=new_vehicle_ids
+        ).values_list("vehicle_id", "title", "pk")
+        for vehicle_id, title, work_id in works:
+            self.work_ids[vehicle_id].setdefault(title, work_id)
+
+    def build_history_object(
+        self, record: ImportRecord
+    ) -> Event | MileageEvent:
+        vehicle_id = self.vehicle_ids.get(record.vin_code)
+        if vehicle_id is None:
+            raise RecordError(f"unknown vehicle {record.vin_code}")
+        if record.record_type == RecordType.MILEAGE:
+            return MileageEvent(
+                vehicle_id=vehicle_id,
+                mileage_date=record.date,
+                mileage=record.mileage,
+                period=record.period,
+                first_date=record.first_date,
+                min_mileage=record.min_mileage,
+                readings_number=record.readings_number,
+            )
+        work_id = self.work_ids[vehicle_id].get(record.work_title)
+        if work_id is None:
+            raise RecordError(
+                f"unknown work {record.work_title!r} of {record.vin_code}"
+            )
+        return Event(
+            vehicle_id=vehicle_id,
+            work_id=work_id,
+            work_date=record.date,
+            mileage=record.mileage,
+            part_price=record.part_price,
+            work_price=record.work_price,
+            note=record.note,
+        )
+
+    def import_chunk(self, rows: list[tuple[int, Any]]) -> None:
+        records = []
+        for line_number, row in rows:
+            try:
+                records.append(parse_record(line_number, row))
+            except RecordError as error:
+                self.report_error(line_number, str(error))
+        self.load_vehicles(record.vin_code for record in records)
+
+        events = []
+        mileage_events = []
+        for record in records:
+            try:
+                history_object = self.build_history_object(record)
+            except RecordError as error:
+                self.report_error(record.line_number, str(error))
+                continue
+            if isinstance(history_object, Event):
+                events.append(history_object)
+                self.report.affected_works.add(history_object.work_id)
+            else:
+                mileage_events.append(history_object)
+            vehicle_id = history_object.vehicle_id
+            self.max_mileages[vehicle_id] = max(
+                self.max_mileages.get(vehicle_id, record.mileage),
+                record.mileage,
+            )
+
+        with transaction.atomic():
+            Event.objects.bulk_create(events)
+            MileageEvent.objects.bulk_create(mileage_events)
+        self.report.events_created += len(events)
+        self.report.mileage_events_created += len(mileage_events)
+
+    def update_vehicles_mileage(self) -> None:
+        current_date = timezone.now().date()
+        for vehicle_id, max_mileage in self.max_mileages.items():
+            self.report.updated_vehicles += Vehicle.objects.filter(
+                pk=vehicle_id, vehicle_mileage__lt=max_mileage
+            ).update(
+                vehicle_mileage=max_mileage,
+                vehicle_last_update_date=current_date,
+            )
+
+    def run(self, rows: Iterable[tuple[int, Any]]) -> ImportReport:
+        for chunk in iter_chunks(rows, self.chunk_size):
+            self.import_chunk(chunk)
+        self.update_vehicles_mileage()
+        # bulk_create skips the signals which drop the cached statistics.
+        refresh_due_states(self.report.affected_works)
+        invalidate_work_statistics(*self.report.affected_works)
+        bump_change_versions(*self.max_mileages)
+        return self.report
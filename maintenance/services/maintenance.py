@@ -1,14 +1,23 @@
 import datetime
 from dataclasses import dataclass
 from enum import Enum
+from functools import cached_property
+from typing import Iterable
 
+import numpy as np
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
+from django.db.models import F, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 from maintenance.models import Event, Vehicle, Work
+from maintenance.services.forecast import (
+    fit_mileage_rates,
+    forecast_mileage_dates,
+)
 
 
 class WorkTrigger(Enum):
@@ -41,6 +50,19 @@ class PlanedWork:
     last_event_date: datetime.date
     remaining_procentage: int
     current_event_counter: int
+    expected_mileage_date: datetime.date | None = None
+
+    @property
+    def expected_date(self) -> datetime.date | None:
+        """
+        Date of the trigger which fires first.
+        """
+        expected_dates = [
+            expected_date
+            for expected_date in (self.planed_date, self.expected_mileage_date)
+            if expected_date
+        ]
+        return min(expected_dates, default=None)
 
 
 @dataclass
@@ -49,91 +71,211 @@ class ExpiredEventsCounters:
     by_mileage: int
 
 
+@dataclass
+class VehicleExpiredEvents:
+    vehicle: Vehicle
+    expired_events: ExpiredEventsCounters
+
+
 CURRENT_VIEW_OPTIONS = ViewOptions(
     warning_procentage_value=80,
     deadline_procentage_value=95,
     view_only_important=False,
 )
+RECENT_EVENTS_NUMBER = 5
 
 
-def get_maintenance_limits(
-    vin_code: str, only_important: bool = False
-) -> list[PlanedWork]:
-    current_vehicle = get_object_or_404(Vehicle, vin_code=vin_code)
-    vehicle_events = current_vehicle.events.all()
-    worklist = []
+def annotate_last_events(works: QuerySet[Work]) -> QuerySet[Work]:
+    """
+    Annotates works with the date and mileage of the last event and the
+    number of events, computed by correlated subqueries in one query.
+    """
+    work_events = Event.objects.filter(
+        vehicle=OuterRef("vehicle"), work=OuterRef("pk")
+    )
+    last_work_events = work_events.order_by("-work_date", "-pk")
+    return works.annotate(
+        last_event_date=Subquery(last_work_events.values("work_date")[:1]),
+        last_event_mileage=Subquery(last_work_events.values("mileage")[:1]),
+        current_event_counter=Coalesce(
+            Subquery(
+                work_events.order_by()
+                .annotate(counter=Func(F("pk"), function="COUNT"))
+                .values("counter")
+            ),
+            0,
+        ),
+    )
+
+
+def annotate_due_states(works: QuerySet[Work]) -> QuerySet[Work]:
+    """
+    Annotates works with the precomputed due state, works without events
+    are excluded.
+    """
+    return works.filter(due_state__isnull=False).annotate(
+        last_event_date=F("due_state__last_event_date"),
+        last_event_mileage=F("due_state__last_event_mileage"),
+        current_event_counter=F("due_state__event_counter"),
+        planed_mileage=F("due_state__planed_mileage"),
+        planed_date=F("due_state__planed_date"),
+    )
+
+
+def get_work_limits(
+    work: Work, last_event_mileage: int, last_event_date: datetime.date
+) -> tuple[int | None, datetime.date | None]:
+    limit_mileage = None
+    limit_date = None
+    if work.interval_km:
+        limit_mileage = last_event_mileage + work.interval_km
+    if work.interval_month:
+        limit_date = last_event_date + relativedelta(
+            months=work.interval_month
+        )
+    return limit_mileage, limit_date
+
+
+def get_planed_work(
+    work: Work, vehicle_mileage: int, current_date: datetime.date
+) -> PlanedWork:
+    """
+    Builds PlanedWork from the work annotated by annotate_due_states.
+    """
     limit_mileage = 0
     mileage_delta = 0
     mileage_remaining_procentage = 0
-    limit_date = None
     date_delta = None
+    limit_date = work.planed_date if work.interval_month else None
 
-    for current_work in Work.objects.filter(
-        vehicle__vin_code=vin_code, work_type=Work.WorkType.MAINTENANCE
-    ):
-        current_event_list: Event = vehicle_events.filter(
-            work=current_work
-        ).order_by("-work_date")
-        current_event_counter = current_event_list.count()
-        last_event = current_event_list.first()
-        if not last_event:
-            continue
-        if current_work.interval_km:
-            limit_mileage = last_event.mileage + current_work.interval_km
-            mileage_delta = limit_mileage - current_vehicle.vehicle_mileage
-            mileage_remaining_procentage = 100 - round(
-                (mileage_delta / current_work.interval_km) * 100
-            )
-        if current_work.interval_month:
-            limit_date = last_event.work_date + relativedelta(
-                months=current_work.interval_month
-            )
-            date_delta = timezone.now().date() - limit_date
-
-        if (
-            current_work.interval_km
-            and current_vehicle.vehicle_mileage >= limit_mileage
-        ):
-            work_triger = WorkTrigger.MILEAGE
-        elif (
-            current_work.interval_month and timezone.now().date() >= limit_date
-        ):
-            work_triger = WorkTrigger.DATE
-        else:
-            work_triger = WorkTrigger.NONE
-        current_planned_work_instance = PlanedWork(
-            work=current_work,
-            trigger=work_triger,
-            planed_mileage=limit_mileage,
-            mileage_delta=mileage_delta,
-            planed_date=limit_date,
-            date_delta=date_delta,
-            last_event_date=last_event.work_date,
-            remaining_procentage=mileage_remaining_procentage,
-            current_event_counter=current_event_counter,
+    has_mileage_limit = bool(work.interval_km) and (
+        work.planed_mileage is not None
+    )
+    if has_mileage_limit:
+        limit_mileage = work.planed_mileage
+        mileage_delta = limit_mileage - vehicle_mileage
+        mileage_remaining_procentage = 100 - round(
+            (mileage_delta / work.interval_km) * 100
         )
-        if only_important and (
-            not work_triger == WorkTrigger.NONE
-            or mileage_remaining_procentage >= CURRENT_VIEW_OPTIONS.warning_procentage_value
-        ):
-            worklist.append(current_planned_work_instance)
-        elif not only_important:
-            worklist.append(current_planned_work_instance)
-        else:
-            continue
+    if limit_date:
+        date_delta = current_date - limit_date
+
+    if has_mileage_limit and vehicle_mileage >= limit_mileage:
+        work_triger = WorkTrigger.MILEAGE
+    elif limit_date and current_date >= limit_date:
+        work_triger = WorkTrigger.DATE
+    else:
+        work_triger = WorkTrigger.NONE
+
+    return PlanedWork(
+        work=work,
+        trigger=work_triger,
+        planed_mileage=limit_mileage,
+        mileage_delta=mileage_delta,
+        planed_date=limit_date,
+        date_delta=date_delta,
+        last_event_date=work.last_event_date,
+        remaining_procentage=mileage_remaining_procentage,
+        current_event_counter=work.current_event_counter,
+    )
 
+
+def is_important(planed_work: PlanedWork) -> bool:
+    return (
+        not planed_work.trigger == WorkTrigger.NONE
+        or planed_work.remaining_procentage
+        >= CURRENT_VIEW_OPTIONS.warning_procentage_value
+    )
+
+
+def sort_planed_works(worklist: Iterable[PlanedWork]) -> list[PlanedWork]:
     return sorted(
         worklist,
-        key=lambda work: (work.trigger.value, work.remaining_procentage),
-        reverse=True,
+        key=lambda work: (
+            -work.trigger.value,
+            work.expected_date or datetime.date.max,
+            -work.remaining_procentage,
+        ),
     )
 
 
-def get_counters_of_expired_events(vin_code: str) -> ExpiredEventsCounters:
-    maintenance_limits = get_maintenance_limits(vin_code=vin_code)
+def apply_mileage_forecast(
+    fleet_worklist: dict[Vehicle, list[PlanedWork]],
+    mileage_rates: dict[int, float],
+) -> None:
+    """
+    Sets the expected dates of the mileage limits of the planed works
+    from the fitted km/day rates of their vehicles.
+    """
+    forecasted_works = []
+    forecast_arguments = []
+    for vehicle, worklist in fleet_worklist.items():
+        mileage_rate = mileage_rates.get(vehicle.pk)
+        if not mileage_rate:
+            continue
+        for planed_work in worklist:
+            if not planed_work.work.interval_km:
+                continue
+            forecasted_works.append(planed_work)
+            forecast_arguments.append((
+                planed_work.planed_mileage,
+                vehicle.vehicle_mileage,
+                mileage_rate,
+                vehicle.vehicle_last_update_date.toordinal(),
+            ))
+    if not forecasted_works:
+        return
+
+    expected_dates = forecast_mileage_dates(
+        *np.array(forecast_arguments, dtype=np.float64).T
+    )
+    for planed_work, expected_date in zip(forecasted_works, expected_dates):
+        planed_work.expected_mileage_date = expected_date
+
+
+def get_vehicle_maintenance_limits(
+    vehicle: Vehicle,
+    current_date: datetime.date | None = None,
+    forecast: bool = False,
+) -> list[PlanedWork]:
+    current_date = current_date or timezone.now().date()
+    maintenance_works = annotate_due_states(
+        Work.objects.filter(
+            vehicle=vehicle, work_type=Work.WorkType.MAINTENANCE
+        )
+    )
+    worklist = [
+        get_planed_work(current_work, vehicle.vehicle_mileage, current_date)
+        for current_work in maintenance_works
+    ]
+    if forecast:
+        apply_mileage_forecast(
+            {vehicle: worklist},
+            fit_mileage_rates([vehicle.pk], current_date),
+        )
+
+    return sort_planed_works(worklist)
+
+
+def get_maintenance_limits(
+    vin_code: str, only_important: bool = False
+) -> list[PlanedWork]:
+    current_vehicle = get_object_or_404(Vehicle, vin_code=vin_code)
+    worklist = get_vehicle_maintenance_limits(current_vehicle)
+    if only_important:
+        return [
+            planed_work for planed_work in worklist
+            if is_important(planed_work)
+        ]
+    return worklist
+
+
+def count_expired_events(
+    planed_works: Iterable[PlanedWork],
+) -> ExpiredEventsCounters:
     number_of_expired_by_date = 0
     number_of_expired_by_mileage = 0
-    for limit in maintenance_limits:
+    for limit in planed_works:
         if limit.trigger == WorkTrigger.DATE:
             number_of_expired_by_date += 1
         elif limit.trigger == WorkTrigger.MILEAGE:
@@ -145,11 +287,93 @@ def get_counters_of_expired_events(vin_code: str) -> ExpiredEventsCounters:
     )
 
 
-def get_outdate_mileage_level(vin_code: str) -> int:
-    current_date = timezone.now().date()
-    current_vehicle = get_object_or_404(Vehicle, vin_code=vin_code)
+def get_counters_of_expired_events(vin_code: str) -> ExpiredEventsCounters:
+    return count_expired_events(get_maintenance_limits(vin_code=vin_code))
+
+
+def get_fleet_maintenance_limits(
+    vehicles: QuerySet[Vehicle] | list[Vehicle],
+    forecast: bool = False,
+    current_date: datetime.date | None = None,
+) -> dict[Vehicle, list[PlanedWork]]:
+    """
+    Returns the planed works of every vehicle of the queryset or of the
+    list of loaded vehicles. Works of all vehicles are fetched by one
+    query, the mileage rates of all vehicles are fitted by one more query.
+    """
+    vehicles_by_pk = {vehicle.pk: vehicle for vehicle in vehicles}
+    vehicle_ids = (
+        vehicles if isinstance(vehicles, QuerySet)
+        else list(vehicles_by_pk)
+    )
+    current_date = current_date or timezone.now().date()
+    maintenance_works = annotate_due_states(
+        Work.objects.filter(
+            vehicle__in=vehicle_ids,
+            work_type=Work.WorkType.MAINTENANCE,
+        )
+    )
+
+    fleet_worklist: dict[Vehicle, list[PlanedWork]] = {
+        vehicle: [] for vehicle in vehicles_by_pk.values()
+    }
+    for current_work in maintenance_works:
+        current_vehicle = vehicles_by_pk.get(current_work.vehicle_id)
+        if current_vehicle is None:
+            continue
+        fleet_worklist[current_vehicle].append(
+            get_planed_work(
+                current_work, current_vehicle.vehicle_mileage, current_date
+            )
+        )
+    if forecast:
+        apply_mileage_forecast(
+            fleet_worklist, fit_mileage_rates(vehicle_ids, current_date)
+        )
+
+    return {
+        vehicle: sort_planed_works(worklist)
+        for vehicle, worklist in fleet_worklist.items()
+    }
+
+
+def get_fleet_expired_events(
+    vehicles: QuerySet[Vehicle],
+) -> list[VehicleExpiredEvents]:
+    """
+    Returns counters of expired events for every vehicle of the queryset,
+    the most urgent vehicles first.
+    """
+    return sort_by_urgency(
+        VehicleExpiredEvents(
+            vehicle=vehicle,
+            expired_events=count_expired_events(planed_works),
+        )
+        for vehicle, planed_works in get_fleet_maintenance_limits(
+            vehicles
+        ).items()
+    )
+
+
+def sort_by_urgency(
+    fleet_expired_events: Iterable[VehicleExpiredEvents],
+) -> list[VehicleExpiredEvents]:
+    return sorted(
+        fleet_expired_events,
+        key=lambda item: (
+            item.expired_events.by_date + item.expired_events.by_mileage,
+            item.expired_events.by_mileage,
+        ),
+        reverse=True,
+    )
+
+
+def get_vehicle_outdate_mileage_level(
+    vehicle: Vehicle, current_date: datetime.date | None = None
+) -> int:
+    current_date = current_date or timezone.now().date()
     mileage_date_timedelta = (
-        current_date - current_vehicle.vehicle_last_update_date
+        current_date - vehicle.vehicle_last_update_date
     ).days
     outofdate_level = OutOfDateMileageLevel.FRESH
     if (
@@ -164,13 +388,64 @@ def get_outdate_mileage_level(vin_code: str) -> int:
     return outofdate_level.value
 
 
-def get_average_mileage_interval(events_list: QuerySet) -> int:
-    event_counter = events_list.count()
-    previous_mileage = events_list.first().mileage
-    mileage_delta_sum = 0
-    if event_counter <= 1:
-        return 0
-    for event in events_list:
-        mileage_delta_sum += previous_mileage - event.mileage
-        previous_mileage = event.mileage
-    return mileage_delta_sum // (event_counter - 1)
+def get_outdate_mileage_level(vin_code: str) -> int:
+    current_vehicle = get_object_or_404(Vehicle, vin_code=vin_code)
+    return get_vehicle_outdate_mileage_level(current_vehicle)
+
+
+def get_recent_events(vehicle: Vehicle) -> QuerySet[Event]:
+    return (
+        Event.objects.filter(vehicle=vehicle)
+        .select_related("work")
+        .order_by("-work_date", "-pk")[:RECENT_EVENTS_NUMBER]
+    )
+
+
+class VehicleSchedule:
+    """
+    Maintenance schedule of the loaded vehicle. The planed works are
+    fetched once, on first access, and everything else is derived from
+    them without touching the database again.
+    """
+
+    def __init__(
+        self,
+        vehicle: Vehicle,
+        current_date: datetime.date | None = None,
+        planed_works: list[PlanedWork] | None = None,
+    ) -> None:
+        self.vehicle = vehicle
+        self.current_date = current_date or timezone.now().date()
+        if planed_works is not None:
+            self.planed_works = planed_works
+
+    @cached_property
+    def planed_works(self) -> list[PlanedWork]:
+        return get_vehicle_maintenance_limits(
+            self.vehicle, self.current_date, forecast=True
+        )
+
+    @cached_property
+    def important_works(self) -> list[PlanedWork]:
+        return [
+            planed_work for planed_work in self.planed_works
+            if is_important(planed_work)
+        ]
+
+    @cached_property
+    def expired_events(self) -> ExpiredEventsCounters:
+        return count_expired_events(self.planed_works)
+
+    @cached_property
+    def outdate_mileage_level(self) -> int:
+        return get_vehicle_outdate_mileage_level(
+            self.vehicle, self.current_date
+        )
+
+    def get_planed_works(
+        self, only_important: bool = False
+    ) -> list[PlanedWork]:
+        if only_important:
+            return self.important_works
+        return self.planed_works
+
@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+
+from maintenance.models import (
+    Vehicle,
+    Work,
+    WorkPattern,
+    build_pattern_works,
+)
+from maintenance.services.importer import RecordError
+from maintenance.services.utils import iter_chunks
+
+
+ONBOARDING_CHUNK_SIZE = 500
+WORKS_BATCH_SIZE = 1000
+VEHICLE_FIELDS = (
+    "vin_code",
+    "vehicle_manufacturer",
+    "vehicle_model",
+    "vehicle_body",
+    "vehicle_year",
+    "vehicle_mileage",
+)
+
+
+@dataclass
+class OnboardingReport:
+    vehicles_created: int = 0
+    works_created: int = 0
+    errors_number: int = 0
+
+
+def build_vehicle(owner: User, row: Any) -> Vehicle:
+    if isinstance(row, RecordError):
+        raise row
+    if not isinstance(row, dict):
+        raise RecordError("record is not an object")
+    try:
+        vehicle = Vehicle(
+            owner=owner,
+            **{field: str(row[field]).strip() for field in VEHICLE_FIELDS},
+        )
+    except KeyError as error:
+        raise RecordError(f"missing field {error}") from error
+    vehicle.vin_code = vehicle.vin_code.upper()
+    try:
+        # Only the field validators, the VIN uniqueness is checked by
+        # chunks.
+        vehicle.clean_fields(exclude=["owner"])
+    except ValidationError as error:
+        raise RecordError(
+            "; ".join(
+                f"{field}: {' '.join(messages)}"
+                for field, messages in error.message_dict.items()
+            )
+        ) from error
+    return vehicle
+
+
+def bulk_create_vehicles(vehicles: list[Vehicle]) -> list[Vehicle]:
+    """
+    Creates the vehicles by one bulk_create and sets their keys. The
+    backends which do not return the inserted rows, like MySQL, get the
+    keys by the VIN codes.
+    """
+    created_vehicles = Vehicle.objects.bulk_create(vehicles)
+    features = connections[Vehicle.objects.db].features
+    if features.can_return_rows_from_bulk_insert:
+        return created_vehicles
+    vehicle_ids = dict(
+        Vehicle.objects.filter(
+            vin_code__in=[vehicle.vin_code for vehicle in created_vehicles]
+        ).values_list("vin_code", "pk")
+    )
+    for vehicle in created_vehicles:
+        vehicle.pk = vehicle_ids[vehicle.vin_code]
+    return created_vehicles
+
+
+class VehicleOnboarder:
+    """
+    Creates vehicles of the owner by chunks with bulk_create, so the
+    post_save signal is not sent. The work patterns are loaded once and
+    the works of all vehicles of a chunk are created by one bulk_create.
+    """
+
+    def __init__(
+        self,
+        owner: User,
+        chunk_size: int = ONBOARDING_CHUNK_SIZE,
+        on_error: Callable[[int, str], None] | None = None,
+    ) -> None:
+        self.owner = owner
+        self.chunk_size = chunk_size
+        self.on_error = on_error
+        self.report = OnboardingReport()
+        self.work_patterns = list(WorkPattern.objects.all())
+
+    def report_error(self, line_number: int, message: str) -> None:
+        self.report.errors_number += 1
+        if self.on_error:
+            self.on_error(line_number, message)
+
+    def onboard_chunk(self, rows: list[tuple[int, Any]]) -> None:
+        vehicles = {}
+        for line_number, row in rows:
+            try:
+                vehicle = build_vehicle(self.owner, row)
+            except RecordError as error:
+                self.report_error(line_number, str(error))
+                continue
+            if vehicle.vin_code in vehicles:
+                self.report_error(
+                    line_number, f"duplicate vehicle {vehicle.vin_code}"
+                )
+                continue
+            vehicles[vehicle.vin_code] = (line_number, vehicle)
+        existing_vin_codes = Vehicle.objects.filter(
+            vin_code__in=vehicles
+        ).values_list("vin_code", flat=True)
+        for vin_code in existing_vin_codes:
+            line_number, _ = vehicles.pop(vin_code)
+            self.report_error(line_number, f"vehicle {vin_code} exists")
+        if not vehicles:
+            return
+
+        with transaction.atomic():
+            created_vehicles = bulk_create_vehicles(
+                [vehicle for _, vehicle in vehicles.values()]
+            )
+            works = Work.objects.bulk_create(
+                build_pattern_works(created_vehicles, self.work_patterns),
+                batch_size=WORKS_BATCH_SIZE,
+            )
+        self.report.vehicles_created += len(created_vehicles)
+        self.report.works_created += len(works)
+
+    def run(self, rows: Iterable[tuple[int, Any]]) -> OnboardingReport:
+        for chunk in iter_chunks(rows, self.chunk_size):
+            self.onboard_chunk(chunk)
+        return self.report
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models.query import QuerySet
+
+from maintenance.models import Vehicle, Work, WorkPattern, build_pattern_works
+from maintenance.services.due_state import refresh_due_states
+from maintenance.services.utils import iter_chunks
+from maintenance.services.versions import bump_change_versions
+
+
+PATTERN_SYNC_CHUNK_SIZE = 500
+WORKS_BATCH_SIZE = 1000
+PATTERN_FIELDS = ("interval_month", "interval_km")
+
+
+@dataclass
+class PatternSyncReport:
+    works_updated: int = 0
+    works_linked: int = 0
+    works_created: int = 0
+    vehicles_affected: int = 0
+    chunks: int = 0
+
+
+def sync_vehicles_chunk(vehicle_ids: list[int],
+                        patterns: list[WorkPattern], create_missing: bool,
+                        report: PatternSyncReport) -> None:
+    """
+    Applies the pattern intervals to the maintenance works of the vehicles
+    in one transaction. Unlinked works with a pattern title are linked to
+    it, vehicles without a work of a pattern get one when create_missing.
+    A missing work may have been deleted by the owner, so they are only
+    created on request.
+    """
+    patterns_by_pk = {pattern.pk: pattern for pattern in patterns}
+    # The first pattern of a title wins, as in the linking migration.
+    patterns_by_title = {
+        pattern.title: pattern for pattern in reversed(patterns)
+    }
+    with transaction.atomic():
+        works = Work.objects.filter(
+            vehicle_id__in=vehicle_ids,
+            work_type=Work.WorkType.MAINTENANCE,
+        ).only("vehicle_id", "title", "pattern_id", *PATTERN_FIELDS)
+        changed_works: list[Work] = []
+        linked_works: list[Work] = []
+        linked_patterns: dict[int, set[int]] = {
+            vehicle_id: set() for vehicle_id in vehicle_ids
+        }
+        for work in works:
+            pattern = patterns_by_pk.get(work.pattern_id)
+            if work.pattern_id is None:
+                pattern = patterns_by_title.get(work.title)
+                if pattern is None:
+                    continue
+                work.pattern = pattern
+                linked_works.append(work)
+            if pattern is None:
+                continue
+            linked_patterns[work.vehicle_id].add(pattern.pk)
+            if any(getattr(work, field_name) != getattr(pattern, field_name)
+                   for field_name in PATTERN_FIELDS):
+                for field_name in PATTERN_FIELDS:
+                    setattr(work, field_name, getattr(pattern, field_name))
+                changed_works.append(work)
+
+        updated_works = {work.pk: work for work in linked_works}
+        updated_works.update((work.pk, work) for work in changed_works)
+        Work.objects.bulk_update(updated_works.values(),
+                                 ("pattern", *PATTERN_FIELDS),
+                                 batch_size=WORKS_BATCH_SIZE)
+        new_works: list[Work] = []
+        if create_missing:
+            for vehicle_id, pattern_ids in linked_patterns.items():
+                new_works += build_pattern_works(
+                    [Vehicle(pk=vehicle_id)],
+                    [pattern for pattern in patterns
+                     if pattern.pk not in pattern_ids],
+                )
+            Work.objects.bulk_create(new_works,
+                                     batch_size=WORKS_BATCH_SIZE)
+
+        # Only the changed intervals move the planed dates and mileages,
+        # the new works have no events yet. Linking alone leaves the
+        # schedules as they are.
+        refresh_due_states([work.pk for work in changed_works])
+        affected_vehicle_ids = {
+            work.vehicle_id for work in [*changed_works, *new_works]
+        }
+        bump_change_versions(*affected_vehicle_ids)
+    report.works_updated += len(changed_works)
+    report.works_linked += len(linked_works)
+    report.works_created += len(new_works)
+    report.vehicles_affected += len(affected_vehicle_ids)
+    report.chunks += 1
+
+
+def sync_work_patterns(
+    patterns: QuerySet[WorkPattern] | None = None,
+    vehicles: QuerySet[Vehicle] | None = None,
+    create_missing: bool = False,
+    chunk_size: int = PATTERN_SYNC_CHUNK_SIZE,
+) -> PatternSyncReport:
+    """
+    Propagates the patterns to the works of the vehicles, chunk by chunk
+    of vehicles, each in its own transaction. Only the vehicles whose
+    works changed get new change versions.
+    """
+    if patterns is None:
+        patterns = WorkPattern.objects.all()
+    if vehicles is None:
+        vehicles = Vehicle.objects.all()
+    patterns = list(patterns.order_by("pk"))
+    report = PatternSyncReport()
+    if not patterns:
+        return report
+    vehicle_ids = list(
+        vehicles.order_by("pk").values_list("pk", flat=True)
+    )
+    for vehicle_ids_chunk in iter_chunks(vehicle_ids, chunk_size):
+        sync_vehicles_chunk(vehicle_ids_chunk, patterns, create_missing,
+                            report)
+    return report
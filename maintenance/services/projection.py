@@ -0,0 +1,252 @@
+import datetime
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.db.models import Avg, F, Q
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from maintenance.models import Event, Vehicle, Work
+from maintenance.services.forecast import fit_mileage_rates
+
+
+PLAN_YEARS = 5
+MAX_PLAN_YEARS = 10
+AVERAGE_MONTH_DAYS = 365.2425 / 12
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+@dataclass
+class PlanWorks:
+    """
+    Projection rules of the works as arrays of equal length. Missing
+    values are NaN, intervals which are not set are zero.
+    """
+    work_ids: np.ndarray
+    vehicle_ids: np.ndarray
+    interval_months: np.ndarray
+    interval_km: np.ndarray
+    planed_dates: np.ndarray
+    planed_mileages: np.ndarray
+    vehicle_mileages: np.ndarray
+    update_dates: np.ndarray
+    mileage_rates: np.ndarray
+    costs: np.ndarray
+
+
+@dataclass
+class MonthlyTotal:
+    month: datetime.date
+    occurrences: int
+    cost: float
+
+
+@dataclass
+class MaintenancePlan:
+    """
+    Expected occurrences of the works between the dates ordered by date,
+    as arrays of equal length.
+    """
+    start_date: datetime.date
+    end_date: datetime.date
+    vehicle_ids: np.ndarray
+    work_ids: np.ndarray
+    dates: np.ndarray
+    costs: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def get_monthly_totals(
+        self, vehicle_ids: Iterable[int] | None = None
+    ) -> list[MonthlyTotal]:
+        """
+        Returns the number and the cost of the occurrences of every month
+        of the plan, optionally of the given vehicles only.
+        """
+        selected: slice | np.ndarray = slice(None)
+        if vehicle_ids is not None:
+            selected = np.isin(self.vehicle_ids, list(vehicle_ids))
+        first_month = np.datetime64(self.start_date, "M")
+        months_number = int(
+            (np.datetime64(self.end_date, "M") - first_month).astype(int)
+        ) + 1
+        offsets = (
+            self.dates[selected].astype("datetime64[M]") - first_month
+        ).astype(np.int64)
+        occurrences = np.bincount(offsets, minlength=months_number)
+        costs = np.bincount(
+            offsets, weights=self.costs[selected], minlength=months_number
+        )
+        months = first_month + np.arange(months_number)
+        return [
+            MonthlyTotal(month=month, occurrences=number, cost=round(cost, 2))
+            for month, number, cost in zip(
+                months.astype("datetime64[D]").tolist(),
+                occurrences.tolist(),
+                costs.tolist(),
+            )
+        ]
+
+
+def load_plan_works(
+    vehicles: QuerySet[Vehicle] | list[int], current_date: datetime.date
+) -> PlanWorks:
+    """
+    Loads the works with events and interval rules of the vehicles, the
+    average prices of their events and the mileage rates of the vehicles
+    by three queries.
+    """
+    works = Work.objects.filter(
+        Q(interval_month__gt=0) | Q(interval_km__gt=0),
+        vehicle__in=vehicles,
+        due_state__isnull=False,
+    ).values_list(
+        "pk",
+        "vehicle_id",
+        "interval_month",
+        "interval_km",
+        "due_state__planed_date",
+        "due_state__planed_mileage",
+        "vehicle__vehicle_mileage",
+        "vehicle__vehicle_last_update_date",
+    )
+    costs = dict(
+        Event.objects.filter(vehicle__in=vehicles)
+        .order_by()
+        .values("work")
+        .annotate(cost=Avg(F("part_price") + F("work_price")))
+        .values_list("work", "cost")
+    )
+    mileage_rates = fit_mileage_rates(vehicles, current_date)
+    rows = [
+        (
+            work_id,
+            vehicle_id,
+            interval_month or 0,
+            interval_km or 0,
+            planed_date.toordinal() if planed_date else np.nan,
+            np.nan if planed_mileage is None else planed_mileage,
+            vehicle_mileage,
+            update_date.toordinal(),
+            mileage_rates.get(vehicle_id, np.nan),
+            costs.get(work_id) or 0.0,
+        )
+        for (work_id, vehicle_id, interval_month, interval_km, planed_date,
+             planed_mileage, vehicle_mileage, update_date) in works
+    ]
+    columns = np.array(rows, dtype=np.float64).reshape(-1, 10).T
+    return PlanWorks(
+        columns[0].astype(np.int64),
+        columns[1].astype(np.int64),
+        *columns[2:],
+    )
+
+
+def project_plan(plan_works: PlanWorks, start_date: datetime.date,
+                 end_date: datetime.date) -> MaintenancePlan:
+    """
+    Projects the occurrences of the works up to the end date. The first
+    one is due by the trigger which fires first (overdue works are due
+    at the start date), the next ones follow by the shorter of the month
+    interval and the days the vehicle needs for the kilometer interval.
+    All occurrences are computed at once over flat arrays.
+    """
+    start = start_date.toordinal()
+    end = end_date.toordinal()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        by_mileage = (plan_works.interval_km > 0) & (
+            plan_works.mileage_rates > 0
+        )
+        by_date = plan_works.interval_months > 0
+        # Rounding drops the float noise of the fitted rates before ceil.
+        mileage_due = np.where(
+            by_mileage & ~np.isnan(plan_works.planed_mileages),
+            plan_works.update_dates + np.ceil(np.round(
+                (plan_works.planed_mileages - plan_works.vehicle_mileages)
+                / plan_works.mileage_rates, 6
+            )),
+            np.inf,
+        )
+        date_due = np.where(by_date, plan_works.planed_dates, np.inf)
+        date_due = np.where(np.isnan(date_due), np.inf, date_due)
+        step_days = np.where(
+            by_mileage, plan_works.interval_km / plan_works.mileage_rates,
+            np.inf,
+        )
+    first = np.maximum(np.minimum(mileage_due, date_due), start)
+    month_steps = by_date & (
+        plan_works.interval_months * AVERAGE_MONTH_DAYS <= step_days
+    )
+    step_days = np.where(
+        month_steps, plan_works.interval_months * AVERAGE_MONTH_DAYS,
+        np.maximum(step_days, 1),
+    )
+    projected = np.isfinite(first) & (first <= end)
+    # The month steps may land a few days later than the average month,
+    # the surplus occurrences are dropped with the ones after the end.
+    counts = np.zeros(len(first), dtype=np.int64)
+    counts[projected] = (
+        np.floor(np.round(
+            (end - first[projected]) / step_days[projected], 6
+        )) + 1 + month_steps[projected]
+    ).astype(np.int64)
+
+    indexes = np.repeat(np.arange(len(first)), counts)
+    steps = np.arange(counts.sum()) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    first_dates = (
+        first[indexes].astype(np.int64) - EPOCH_ORDINAL
+    ).astype("datetime64[D]")
+    first_months = first_dates.astype("datetime64[M]")
+    months = first_months + (
+        steps * plan_works.interval_months[indexes].astype(np.int64)
+    ).astype("timedelta64[M]")
+    # The day of the month is kept and limited by the length of the month.
+    month_dates = np.minimum(
+        months.astype("datetime64[D]") + (
+            first_dates - first_months.astype("datetime64[D]")
+        ),
+        (months + 1).astype("datetime64[D]") - 1,
+    )
+    day_dates = first_dates + np.ceil(
+        np.round(steps * step_days[indexes], 6)
+    ).astype("timedelta64[D]")
+    dates = np.where(month_steps[indexes], month_dates, day_dates)
+
+    in_plan = dates <= np.datetime64(end_date, "D")
+    indexes = indexes[in_plan]
+    dates = dates[in_plan]
+    order = np.lexsort((plan_works.work_ids[indexes], dates))
+    indexes = indexes[order]
+    return MaintenancePlan(
+        start_date=start_date,
+        end_date=end_date,
+        vehicle_ids=plan_works.vehicle_ids[indexes],
+        work_ids=plan_works.work_ids[indexes],
+        dates=dates[order],
+        costs=plan_works.costs[indexes],
+    )
+
+
+def get_maintenance_plan(
+    vehicles: QuerySet[Vehicle] | list[int],
+    years: int = PLAN_YEARS,
+    current_date: datetime.date | None = None,
+) -> MaintenancePlan:
+    """
+    Projects every work with interval rules of the vehicles the given
+    number of years forward from its last event. Occurrences are costed
+    by the average prices of the previous events of the work.
+    """
+    current_date = current_date or timezone.now().date()
+    end_date = (
+        current_date + relativedelta(years=years)
+        - datetime.timedelta(days=1)
+    )
+    return project_plan(
+        load_plan_works(vehicles, current_date), current_date, end_date
+    )
@@ -0,0 +1,147 @@
+import datetime
+from dataclasses import dataclass
+from typing import Iterable
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from maintenance.models import Vehicle
+from maintenance.services.maintenance import (
+    ExpiredEventsCounters,
+    PlanedWork,
+    VehicleExpiredEvents,
+    VehicleSchedule,
+    get_fleet_maintenance_limits,
+    sort_by_urgency,
+)
+from maintenance.services.utils import iter_chunks
+
+
+SCHEDULE_CACHE_HITS_KEY = "schedule_cache:hits"
+SCHEDULE_CACHE_MISSES_KEY = "schedule_cache:misses"
+SCHEDULE_MISSES_CHUNK_SIZE = 500
+
+
+@dataclass
+class CachedSchedule:
+    planed_works: list[PlanedWork]
+    expired_events: ExpiredEventsCounters
+
+
+def get_schedule_key(vehicle: Vehicle,
+                     current_date: datetime.date) -> str:
+    return (
+        f"schedule:{vehicle.pk}:{vehicle.change_version}:"
+        f"{current_date.isoformat()}"
+    )
+
+
+def get_schedule_etag(vehicle: Vehicle,
+                      current_date: datetime.date) -> str:
+    """
+    Strong ETag of the schedule, which changes together with the cache key.
+    """
+    return (
+        f'"{vehicle.pk}-{vehicle.change_version}-'
+        f'{current_date.isoformat()}"'
+    )
+
+
+def get_seconds_until_midnight() -> int:
+    """
+    Seconds until the date of timezone.now(), which the schedule is
+    computed for, changes.
+    """
+    now = timezone.now()
+    midnight = datetime.datetime.combine(
+        now.date() + datetime.timedelta(days=1), datetime.time(),
+        tzinfo=now.tzinfo,
+    )
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def count_schedule_cache_access(hits: int, misses: int) -> None:
+    for key, delta in ((SCHEDULE_CACHE_HITS_KEY, hits),
+                       (SCHEDULE_CACHE_MISSES_KEY, misses)):
+        if not delta:
+            continue
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, timeout=None)
+
+
+def get_schedule_cache_stats() -> dict[str, int | float]:
+    stats = cache.get_many([SCHEDULE_CACHE_HITS_KEY,
+                            SCHEDULE_CACHE_MISSES_KEY])
+    hits = stats.get(SCHEDULE_CACHE_HITS_KEY, 0)
+    misses = stats.get(SCHEDULE_CACHE_MISSES_KEY, 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits else 0.0,
+    }
+
+
+def get_cached_schedules(
+    vehicles: list[Vehicle],
+) -> dict[Vehicle, VehicleSchedule]:
+    """
+    Returns schedules of the vehicles from the cache, the missing ones are
+    computed by batches and cached until midnight, when the DATE triggers
+    of the new day have to be recomputed. The keys contain the change
+    versions of the vehicles, so the vehicles have to be freshly loaded.
+    """
+    current_date = timezone.now().date()
+    schedule_keys = {
+        vehicle: get_schedule_key(vehicle, current_date)
+        for vehicle in vehicles
+    }
+    cached_schedules = cache.get_many(schedule_keys.values())
+    schedules = {}
+    missing_vehicles = []
+    for vehicle, key in schedule_keys.items():
+        cached_schedule = cached_schedules.get(key)
+        if cached_schedule is None:
+            missing_vehicles.append(vehicle)
+            continue
+        schedule = VehicleSchedule(
+            vehicle, current_date, cached_schedule.planed_works
+        )
+        schedule.expired_events = cached_schedule.expired_events
+        schedules[vehicle] = schedule
+    count_schedule_cache_access(len(schedules), len(missing_vehicles))
+
+    for vehicles_chunk in iter_chunks(missing_vehicles,
+                                      SCHEDULE_MISSES_CHUNK_SIZE):
+        fleet_limits = get_fleet_maintenance_limits(
+            vehicles_chunk, forecast=True
+        )
+        new_schedules = {}
+        for vehicle in vehicles_chunk:
+            schedule = VehicleSchedule(
+                vehicle, current_date, fleet_limits.get(vehicle, [])
+            )
+            schedules[vehicle] = schedule
+            new_schedules[schedule_keys[vehicle]] = CachedSchedule(
+                planed_works=schedule.planed_works,
+                expired_events=schedule.expired_events,
+            )
+        cache.set_many(new_schedules, get_seconds_until_midnight())
+    return schedules
+
+
+def get_cached_schedule(vehicle: Vehicle) -> VehicleSchedule:
+    return get_cached_schedules([vehicle])[vehicle]
+
+
+def get_cached_fleet_expired_events(
+    vehicles: Iterable[Vehicle],
+) -> list[VehicleExpiredEvents]:
+    return sort_by_urgency(
+        VehicleExpiredEvents(
+            vehicle=vehicle, expired_events=schedule.expired_events
+        )
+        for vehicle, schedule in get_cached_schedules(list(vehicles)).items()
+    )
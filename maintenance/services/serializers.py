@@ -0,0 +1,67 @@
+from maintenance.services.maintenance import (
+    OutOfDateMileageLevel,
+    PlanedWork,
+    VehicleSchedule,
+)
+from maintenance.services.projection import MaintenancePlan
+
+
+def serialize_planed_work(planed_work: PlanedWork) -> dict:
+    return {
+        "work_id": planed_work.work.pk,
+        "title": planed_work.work.title,
+        "interval_km": planed_work.work.interval_km,
+        "interval_month": planed_work.work.interval_month,
+        "trigger": planed_work.trigger.name,
+        "planed_mileage": planed_work.planed_mileage,
+        "mileage_delta": planed_work.mileage_delta,
+        "planed_date": planed_work.planed_date,
+        "days_delta": (
+            planed_work.date_delta.days
+            if planed_work.date_delta is not None else None
+        ),
+        "expected_mileage_date": planed_work.expected_mileage_date,
+        "expected_date": planed_work.expected_date,
+        "last_event_date": planed_work.last_event_date,
+        "remaining_procentage": planed_work.remaining_procentage,
+        "event_counter": planed_work.current_event_counter,
+    }
+
+
+def serialize_schedule(schedule: VehicleSchedule) -> dict:
+    vehicle = schedule.vehicle
+    return {
+        "vin_code": vehicle.vin_code,
+        "vehicle_mileage": vehicle.vehicle_mileage,
+        "vehicle_last_update_date": vehicle.vehicle_last_update_date,
+        "current_date": schedule.current_date,
+        "outdate_mileage_level": OutOfDateMileageLevel(
+            schedule.outdate_mileage_level
+        ).name,
+        "expired_events": {
+            "by_date": schedule.expired_events.by_date,
+            "by_mileage": schedule.expired_events.by_mileage,
+        },
+        "planed_works": [
+            serialize_planed_work(planed_work)
+            for planed_work in schedule.planed_works
+        ],
+    }
+
+
+def serialize_plan(plan: MaintenancePlan) -> dict:
+    monthly_totals = plan.get_monthly_totals()
+    return {
+        "start_date": plan.start_date,
+        "end_date": plan.end_date,
+        "occurrences": len(plan),
+        "total_cost": round(float(plan.costs.sum()), 2),
+        "months": [
+            {
+                "month": monthly_total.month.strftime("%Y-%m"),
+                "occurrences": monthly_total.occurrences,
+                "cost": monthly_total.cost,
+            }
+            for monthly_total in monthly_totals
+        ],
+    }
@@ -0,0 +1,149 @@
+import datetime
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.query import QuerySet
+
+from maintenance.models import Event, Work
+
+
+WORK_STATISTICS_CACHE_TIMEOUT = 60 * 60 * 24
+WORK_STATISTICS_TREND_SIZE = 5
+
+
+@dataclass
+class WorkTrendItem:
+    work_date: datetime.date
+    mileage: int
+    price: float
+
+
+@dataclass
+class WorkStatistics:
+    events_counter: int
+    average_mileage_interval: int
+    average_day_interval: int
+    total_part_price: float
+    total_work_price: float
+    average_part_price: float
+    average_work_price: float
+    trend: list[WorkTrendItem]
+
+    @property
+    def total_price(self) -> float:
+        return self.total_part_price + self.total_work_price
+
+
+def annotate_statistics(works: QuerySet[Work]) -> QuerySet[Work]:
+    """
+    Annotates works with the aggregates of their events. The sum of the
+    mileage intervals telescopes to the latest minus the oldest mileage,
+    so both are taken by subqueries instead of walking the events.
+    """
+    work_events = Event.objects.filter(work=OuterRef("pk"))
+    return works.annotate(
+        events_counter=Count("work"),
+        first_event_date=Min("work__work_date"),
+        last_event_date=Max("work__work_date"),
+        oldest_mileage=Subquery(
+            work_events.order_by("work_date", "pk").values("mileage")[:1]
+        ),
+        latest_mileage=Subquery(
+            work_events.order_by("-work_date", "-pk").values("mileage")[:1]
+        ),
+        total_part_price=Coalesce(Sum("work__part_price"), 0.0),
+        total_work_price=Coalesce(Sum("work__work_price"), 0.0),
+        average_part_price=Coalesce(Avg("work__part_price"), 0.0),
+        average_work_price=Coalesce(Avg("work__work_price"), 0.0),
+    )
+
+
+def build_work_statistics(
+    work: Work, trend: list[WorkTrendItem] | None = None
+) -> WorkStatistics:
+    """
+    Builds WorkStatistics from the work annotated by annotate_statistics.
+    """
+    average_mileage_interval = 0
+    average_day_interval = 0
+    if work.events_counter > 1:
+        intervals_number = work.events_counter - 1
+        average_mileage_interval = (
+            work.latest_mileage - work.oldest_mileage
+        ) // intervals_number
+        average_day_interval = (
+            work.last_event_date - work.first_event_date
+        ).days // intervals_number
+    return WorkStatistics(
+        events_counter=work.events_counter,
+        average_mileage_interval=average_mileage_interval,
+        average_day_interval=average_day_interval,
+        total_part_price=work.total_part_price,
+        total_work_price=work.total_work_price,
+        average_part_price=work.average_part_price,
+        average_work_price=work.average_work_price,
+        trend=trend or [],
+    )
+
+
+def get_works_statistics(
+    works: QuerySet[Work],
+) -> dict[int, WorkStatistics]:
+    """
+    Returns statistics of many works by one query, without trends.
+    """
+    return {
+        work.pk: build_work_statistics(work)
+        for work in annotate_statistics(works)
+    }
+
+
+def get_work_trend(
+    work_id: int, trend_size: int = WORK_STATISTICS_TREND_SIZE
+) -> list[WorkTrendItem]:
+    last_events = (
+        Event.objects.filter(work_id=work_id)
+        .order_by("-work_date", "-pk")
+        .values_list("work_date", "mileage", "part_price", "work_price")
+    )
+    return [
+        WorkTrendItem(
+            work_date=work_date, mileage=mileage,
+            price=part_price + work_price,
+        )
+        for work_date, mileage, part_price, work_price
+        in last_events[:trend_size]
+    ]
+
+
+def get_work_statistics_cache_key(work_id: int) -> str:
+    return f"work_statistics:{work_id}"
+
+
+def get_work_statistics(work_id: int) -> WorkStatistics | None:
+    """
+    Returns cached statistics of the work with the trend of its last
+    events, None if there is no such work.
+    """
+    cache_key = get_work_statistics_cache_key(work_id)
+    work_statistics = cache.get(cache_key)
+    if work_statistics is not None:
+        return work_statistics
+
+    work = annotate_statistics(Work.objects.filter(pk=work_id)).first()
+    if work is None:
+        return None
+    work_statistics = build_work_statistics(
+        work, get_work_trend(work_id) if work.events_counter else []
+    )
+    cache.set(cache_key, work_statistics, WORK_STATISTICS_CACHE_TIMEOUT)
+    return work_statistics
+
+
+def invalidate_work_statistics(*work_ids: int | None) -> None:
+    cache.delete_many([
+        get_work_statistics_cache_key(work_id)
+        for work_id in work_ids if work_id
+    ])
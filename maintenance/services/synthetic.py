@@ -0,0 +1,225 @@
+import datetime
+import hashlib
+import json
+import random
+import string
+from dataclasses import dataclass
+from pathlib import Path
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from maintenance.models import (
+    Event,
+    MileageEvent,
+    Vehicle,
+    Work,
+    WorkPattern,
+    build_pattern_works,
+)
+from maintenance.services.due_state import refresh_due_states
+from maintenance.services.onboarding import bulk_create_vehicles
+from maintenance.services.versions import bump_change_versions
+
+
+WORK_PATTERNS_PATH = Path(settings.BASE_DIR) / "works_list.json"
+VEHICLE_MODELS = (
+    ("Lada", "Vesta", "Sedan"),
+    ("Lada", "Niva", "SUV"),
+    ("Kia", "Rio", "Hatchback"),
+    ("Hyundai", "Solaris", "Sedan"),
+    ("Skoda", "Octavia", "Liftback"),
+    ("Toyota", "Camry", "Sedan"),
+    ("Renault", "Logan", "Sedan"),
+    ("Volkswagen", "Polo", "Sedan"),
+)
+VIN_SYMBOLS = string.ascii_uppercase + string.digits
+VIN_PREFIX_LENGTH = 5
+MILEAGE_READING_DAYS = 7
+BATCH_SIZE = 1000
+
+
+@dataclass
+class SyntheticFleetReport:
+    owners: int = 0
+    vehicles: int = 0
+    works: int = 0
+    events: int = 0
+    mileage_events: int = 0
+
+
+def load_work_patterns(
+    path: Path = WORK_PATTERNS_PATH,
+) -> list[WorkPattern]:
+    """
+    Returns the work patterns from the database, or from the fixture file
+    when the table is empty.
+    """
+    work_patterns = list(WorkPattern.objects.all())
+    if work_patterns:
+        return work_patterns
+    with path.open(encoding="utf-8") as fixture:
+        return [
+            WorkPattern(**record["fields"])
+            for record in json.load(fixture)
+            if record["model"] == "maintenance.workpattern"
+        ]
+
+
+class SyntheticFleetGenerator:
+    """
+    Generates owners with vehicles, their maintenance works from the
+    patterns and the history of events and weekly mileage readings. The
+    same seed produces the same fleet.
+    """
+
+    def __init__(self, owners: int, vehicles_per_owner: int, years: int,
+                 seed: int = 0, prefix: str = "synthetic") -> None:
+        self.owners = owners
+        self.vehicles_per_owner = vehicles_per_owner
+        self.years = years
+        self.prefix = prefix
+        self.vin_prefix = self.build_vin_prefix(prefix)
+        self.random = random.Random(seed)
+        self.current_date = timezone.now().date()
+        self.start_date = self.current_date - relativedelta(years=years)
+        self.work_patterns = load_work_patterns()
+        self.report = SyntheticFleetReport()
+
+    @staticmethod
+    def build_vin_prefix(prefix: str) -> str:
+        """
+        Derives the first VIN symbols from the fleet prefix, so fleets of
+        the same seed and different prefixes get different VINs.
+        """
+        digest = int(hashlib.sha1(prefix.encode()).hexdigest(), 16)
+        symbols = []
+        for _ in range(VIN_PREFIX_LENGTH):
+            digest, index = divmod(digest, len(VIN_SYMBOLS))
+            symbols.append(VIN_SYMBOLS[index])
+        return "".join(symbols)
+
+    def build_vin_code(self, vehicle_number: int) -> str:
+        return self.vin_prefix + "".join(
+            self.random.choice(VIN_SYMBOLS)
+            for _ in range(11 - VIN_PREFIX_LENGTH)
+        ) + f"{vehicle_number % 1000000:06}"
+
+    def get_mileage(self, vehicle: Vehicle, date: datetime.date) -> int:
+        return vehicle.start_mileage + round(
+            (date - self.start_date).days * vehicle.mileage_rate
+        )
+
+    def build_vehicle(self, owner: User, vehicle_number: int) -> Vehicle:
+        manufacturer, model, body = self.random.choice(VEHICLE_MODELS)
+        vehicle = Vehicle(
+            owner=owner,
+            vin_code=self.build_vin_code(vehicle_number),
+            vehicle_manufacturer=manufacturer,
+            vehicle_model=model,
+            vehicle_body=body,
+            vehicle_year=self.start_date.year - self.random.randint(0, 5),
+        )
+        vehicle.start_mileage = self.random.randint(0, 50000)
+        vehicle.mileage_rate = self.random.uniform(20, 120)
+        vehicle.vehicle_mileage = self.get_mileage(
+            vehicle, self.current_date
+        )
+        return vehicle
+
+    def build_events(self, vehicle: Vehicle, work: Work) -> list[Event]:
+        events = []
+        work_date = self.start_date + datetime.timedelta(
+            days=self.random.randint(0, 90)
+        )
+        while work_date <= self.current_date:
+            events.append(Event(
+                vehicle=vehicle,
+                work=work,
+                work_date=work_date,
+                mileage=self.get_mileage(vehicle, work_date),
+                part_price=float(self.random.randint(5, 500) * 10),
+                work_price=float(self.random.randint(5, 300) * 10),
+            ))
+            due_dates = []
+            if work.interval_km:
+                due_dates.append(work_date + datetime.timedelta(
+                    days=int(work.interval_km / vehicle.mileage_rate)
+                ))
+            if work.interval_month:
+                due_dates.append(
+                    work_date + relativedelta(months=work.interval_month)
+                )
+            if not due_dates:
+                break
+            work_date = min(due_dates) + datetime.timedelta(
+                days=self.random.randint(-15, 45)
+            )
+        return events
+
+    def build_mileage_events(self, vehicle: Vehicle) -> list[MileageEvent]:
+        return [
+            MileageEvent(
+                vehicle=vehicle,
+                mileage_date=mileage_date,
+                mileage=self.get_mileage(vehicle, mileage_date),
+            )
+            for mileage_date in (
+                self.start_date + datetime.timedelta(days=days)
+                for days in range(
+                    0, (self.current_date - self.start_date).days + 1,
+                    MILEAGE_READING_DAYS,
+                )
+            )
+        ]
+
+    @transaction.atomic
+    def generate_owner(self, owner_number: int) -> None:
+        owner = User(username=f"{self.prefix}_{owner_number}")
+        owner.set_unusable_password()
+        owner.save()
+        # bulk_create bypasses the post_save signal, so the works are
+        # created from the patterns below.
+        vehicles = bulk_create_vehicles([
+            self.build_vehicle(
+                owner, owner_number * self.vehicles_per_owner + number
+            )
+            for number in range(self.vehicles_per_owner)
+        ])
+        works = Work.objects.bulk_create(
+            build_pattern_works(vehicles, self.work_patterns),
+            batch_size=BATCH_SIZE,
+        )
+        events = Event.objects.bulk_create(
+            [
+                event
+                for work in works
+                for event in self.build_events(work.vehicle, work)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        mileage_events = MileageEvent.objects.bulk_create(
+            [
+                mileage_event
+                for vehicle in vehicles
+                for mileage_event in self.build_mileage_events(vehicle)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        # Only the generated works and vehicles are refreshed, the other
+        # vehicles of a shared database keep their due states and caches.
+        refresh_due_states([work.pk for work in works])
+        bump_change_versions(*(vehicle.pk for vehicle in vehicles))
+        self.report.owners += 1
+        self.report.vehicles += len(vehicles)
+        self.report.works += len(works)
+        self.report.events += len(events)
+        self.report.mileage_events += len(mileage_events)
+
+    def generate(self) -> SyntheticFleetReport:
+        for owner_number in range(self.owners):
+            self.generate_owner(owner_number)
+        return self.report
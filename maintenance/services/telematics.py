@@ -0,0 +1,124 @@
+import datetime
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from maintenance.models import MileageEvent, Vehicle
+from maintenance.services.importer import RecordError
+from maintenance.services.versions import bump_vehicles_change_versions
+
+
+@dataclass
+class IngestReport:
+    readings_stored: int = 0
+    vehicles_updated: int = 0
+    errors_number: int = 0
+
+
+@dataclass
+class OdometerReading:
+    vin_code: str
+    mileage: int
+    date: datetime.date
+
+
+def parse_reading(row: Any, current_date: datetime.date) -> OdometerReading:
+    if not isinstance(row, dict):
+        raise RecordError("reading is not an object")
+    try:
+        reading = OdometerReading(
+            vin_code=str(row["vin_code"]).strip().upper(),
+            mileage=int(row["mileage"]),
+            # Trackers send timestamps, the readings are stored by dates.
+            date=(
+                datetime.datetime.fromisoformat(str(row["date"])).date()
+                if row.get("date") else current_date
+            ),
+        )
+    except KeyError as error:
+        raise RecordError(f"missing field {error}") from error
+    except (TypeError, ValueError) as error:
+        raise RecordError(str(error)) from error
+    if reading.mileage < 0:
+        raise RecordError("negative mileage")
+    return reading
+
+
+def advance_vehicle_mileage(vehicle_id: int, mileage: int,
+                            current_date: datetime.date) -> int:
+    """
+    Raises the vehicle mileage to the reading by one UPDATE computing the
+    maximum in the database, so concurrent readings can not lower it. The
+    change version is bumped by the same query, the new readings change
+    the mileage forecast even when the mileage stays.
+    """
+    return bump_vehicles_change_versions(
+        Vehicle.objects.filter(pk=vehicle_id),
+        vehicle_mileage=Greatest(F("vehicle_mileage"), Value(mileage)),
+        vehicle_last_update_date=current_date,
+    )
+
+
+def ingest_readings(
+    vehicles: QuerySet[Vehicle],
+    rows: Iterable[tuple[int, Any]],
+    on_error: Callable[[int, str], None] | None = None,
+) -> IngestReport:
+    """
+    Stores the odometer readings of the vehicles as mileage events by one
+    bulk_create. The readings are coalesced per vehicle, so the mileage
+    of every vehicle is advanced by a single UPDATE, in the same
+    transaction.
+    """
+    report = IngestReport()
+    current_date = timezone.now().date()
+
+    def report_error(position: int, message: str) -> None:
+        report.errors_number += 1
+        if on_error:
+            on_error(position, message)
+
+    readings = []
+    for position, row in rows:
+        try:
+            readings.append((position, parse_reading(row, current_date)))
+        except RecordError as error:
+            report_error(position, str(error))
+    vehicle_ids = dict(
+        vehicles.filter(
+            vin_code__in={reading.vin_code for _, reading in readings}
+        ).values_list("vin_code", "pk")
+    )
+
+    mileage_events = []
+    max_mileages: dict[int, int] = {}
+    for position, reading in readings:
+        vehicle_id = vehicle_ids.get(reading.vin_code)
+        if vehicle_id is None:
+            report_error(position, f"unknown vehicle {reading.vin_code}")
+            continue
+        mileage_events.append(MileageEvent(
+            vehicle_id=vehicle_id,
+            mileage_date=reading.date,
+            mileage=reading.mileage,
+        ))
+        max_mileages[vehicle_id] = max(
+            max_mileages.get(vehicle_id, reading.mileage), reading.mileage
+        )
+
+    with transaction.atomic():
+        # bulk_create skips MileageEvent.save(), which rewrites the whole
+        # vehicle row for every reading. The vehicles are locked in the
+        # order of their keys, so concurrent batches can not deadlock.
+        MileageEvent.objects.bulk_create(mileage_events)
+        for vehicle_id, max_mileage in sorted(max_mileages.items()):
+            report.vehicles_updated += advance_vehicle_mileage(
+                vehicle_id, max_mileage, current_date
+            )
+    report.readings_stored = len(mileage_events)
+    return report
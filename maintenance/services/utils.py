@@ -0,0 +1,11 @@
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+
+T = TypeVar("T")
+
+
+def iter_chunks(items: Iterable[T], chunk_size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.query import QuerySet
+
+from maintenance.models import Vehicle, get_change_version
+
+
+deferred_vehicle_ids: ContextVar[set[int] | None] = ContextVar(
+    "deferred_vehicle_ids", default=None
+)
+
+
+def bump_vehicles_change_versions(vehicles: QuerySet[Vehicle],
+                                  **fields) -> int:
+    """
+    Bumps the change versions of the vehicles in the current transaction,
+    so the new version is visible together with the changed data. The
+    version keeps growing when the clock goes back. The given fields are
+    updated by the same query.
+    """
+    return vehicles.update(
+        change_version=Greatest(
+            F("change_version") + 1, Value(get_change_version())
+        ),
+        **fields,
+    )
+
+
+def bump_change_versions(*vehicle_ids: int | None) -> None:
+    bumped_ids = {vehicle_id for vehicle_id in vehicle_ids if vehicle_id}
+    deferred_ids = deferred_vehicle_ids.get()
+    if deferred_ids is not None:
+        deferred_ids.update(bumped_ids)
+        return
+    if bumped_ids:
+        bump_vehicles_change_versions(
+            Vehicle.objects.filter(pk__in=bumped_ids)
+        )
+
+
+@contextmanager
+def defer_change_version_bumps() -> Iterator[None]:
+    """
+    Collects the vehicles bumped in the block, e.g. by the post_delete
+    signals of a queryset delete, and bumps each of them once at its end.
+    """
+    if deferred_vehicle_ids.get() is not None:
+        yield
+        return
+    vehicle_ids: set[int] = set()
+    token = deferred_vehicle_ids.set(vehicle_ids)
+    try:
+        yield
+    finally:
+        deferred_vehicle_ids.reset(token)
+    bump_change_versions(*vehicle_ids)
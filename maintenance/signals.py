@@ -0,0 +1,89 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from maintenance.models import Event, MileageEvent, Vehicle, Work
+from maintenance.services.due_state import refresh_work_due_state
+from maintenance.services.statistics import invalidate_work_statistics
+from maintenance.services.versions import bump_change_versions
+
+
+@receiver(pre_save, sender=Event)
+def remember_previous_event_work(sender, instance, raw, **kwargs):
+    instance._previous_work_id = None
+    instance._previous_vehicle_id = None
+    if instance.pk and not raw:
+        instance._previous_work_id, instance._previous_vehicle_id = (
+            Event.objects.filter(pk=instance.pk)
+            .values_list('work_id', 'vehicle_id')
+            .first()
+        ) or (None, None)
+
+
+@receiver(pre_save, sender=MileageEvent)
+def remember_previous_mileage_vehicle(sender, instance, raw, **kwargs):
+    instance._previous_vehicle_id = None
+    if instance.pk and not raw:
+        instance._previous_vehicle_id = (
+            MileageEvent.objects.filter(pk=instance.pk)
+            .values_list('vehicle_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Event)
+def update_due_state_on_event_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    refresh_work_due_state(instance.work_id)
+    previous_work_id = getattr(instance, '_previous_work_id', None)
+    if previous_work_id and previous_work_id != instance.work_id:
+        refresh_work_due_state(previous_work_id)
+
+
+@receiver(post_delete, sender=Event)
+def update_due_state_on_event_delete(sender, instance, origin=None,
+                                     **kwargs):
+    # Events removed together with their work or vehicle take the due
+    # state with them, there is nothing to refresh.
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model in (Work, Vehicle):
+        return
+    refresh_work_due_state(instance.work_id)
+
+
+@receiver(post_save, sender=Work)
+def update_due_state_on_work_save(sender, instance, created, raw, **kwargs):
+    if created or raw:
+        return
+    refresh_work_due_state(instance.pk)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_statistics_on_event_change(sender, instance, **kwargs):
+    invalidate_work_statistics(
+        instance.work_id, getattr(instance, '_previous_work_id', None)
+    )
+
+
+@receiver(post_save, sender=Work)
+@receiver(post_delete, sender=Work)
+def invalidate_statistics_on_work_change(sender, instance, **kwargs):
+    invalidate_work_statistics(instance.pk)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=MileageEvent)
+@receiver(post_delete, sender=MileageEvent)
+@receiver(post_save, sender=Work)
+@receiver(post_delete, sender=Work)
+def bump_change_version_on_change(sender, instance, origin=None, raw=False,
+                                  **kwargs):
+    # Vehicle.save() bumps its own version, a deleted vehicle has none.
+    # The rows moved to another vehicle change the schedules of both.
+    if raw or getattr(origin, 'model', type(origin)) is Vehicle:
+        return
+    bump_change_versions(
+        instance.vehicle_id, getattr(instance, '_previous_vehicle_id', None)
+    )
@@ -0,0 +1,50 @@
+(function () {
+  'use strict';
+
+  var SEARCH_DELAY = 250;
+
+  function loadChoices(select, search) {
+    var params = new URLSearchParams({q: search.value});
+    var forward = select.dataset.autocompleteForward;
+    if (forward && select.form.elements[forward]) {
+      params.set(forward, select.form.elements[forward].value);
+    }
+    fetch(select.dataset.autocompleteUrl + '?' + params, {
+      credentials: 'same-origin',
+      headers: {'Accept': 'application/json'}
+    })
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        var selected = select.value;
+        Array.from(select.options).forEach(function (option) {
+          if (option.value && option.value !== selected) {
+            option.remove();
+          }
+        });
+        (data.results || []).forEach(function (item) {
+          if (String(item.id) !== selected) {
+            select.add(new Option(item.text, item.id));
+          }
+        });
+      });
+  }
+
+  document.querySelectorAll('select[data-autocomplete-url]').forEach(
+    function (select) {
+      var search = document.createElement('input');
+      var timer = null;
+      search.type = 'search';
+      search.className = 'form-control form-control-sm mb-1';
+      search.placeholder = 'Search';
+      select.parentNode.insertBefore(search, select);
+      search.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () { loadChoices(select, search); },
+                           SEARCH_DELAY);
+      });
+      select.addEventListener('focus', function () {
+        loadChoices(select, search);
+      }, {once: true});
+    }
+  );
+})();
@@ -1,3 +1,1803 @@
-from django.test import TestCase
+import datetime
+import json
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template.response import SimpleTemplateResponse
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from maintenance.middleware import RequestMetrics
+from maintenance.mixins import encode_cursor
+from maintenance.models import (
+    ApiToken,
+    Event,
+    MileageEvent,
+    Vehicle,
+    Work,
+    WorkAlert,
+    WorkDueState,
+    WorkPattern,
+)
+from maintenance.routers import ReadReplicaRouter, read_from_replica
+from maintenance.services.calendar_feed import get_calendar_token
+from maintenance.services.compaction import (
+    CompactionReport,
+    compact_mileage_events,
+)
+from maintenance.services.due_state import (
+    find_due_state_drift,
+    repair_due_state_drift,
+)
+from maintenance.services.exporter import (
+    iter_history_records,
+    iter_jsonl_lines,
+)
+from maintenance.services.fleet_scan import scan_fleet, send_alert_digests
+from maintenance.services.forecast import fit_mileage_rates
+from maintenance.services.importer import HistoryImporter, read_jsonl_rows
+from maintenance.services.onboarding import VehicleOnboarder
+from maintenance.services.pattern_sync import sync_work_patterns
+from maintenance.services.projection import get_maintenance_plan
+from maintenance.services.schedule_cache import get_schedule_cache_stats
+from maintenance.services.statistics import get_work_statistics
+from maintenance.views import (
+    AsyncEventListView,
+    AsyncVehicleDetailView,
+    AsyncVehicleListView,
+)
+from maintenance.services.maintenance import (
+    VehicleSchedule,
+    WorkTrigger,
+    get_fleet_expired_events,
+    get_maintenance_limits,
+)
+
+
+def create_vehicle(owner: User, vin_code: str = "ABCDEFGHJ12345678",
+                   vehicle_mileage: int = 5000) -> Vehicle:
+    return Vehicle.objects.create(
+        owner=owner,
+        vin_code=vin_code,
+        vehicle_manufacturer="Lada",
+        vehicle_model="Vesta",
+        vehicle_body="Sedan",
+        vehicle_year=2020,
+        vehicle_mileage=vehicle_mileage,
+    )
+
+
+class MaintenanceLimitsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.today = timezone.now().date()
+
+    def create_work(self, title: str, interval_km: int | None = None,
+                    interval_month: int | None = None) -> Work:
+        return Work.objects.create(
+            vehicle=self.vehicle, title=title,
+            interval_km=interval_km, interval_month=interval_month,
+        )
+
+    def create_event(self, work: Work, mileage: int,
+                     work_date: datetime.date) -> Event:
+        return Event.objects.create(
+            vehicle=self.vehicle, work=work, mileage=mileage,
+            work_date=work_date,
+        )
+
+    def test_planed_works(self):
+        oil = self.create_work("Oil", interval_km=5000, interval_month=12)
+        belt = self.create_work("Belt", interval_km=60000)
+        brake = self.create_work("Brake fluid", interval_month=24)
+        self.create_work("Never done", interval_km=1000)
+        self.create_event(oil, 1000, self.today - relativedelta(months=3))
+        self.create_event(oil, 4000, self.today - relativedelta(months=1))
+        self.create_event(belt, 2000, self.today - relativedelta(months=2))
+        self.create_event(brake, 500, self.today - relativedelta(months=25))
+
+        planed_works = get_maintenance_limits(self.vehicle.vin_code)
+
+        self.assertEqual(
+            [planed_work.work for planed_work in planed_works],
+            [brake, oil, belt],
+        )
+        brake_plan, oil_plan, belt_plan = planed_works
+        self.assertEqual(brake_plan.trigger, WorkTrigger.DATE)
+        self.assertEqual(brake_plan.current_event_counter, 1)
+        self.assertEqual(oil_plan.trigger, WorkTrigger.NONE)
+        self.assertEqual(oil_plan.planed_mileage, 9000)
+        self.assertEqual(oil_plan.mileage_delta, 4000)
+        self.assertEqual(oil_plan.remaining_procentage, 20)
+        self.assertEqual(oil_plan.current_event_counter, 2)
+        self.assertEqual(
+            oil_plan.planed_date,
+            self.today - relativedelta(months=1) + relativedelta(months=12),
+        )
+        self.assertEqual(belt_plan.planed_mileage, 62000)
+        self.assertIsNone(belt_plan.planed_date)
+
+    def test_mileage_trigger(self):
+        oil = self.create_work("Oil", interval_km=5000, interval_month=12)
+        self.create_event(oil, 0, self.today)
+
+        planed_work, = get_maintenance_limits(self.vehicle.vin_code)
+
+        self.assertEqual(planed_work.trigger, WorkTrigger.MILEAGE)
+        self.assertEqual(planed_work.remaining_procentage, 100)
+
+    def test_only_important(self):
+        oil = self.create_work("Oil", interval_km=5000)
+        belt = self.create_work("Belt", interval_km=60000)
+        self.create_event(oil, 1000, self.today)
+        self.create_event(belt, 6000, self.today)
+
+        planed_works = get_maintenance_limits(
+            self.vehicle.vin_code, only_important=True
+        )
+
+        self.assertEqual([item.work for item in planed_works], [oil])
+
+    def test_query_count_does_not_depend_on_works(self):
+        for index in range(30):
+            work = self.create_work(f"Work {index}", interval_km=5000,
+                                    interval_month=12)
+            for months in range(3):
+                self.create_event(
+                    work, 1000 * months,
+                    self.today - relativedelta(months=months),
+                )
+
+        with self.assertNumQueries(2):
+            planed_works = get_maintenance_limits(self.vehicle.vin_code)
+
+        self.assertEqual(len(planed_works), 30)
+        self.assertTrue(
+            all(item.current_event_counter == 3 for item in planed_works)
+        )
+
+
+class FleetExpiredEventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        today = timezone.now().date()
+        for index in range(10):
+            vehicle = create_vehicle(cls.owner, f"ABCDEFGHJ1234{index:04}")
+            for work_index in range(index):
+                work = Work.objects.create(
+                    vehicle=vehicle, title=f"Work {work_index}",
+                    interval_km=1000, interval_month=12,
+                )
+                Event.objects.create(
+                    vehicle=vehicle, work=work, mileage=0,
+                    work_date=today,
+                )
+        cls.urgent_vehicle = create_vehicle(cls.owner, "ABCDEFGHJ12349999")
+        work = Work.objects.create(
+            vehicle=cls.urgent_vehicle, title="Oil", interval_km=5000,
+            interval_month=6,
+        )
+        Event.objects.create(
+            vehicle=cls.urgent_vehicle, work=work, mileage=4000,
+            work_date=today - relativedelta(years=1),
+        )
+
+    def test_fleet_expired_events(self):
+        with self.assertNumQueries(2):
+            fleet_expired_events = get_fleet_expired_events(
+                Vehicle.objects.filter(owner=self.owner)
+            )
+
+        self.assertEqual(
+            [item.expired_events.by_mileage
+             for item in fleet_expired_events],
+            [9, 8, 7, 6, 5, 4, 3, 2, 1, 0, 0],
+        )
+        urgent_item = fleet_expired_events[-2]
+        self.assertEqual(urgent_item.vehicle, self.urgent_vehicle)
+        self.assertEqual(urgent_item.expired_events.by_date, 1)
+
+    def test_fleet_dashboard_view(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("fleet_dashboard"))
+        with self.assertNumQueries(3):
+            self.client.get(reverse("fleet_dashboard"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.urgent_vehicle.vin_code)
+
+
+class VehicleDetailViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        today = timezone.now().date()
+        for index in range(20):
+            work = Work.objects.create(
+                vehicle=cls.vehicle, title=f"Work {index}",
+                interval_km=1000 * (index + 1), interval_month=12,
+            )
+            Event.objects.create(
+                vehicle=cls.vehicle, work=work, mileage=0, work_date=today,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_schedule_is_computed_once(self):
+        self.client.force_login(self.owner)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(self.vehicle.get_absolute_url())
+
+        self.assertEqual(len(response.context["planed_works"]), 20)
+        self.assertEqual(response.context["expired_events"].by_mileage, 5)
+
+    def test_schedule_cache(self):
+        self.client.force_login(self.owner)
+        self.client.get(self.vehicle.get_absolute_url())
+
+        with self.assertNumQueries(5):
+            response = self.client.get(self.vehicle.get_absolute_url())
+        self.assertEqual(response.context["expired_events"].by_mileage, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MileageEvent.objects.create(
+                vehicle=self.vehicle, mileage=7000,
+                mileage_date=timezone.now().date(),
+            )
+        response = self.client.get(self.vehicle.get_absolute_url())
+
+        self.assertEqual(response.context["expired_events"].by_mileage, 7)
+        self.assertEqual(
+            get_schedule_cache_stats(),
+            {"hits": 1, "misses": 2, "hit_ratio": 0.3333},
+        )
+
+
+class WorkDueStateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.today = timezone.now().date()
+        cls.work = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil", interval_km=5000,
+            interval_month=12,
+        )
+
+    def create_event(self, mileage: int, work_date: datetime.date,
+                     work: Work | None = None) -> Event:
+        return Event.objects.create(
+            vehicle=self.vehicle, work=work or self.work, mileage=mileage,
+            work_date=work_date,
+        )
+
+    def test_event_changes(self):
+        first_event = self.create_event(
+            1000, self.today - relativedelta(months=6)
+        )
+        last_event = self.create_event(3000, self.today)
+
+        due_state = WorkDueState.objects.get(work=self.work)
+        self.assertEqual(due_state.event_counter, 2)
+        self.assertEqual(due_state.last_event_mileage, 3000)
+        self.assertEqual(due_state.planed_mileage, 8000)
+        self.assertEqual(due_state.planed_date,
+                         self.today + relativedelta(months=12))
+
+        last_event.delete()
+        due_state.refresh_from_db()
+        self.assertEqual(due_state.event_counter, 1)
+        self.assertEqual(due_state.planed_mileage, 6000)
+
+        other_work = Work.objects.create(vehicle=self.vehicle, title="Belt")
+        first_event.work = other_work
+        first_event.save()
+        self.assertFalse(WorkDueState.objects.filter(work=self.work).exists())
+        self.assertEqual(
+            WorkDueState.objects.get(work=other_work).event_counter, 1
+        )
+
+    def test_work_interval_changes(self):
+        self.create_event(1000, self.today)
+
+        self.work.interval_km = 10000
+        self.work.interval_month = None
+        self.work.save()
+
+        due_state = WorkDueState.objects.get(work=self.work)
+        self.assertEqual(due_state.planed_mileage, 11000)
+        self.assertIsNone(due_state.planed_date)
+
+    def test_rebuild_command(self):
+        self.create_event(1000, self.today)
+        Work.objects.filter(pk=self.work.pk).update(interval_km=10000)
+        other_work = Work.objects.create(vehicle=self.vehicle, title="Belt")
+        Event.objects.bulk_create([
+            Event(vehicle=self.vehicle, work=other_work, mileage=2000,
+                  work_date=self.today),
+        ])
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_due_states", "--check", stdout=StringIO())
+        call_command("rebuild_due_states", stdout=StringIO())
+        call_command("rebuild_due_states", "--check", stdout=StringIO())
+
+        self.assertEqual(
+            WorkDueState.objects.get(work=self.work).planed_mileage, 11000
+        )
+        self.assertTrue(WorkDueState.objects.filter(work=other_work).exists())
+
+    def test_repair_redundant_due_state(self):
+        other_vehicle = create_vehicle(self.owner, "ZZZDEFGHJ12345678")
+        other_work = Work.objects.create(vehicle=other_vehicle, title="Oil")
+        WorkDueState.objects.bulk_create([
+            WorkDueState(
+                work=other_work, vehicle=other_vehicle,
+                last_event_date=self.today, last_event_mileage=1000,
+                event_counter=1,
+            ),
+        ])
+        other_vehicle.refresh_from_db()
+
+        repair_due_state_drift(find_due_state_drift())
+
+        self.assertFalse(
+            WorkDueState.objects.filter(work=other_work).exists()
+        )
+        self.assertGreater(
+            Vehicle.objects.get(pk=other_vehicle.pk).change_version,
+            other_vehicle.change_version,
+        )
+
+
+class MileageForecastTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.today = timezone.now().date()
+        cls.vehicle = create_vehicle(cls.owner, vehicle_mileage=0)
+        cls.idle_vehicle = create_vehicle(cls.owner, "ABCDEFGHJ87654321")
+        for days in range(10, -1, -1):
+            MileageEvent.objects.create(
+                vehicle=cls.vehicle,
+                mileage_date=cls.today - datetime.timedelta(days=days),
+                mileage=5000 - 50 * days,
+            )
+        MileageEvent.objects.create(
+            vehicle=cls.idle_vehicle, mileage_date=cls.today, mileage=5000,
+        )
+
+    def test_fit_mileage_rates(self):
+        with self.assertNumQueries(1):
+            mileage_rates = fit_mileage_rates(Vehicle.objects.all())
+
+        self.assertEqual(list(mileage_rates), [self.vehicle.pk])
+        self.assertAlmostEqual(mileage_rates[self.vehicle.pk], 50)
+
+    def test_schedule_sorted_by_first_trigger(self):
+        oil = Work.objects.create(
+            vehicle=self.vehicle, title="Oil", interval_km=5000,
+            interval_month=12,
+        )
+        belt = Work.objects.create(
+            vehicle=self.vehicle, title="Belt", interval_km=1000,
+        )
+        Event.objects.create(vehicle=self.vehicle, work=oil, mileage=5000,
+                             work_date=self.today)
+        Event.objects.create(vehicle=self.vehicle, work=belt, mileage=5000,
+                             work_date=self.today)
+        self.vehicle.refresh_from_db()
+
+        belt_plan, oil_plan = VehicleSchedule(self.vehicle).planed_works
+
+        self.assertEqual(belt_plan.work, belt)
+        self.assertEqual(belt_plan.expected_mileage_date,
+                         self.today + datetime.timedelta(days=20))
+        self.assertEqual(oil_plan.expected_mileage_date,
+                         self.today + datetime.timedelta(days=100))
+        self.assertEqual(oil_plan.expected_date, oil_plan.expected_mileage_date)
+
+
+class MaintenancePlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.today = timezone.now().date()
+        cls.vehicle = create_vehicle(cls.owner, vehicle_mileage=0)
+        for days in range(10, -1, -1):
+            MileageEvent.objects.create(
+                vehicle=cls.vehicle,
+                mileage_date=cls.today - datetime.timedelta(days=days),
+                mileage=5000 - 50 * days,
+            )
+        cls.belt = Work.objects.create(
+            vehicle=cls.vehicle, title="Belt", interval_km=1000,
+        )
+        cls.oil = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil", interval_km=50000,
+            interval_month=6,
+        )
+        Work.objects.create(vehicle=cls.vehicle, title="Wipers",
+                            interval_month=12)
+        Event.objects.create(vehicle=cls.vehicle, work=cls.belt,
+                             mileage=5000, work_date=cls.today,
+                             part_price=100, work_price=50)
+        Event.objects.create(vehicle=cls.vehicle, work=cls.oil,
+                             mileage=5000, work_date=cls.today,
+                             part_price=300)
+
+    def test_plan(self):
+        with self.assertNumQueries(3):
+            plan = get_maintenance_plan(Vehicle.objects.all(), 1)
+
+        belt_dates = plan.dates[plan.work_ids == self.belt.pk].tolist()
+        self.assertEqual(len(belt_dates), 18)
+        self.assertEqual(belt_dates[0],
+                         self.today + datetime.timedelta(days=20))
+        self.assertEqual(belt_dates[-1],
+                         self.today + datetime.timedelta(days=360))
+        self.assertEqual(plan.dates[plan.work_ids == self.oil.pk].tolist(),
+                         [self.today + relativedelta(months=6)])
+
+        monthly_totals = plan.get_monthly_totals()
+        self.assertEqual(len(monthly_totals), 13)
+        self.assertEqual(monthly_totals[0].month, self.today.replace(day=1))
+        self.assertEqual(
+            sum(monthly_total.occurrences for monthly_total in monthly_totals),
+            19,
+        )
+        self.assertEqual(
+            sum(monthly_total.cost for monthly_total in monthly_totals),
+            18 * 150 + 300,
+        )
+        self.assertFalse(any(
+            monthly_total.occurrences
+            for monthly_total in plan.get_monthly_totals([0])
+        ))
+
+    def test_plan_api(self):
+        self.client.force_login(self.owner)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("api_maintenance_plan"),
+                                       {"years": 1})
+        self.assertEqual(response.json()["occurrences"], 19)
+        self.assertEqual(
+            self.client.get(reverse("api_maintenance_plan"),
+                            {"years": 50}).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.get(reverse("api_vehicle_maintenance_plan",
+                                    args=["ZZZDEFGHJ12345678"])).status_code,
+            404,
+        )
+
+
+class ImportHistoryCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.work = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil", interval_km=5000,
+        )
+
+    def import_history(self, file_name: str, content: str) -> StringIO:
+        stderr = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / file_name
+            path.write_text(content, encoding="utf-8")
+            call_command("import_history", str(path), "--chunk-size", "2",
+                         stdout=StringIO(), stderr=stderr)
+        return stderr
+
+    def test_import_csv(self):
+        self.assertEqual(get_work_statistics(self.work.pk).events_counter, 0)
+
+        stderr = self.import_history(
+            "history.csv",
+            "type,vin_code,date,mileage,work,part_price,work_price,note\n"
+            "event,abcdefghj12345678,2024-01-10,6000,Oil,10,20,\n"
+            "mileage,ABCDEFGHJ12345678,2024-02-10,7000,,,,\n"
+            "event,ABCDEFGHJ12345678,2024-03-10,not a number,Oil,,,\n"
+            "event,ABCDEFGHJ12345678,2024-03-10,7500,Unknown,,,\n"
+            "mileage,ZZZDEFGHJ12345678,2024-03-10,9000,,,,\n"
+            "event,ABCDEFGHJ12345678,2024-04-10,8000,Oil,,,\n",
+        )
+
+        self.assertEqual(len(stderr.getvalue().splitlines()), 3)
+        self.assertEqual(Event.objects.filter(work=self.work).count(), 2)
+        self.assertEqual(MileageEvent.objects.count(), 1)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.vehicle_mileage, 8000)
+        due_state = WorkDueState.objects.get(work=self.work)
+        self.assertEqual(due_state.event_counter, 2)
+        self.assertEqual(due_state.planed_mileage, 13000)
+        self.assertEqual(get_work_statistics(self.work.pk).events_counter, 2)
+
+    def test_import_jsonl(self):
+        stderr = self.import_history(
+            "history.jsonl",
+            '{"type": "mileage", "vin_code": "ABCDEFGHJ12345678", '
+            '"date": "2024-02-10", "mileage": 4000}\n'
+            "{broken\n",
+        )
+
+        self.assertIn("Line 2", stderr.getvalue())
+        self.assertEqual(MileageEvent.objects.count(), 1)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.vehicle_mileage, 5000)
+
+
+class VehicleOnboardingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        create_vehicle(cls.owner)
+        WorkPattern.objects.bulk_create([
+            WorkPattern(title="Oil", interval_km=10000, interval_month=12),
+            WorkPattern(title="Brake fluid", interval_month=24),
+        ])
+
+    @staticmethod
+    def build_record(vin_code: str, **fields) -> dict:
+        return {
+            "vin_code": vin_code,
+            "vehicle_manufacturer": "Kia",
+            "vehicle_model": "Rio",
+            "vehicle_body": "Hatchback",
+            "vehicle_year": 2021,
+            "vehicle_mileage": 1000,
+            **fields,
+        }
+
+    def test_onboarding_api(self):
+        _, key = ApiToken.create_token(self.owner, "tracker")
+        records = [
+            self.build_record(f"abcdefghj1{number:07}")
+            for number in range(10)
+        ] + [
+            self.build_record("ABCDEFGHJ12345678"),
+            self.build_record("ABCDEFGHJ10000001"),
+            self.build_record("bad vin"),
+            self.build_record("ABCDEFGHJ22222222", vehicle_year="year"),
+            {"vin_code": "ABCDEFGHJ33333333"},
+        ]
+
+        # Token with its user, patterns, VIN check, vehicles and works,
+        # the savepoint of the test transaction makes two more.
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                reverse("api_onboard_vehicles"), records,
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Token {key}",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report["vehicles_created"], 10)
+        self.assertEqual(report["works_created"], 20)
+        self.assertEqual(
+            [error["position"] for error in report["errors"]],
+            [11, 12, 13, 14, 10],
+        )
+        vehicle = Vehicle.objects.get(vin_code="ABCDEFGHJ10000009")
+        self.assertEqual(vehicle.owner, self.owner)
+        self.assertEqual(vehicle.vehicle_year, 2021)
+        self.assertEqual(
+            sorted(vehicle.works_list.values_list("title", flat=True)),
+            ["Brake fluid", "Oil"],
+        )
+
+    def test_onboarding_without_returned_keys(self):
+        # MySQL does not return the keys of the rows inserted by
+        # bulk_create.
+        with mock.patch.object(type(connection.features),
+                               "can_return_rows_from_bulk_insert", False):
+            report = VehicleOnboarder(self.owner).run(enumerate([
+                self.build_record("ABCDEFGHJ10000001"),
+                self.build_record("ABCDEFGHJ10000002"),
+            ]))
+
+        self.assertEqual(report.works_created, 4)
+        for vehicle in Vehicle.objects.filter(
+            vin_code__startswith="ABCDEFGHJ1000000"
+        ):
+            self.assertEqual(vehicle.works_list.count(), 2)
+
+    def test_onboarding_command(self):
+        stderr = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "vehicles.csv"
+            path.write_text(
+                "vin_code,vehicle_manufacturer,vehicle_model,vehicle_body,"
+                "vehicle_year,vehicle_mileage\n"
+                "ABCDEFGHJ10000001,Kia,Rio,Hatchback,2021,1000\n"
+                "ABCDEFGHJ10000002,Kia,Rio,Hatchback,2022,\n"
+                "ABCDEFGHJ10000003,Kia,Rio,Hatchback,2022,500\n",
+                encoding="utf-8",
+            )
+            call_command("onboard_vehicles", str(path), "--owner", "owner",
+                         "--chunk-size", "2", stdout=StringIO(),
+                         stderr=stderr)
+
+        self.assertIn("Line 3", stderr.getvalue())
+        self.assertEqual(self.owner.vehicles.count(), 3)
+        self.assertEqual(
+            Work.objects.filter(vehicle__vin_code="ABCDEFGHJ10000003")
+            .count(),
+            2,
+        )
+
+    def test_single_vehicle_signal(self):
+        vehicle = create_vehicle(self.owner, vin_code="ABCDEFGHJ10000001")
+
+        self.assertEqual(vehicle.works_list.count(), 2)
+
+
+class WorkPatternSyncTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.oil_pattern = WorkPattern.objects.create(
+            title="Oil", interval_km=10000, interval_month=12,
+        )
+        cls.belt_pattern = WorkPattern.objects.create(
+            title="Belt", interval_km=60000,
+        )
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.unlinked_vehicle = create_vehicle(cls.owner, "ZZZDEFGHJ12345678")
+        cls.unlinked_vehicle.works_list.update(pattern=None)
+        cls.oil = cls.vehicle.works_list.get(title="Oil")
+        Event.objects.create(vehicle=cls.vehicle, work=cls.oil, mileage=5000,
+                             work_date=datetime.date(2024, 1, 1))
+
+    def test_sync(self):
+        WorkPattern.objects.filter(pk=self.oil_pattern.pk).update(
+            interval_month=6
+        )
+        WorkPattern.objects.create(title="Brakes", interval_month=24)
+
+        report = sync_work_patterns(create_missing=True, chunk_size=1)
+
+        self.assertEqual(report.works_updated, 2)
+        self.assertEqual(report.works_linked, 2)
+        self.assertEqual(report.works_created, 2)
+        self.assertEqual(report.vehicles_affected, 2)
+        self.assertEqual(report.chunks, 2)
+        self.assertEqual(
+            WorkDueState.objects.get(work=self.oil).planed_date,
+            datetime.date(2024, 7, 1),
+        )
+        self.assertEqual(
+            set(self.unlinked_vehicle.works_list.values_list(
+                "title", "pattern__title", "interval_month"
+            )),
+            {("Oil", "Oil", 6), ("Belt", "Belt", None),
+             ("Brakes", "Brakes", 24)},
+        )
+
+    def test_unchanged_vehicles_keep_versions(self):
+        self.vehicle.works_list.filter(title="Belt").delete()
+        self.vehicle.refresh_from_db()
+        versions = dict(Vehicle.objects.values_list("pk", "change_version"))
+        output = StringIO()
+
+        call_command("sync_work_patterns", "--pattern",
+                     str(self.belt_pattern.pk), stdout=output)
+
+        # The unlinked Belt work is linked with the same intervals.
+        self.assertIn("Updated works: 0, linked works: 1, created works: 0, "
+                      "affected vehicles: 0.", output.getvalue())
+        self.assertEqual(
+            dict(Vehicle.objects.values_list("pk", "change_version")),
+            versions,
+        )
+        self.assertFalse(self.vehicle.works_list.filter(title="Belt").exists())
+
+        output = StringIO()
+        call_command("sync_work_patterns", "--pattern",
+                     str(self.belt_pattern.pk), "--create-missing",
+                     stdout=output)
+
+        self.assertIn("created works: 1, affected vehicles: 1.",
+                      output.getvalue())
+        self.assertTrue(self.vehicle.works_list.filter(title="Belt").exists())
+
+    # The admin pages format dates, which needs a time zone.
+    @override_settings(TIME_ZONE="UTC")
+    def test_admin_action(self):
+        admin_user = User.objects.create_superuser(username="admin")
+        self.client.force_login(admin_user)
+        WorkPattern.objects.filter(pk=self.belt_pattern.pk).update(
+            interval_km=90000
+        )
+        self.vehicle.works_list.filter(title="Belt").delete()
+
+        response = self.client.post(
+            reverse("admin:maintenance_workpattern_changelist"),
+            {"action": "sync_patterns",
+             "_selected_action": [self.belt_pattern.pk]},
+            follow=True,
+        )
+
+        self.assertContains(response, "Updated works: 1")
+        self.assertContains(response, "created works: 0")
+        self.assertEqual(
+            Work.objects.filter(title="Belt", interval_km=90000).count(), 1
+        )
+        self.assertFalse(self.vehicle.works_list.filter(title="Belt").exists())
+
+
+class TelematicsReadingsApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.other_vehicle = create_vehicle(
+            cls.owner, vin_code="ABCDEFGHJ87654321", vehicle_mileage=9000
+        )
+        cls.foreign_vehicle = create_vehicle(
+            User.objects.create_user(username="other"),
+            vin_code="ZZZDEFGHJ12345678",
+        )
+
+    def setUp(self):
+        # Trackers post without a session or a CSRF token.
+        self.client = Client(enforce_csrf_checks=True)
+        _, key = ApiToken.create_token(self.owner, "tracker")
+        self.authorization = f"Token {key}"
+
+    def test_readings(self):
+        version = self.other_vehicle.change_version
+        readings = [
+            {"vin_code": "abcdefghj12345678", "mileage": 6000,
+             "date": "2024-01-10T08:00:00"},
+            {"vin_code": "ABCDEFGHJ12345678", "mileage": 7000},
+            {"vin_code": "ABCDEFGHJ12345678", "mileage": 6500},
+            {"vin_code": "ABCDEFGHJ87654321", "mileage": 8000},
+            {"vin_code": "ZZZDEFGHJ12345678", "mileage": 8000},
+            {"vin_code": "ABCDEFGHJ12345678", "mileage": "many"},
+        ]
+
+        # Token with its user, vehicles, readings and an UPDATE per
+        # vehicle, the savepoint of the test transaction makes two more.
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                reverse("api_telematics_readings"), readings,
+                content_type="application/json",
+                HTTP_AUTHORIZATION=self.authorization,
+            )
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report["readings_stored"], 4)
+        self.assertEqual(report["vehicles_updated"], 2)
+        self.assertEqual(
+            [error["position"] for error in report["errors"]], [5, 4]
+        )
+        self.assertEqual(self.vehicle.mileage_events.count(), 3)
+        self.assertTrue(self.vehicle.mileage_events.filter(
+            mileage_date=datetime.date(2024, 1, 10)
+        ).exists())
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.vehicle_mileage, 7000)
+        # Lower readings are stored, the mileage stays.
+        self.other_vehicle.refresh_from_db()
+        self.assertEqual(self.other_vehicle.vehicle_mileage, 9000)
+        self.assertGreater(self.other_vehicle.change_version, version)
+        self.assertFalse(self.foreign_vehicle.mileage_events.exists())
+
+    def test_invalid_body(self):
+        response = self.client.post(
+            reverse("api_telematics_readings"), {"mileage": 1},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.authorization,
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_token(self):
+        for authorization in ("", "Token", "Token unknown"):
+            response = self.client.post(
+                reverse("api_telematics_readings"), [],
+                content_type="application/json",
+                HTTP_AUTHORIZATION=authorization,
+            )
+            self.assertEqual(response.status_code, 401)
+        # The session does not authenticate the API.
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            reverse("api_telematics_readings"), [],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_create_token_command(self):
+        stdout = StringIO()
+
+        call_command("create_api_token", "owner", stdout=stdout)
+
+        response = self.client.post(
+            reverse("api_telematics_readings"), [],
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {stdout.getvalue().strip()}",
+        )
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(CommandError):
+            call_command("create_api_token", "nobody", stdout=StringIO())
+
+
+class MileageCompactionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.current_date = datetime.date(2024, 6, 15)
+        start_date = datetime.date(2021, 1, 1)
+        MileageEvent.objects.bulk_create(
+            MileageEvent(
+                vehicle=cls.vehicle,
+                mileage_date=start_date + datetime.timedelta(days=hours // 24),
+                mileage=hours * 2,
+            )
+            for hours in range(0, 1260 * 24, 6)
+        )
+
+    def compact(self) -> CompactionReport:
+        with override_settings(MILEAGE_RAW_RETENTION_DAYS=30,
+                               MILEAGE_DAILY_RETENTION_DAYS=365):
+            return compact_mileage_events(batch_size=700,
+                                          current_date=self.current_date)
+
+    def test_compaction(self):
+        readings_number = MileageEvent.objects.count()
+        version = self.vehicle.change_version
+
+        report = self.compact()
+
+        self.assertGreater(report.batches, 1)
+        mileage_events = self.vehicle.mileage_events
+        raw_events = mileage_events.filter(period=MileageEvent.Period.RAW)
+        self.assertFalse(raw_events.filter(
+            mileage_date__lt=datetime.date(2024, 5, 16)
+        ).exists())
+        self.assertEqual(
+            raw_events.order_by("mileage_date").first().mileage_date,
+            datetime.date(2024, 5, 16),
+        )
+        daily_events = mileage_events.filter(period=MileageEvent.Period.DAY)
+        self.assertEqual(
+            daily_events.order_by("mileage_date").first().mileage_date,
+            datetime.date(2023, 6, 1),
+        )
+        day = daily_events.get(mileage_date=datetime.date(2024, 1, 10))
+        self.assertEqual(day.first_date, day.mileage_date)
+        self.assertEqual(day.readings_number, 4)
+        self.assertEqual(day.mileage - day.min_mileage, 36)
+        january = mileage_events.get(
+            period=MileageEvent.Period.MONTH,
+            mileage_date=datetime.date(2021, 1, 31),
+        )
+        self.assertEqual(january.first_date, datetime.date(2021, 1, 1))
+        self.assertEqual(january.min_mileage, 0)
+        self.assertEqual(january.mileage, (31 * 24 - 6) * 2)
+        self.assertEqual(january.readings_number, 31 * 4)
+        self.assertEqual(
+            sum(mileage_events.values_list("readings_number", flat=True)),
+            readings_number,
+        )
+        self.vehicle.refresh_from_db()
+        self.assertGreater(self.vehicle.change_version, version)
+
+        # Readings backdated after the compaction are merged into the
+        # existing rollups.
+        MileageEvent.objects.create(
+            vehicle=self.vehicle, mileage_date=datetime.date(2021, 1, 15),
+            mileage=100000,
+        )
+        report = self.compact()
+
+        self.assertEqual(
+            (report.compacted, report.created, report.updated), (2, 1, 1)
+        )
+        january.refresh_from_db()
+        self.assertEqual(january.mileage, 100000)
+        self.assertEqual(january.readings_number, 31 * 4 + 1)
+
+    def test_list_and_forecast_read_rollups(self):
+        call_command("compact_mileage_events", "--raw-days", "0",
+                     "--daily-days", "0", stdout=StringIO())
+        self.client.force_login(self.owner)
+
+        response = self.client.get(
+            reverse("mileage_events_list", args=[self.vehicle.vin_code])
+        )
+
+        self.assertEqual(len(response.context["object_list"]), 42)
+        self.assertContains(response, "2021-01-01 - 2021-01-31")
+        self.assertAlmostEqual(
+            fit_mileage_rates([self.vehicle.pk], self.current_date)[
+                self.vehicle.pk
+            ],
+            48,
+            delta=1,
+        )
+
+
+class DatabaseProfileTest(TestCase):
+    def test_sqlite_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            synchronous = cursor.fetchone()[0]
+            cursor.execute("PRAGMA busy_timeout")
+            busy_timeout = cursor.fetchone()[0]
+
+        # 1 is NORMAL.
+        self.assertEqual(synchronous, 1)
+        self.assertEqual(busy_timeout, 5000)
+
+    def test_replica_router(self):
+        router = ReadReplicaRouter()
+
+        with read_from_replica():
+            self.assertIsNone(router.db_for_read(Vehicle))
+        with mock.patch.dict(settings.DATABASES, replica={}):
+            self.assertIsNone(router.db_for_read(Vehicle))
+            with read_from_replica():
+                self.assertEqual(router.db_for_read(Vehicle), "replica")
+                self.assertEqual(router.db_for_write(Vehicle), "default")
+            self.assertFalse(router.allow_migrate("replica", "maintenance"))
+
+
+class HistoryExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        work = Work.objects.create(vehicle=cls.vehicle, title="Oil")
+        Event.objects.create(vehicle=cls.vehicle, work=work, mileage=6000,
+                             work_date=datetime.date(2024, 1, 10),
+                             part_price=10)
+        MileageEvent.objects.create(vehicle=cls.vehicle, mileage=7000,
+                                    mileage_date=datetime.date(2024, 2, 1))
+        other_owner = User.objects.create_user(username="other")
+        create_vehicle(other_owner, "ZZZDEFGHJ12345678")
+
+    def test_export_csv(self):
+        self.client.force_login(self.owner)
+
+        response = self.client.get(
+            reverse("export_history", kwargs={"export_format": "csv"})
+        )
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines(),
+            [
+                "type,vin_code,date,mileage,work,part_price,work_price,note,"
+                "period,first_date,min_mileage,readings_number",
+                "event,ABCDEFGHJ12345678,2024-01-10,6000,Oil,10.0,0.0,,,,,",
+                "mileage,ABCDEFGHJ12345678,2024-02-01,7000,,,,,RAW,,,1",
+            ],
+        )
+
+    def test_export_rollups(self):
+        MileageEvent.objects.create(
+            vehicle=self.vehicle, mileage=6500,
+            mileage_date=datetime.date(2024, 1, 31),
+            period=MileageEvent.Period.MONTH,
+            first_date=datetime.date(2024, 1, 2), min_mileage=5000,
+            readings_number=120,
+        )
+        exported = "".join(iter_jsonl_lines(
+            iter_history_records(Vehicle.objects.all())
+        ))
+        MileageEvent.objects.all().delete()
+
+        HistoryImporter().run(read_jsonl_rows(StringIO(exported)))
+
+        rollup = MileageEvent.objects.get(period=MileageEvent.Period.MONTH)
+        self.assertEqual(
+            (rollup.mileage_date, rollup.mileage, rollup.first_date,
+             rollup.min_mileage, rollup.readings_number),
+            (datetime.date(2024, 1, 31), 6500, datetime.date(2024, 1, 2),
+             5000, 120),
+        )
+        self.assertEqual(
+            MileageEvent.objects.filter(
+                period=MileageEvent.Period.RAW
+            ).count(),
+            1,
+        )
+
+    def test_export_foreign_vehicle(self):
+        self.client.force_login(self.owner)
+
+        response = self.client.get(reverse(
+            "export_vehicle_history",
+            kwargs={"export_format": "jsonl",
+                    "vin_code": "ZZZDEFGHJ12345678"},
+        ))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command(self):
+        stdout = StringIO()
+
+        call_command("export_history", "--format", "jsonl",
+                     "--owner", "owner", stdout=stdout)
+
+        self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        start_date = datetime.date(2024, 1, 1)
+        MileageEvent.objects.bulk_create(
+            MileageEvent(
+                vehicle=cls.vehicle, mileage=1000 + index,
+                mileage_date=start_date + datetime.timedelta(days=index // 3),
+            )
+            for index in range(120)
+        )
+        create_vehicle(cls.owner, "ZZZDEFGHJ12345678")
+        cls.url = reverse(
+            "mileage_events_list", kwargs={"vin_code": cls.vehicle.vin_code}
+        )
+
+    def get_json_page(self, query: str = "") -> dict:
+        return self.client.get(f"{self.url}?format=json&{query}").json()
+
+    def test_pages(self):
+        self.client.force_login(self.owner)
+
+        first_page = self.get_json_page()
+        second_page = self.get_json_page(first_page["next"])
+        last_page = self.get_json_page(second_page["next"])
+        previous_page = self.get_json_page(last_page["previous"])
+
+        self.assertIsNone(first_page["previous"])
+        self.assertEqual(
+            [item["mileage"] for item in first_page["results"]],
+            list(range(1119, 1069, -1)),
+        )
+        self.assertEqual(len(last_page["results"]), 20)
+        self.assertIsNone(last_page["next"])
+        self.assertEqual(last_page["results"][-1]["mileage"], 1000)
+        self.assertEqual(previous_page["results"], second_page["results"])
+
+    def test_page_query_count(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertContains(response, "Older")
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                f"{self.url}?{response.context['page_obj'].next_query}"
+            )
+        self.assertEqual(len(response.context["object_list"]), 50)
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.owner)
+
+        for cursor in ("broken", encode_cursor("not a date", 1),
+                       encode_cursor("2024-02-30", 1)):
+            response = self.client.get(self.url, {"after": cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+class ListRenderingQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.work = Work.objects.create(vehicle=cls.vehicle, title="Oil")
+
+    def add_rows(self, number: int) -> None:
+        vehicle = create_vehicle(self.owner, f"ROWS{number:013d}")
+        Event.objects.bulk_create(
+            Event(
+                vehicle=self.vehicle, work=self.work, mileage=1000 + index,
+                work_date=datetime.date(2024, 1, 1),
+            )
+            for index in range(number)
+        )
+        Event.objects.create(
+            vehicle=vehicle, work=Work.objects.create(
+                vehicle=vehicle, title="Filter"
+            ), mileage=1000, work_date=datetime.date(2024, 1, 1),
+        )
+
+    def test_queries_do_not_depend_on_rows(self):
+        self.client.force_login(self.owner)
+        pages = (
+            (reverse("index"), 3, "Vesta"),
+            (reverse("events_list", args=[self.vehicle.vin_code]), 3, "Oil"),
+            (reverse("event_by_type", args=[self.work.pk]), 5, "Oil"),
+        )
+        for number in (1, 20):
+            self.add_rows(number)
+            cache.clear()
+            for url, queries, text in pages:
+                with self.subTest(url=url, rows=number):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(url)
+                    self.assertContains(response, text)
+
+    def test_vehicle_card_follows_events(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse("index"))
+        Event.objects.create(
+            vehicle=self.vehicle, work=self.work, mileage=6000,
+            work_date=datetime.date(2024, 1, 1),
+        )
+
+        response = self.client.get(reverse("index"))
+
+        self.assertContains(response, "Events counter: 1<br>")
+
+
+class EventChoicesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.other_vehicle = create_vehicle(cls.owner, "ZZZDEFGHJ12345678")
+        stranger = User.objects.create_user(username="stranger")
+        create_vehicle(stranger, "ABCZZZZZZ12345678")
+        Work.objects.bulk_create(
+            Work(vehicle=cls.vehicle, title=f"Filter {index:02}")
+            for index in range(30)
+        )
+        cls.work = Work.objects.create(vehicle=cls.vehicle, title="Oil")
+        cls.other_work = Work.objects.create(vehicle=cls.other_vehicle,
+                                             title="Oil")
+        cls.event = Event.objects.create(
+            vehicle=cls.vehicle, work=cls.work, mileage=6000,
+            work_date=datetime.date(2024, 1, 1),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def get_choices(self, name: str, **params) -> list[dict]:
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_vehicle_choices(self):
+        self.assertEqual(
+            [item["id"] for item in self.get_choices("api_vehicle_choices",
+                                                     q="abc")],
+            [self.vehicle.pk],
+        )
+
+    def test_work_choices(self):
+        with self.assertNumQueries(3):
+            results = self.get_choices("api_work_choices",
+                                       vehicle=self.vehicle.pk, q="Fil")
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0]["text"], "Filter 00")
+        self.assertEqual(
+            self.get_choices("api_work_choices", vehicle=self.vehicle.pk,
+                             q="Oil", limit=5),
+            [{"id": self.work.pk, "text": "Oil"}],
+        )
+        self.assertEqual(
+            self.client.get(reverse("api_work_choices")).status_code, 400
+        )
+
+    def test_edit_page_renders_selected_choices(self):
+        response = self.client.get(
+            reverse("edit_event", args=[self.event.pk])
+        )
+
+        self.assertContains(response, "data-autocomplete-url", count=2)
+        self.assertNotContains(response, "Filter 00")
+        self.assertNotContains(response, "ZZZDEFGHJ12345678")
+
+    def test_work_of_another_vehicle_is_rejected(self):
+        response = self.client.post(
+            reverse("edit_event", args=[self.event.pk]),
+            {
+                "vehicle": self.vehicle.pk,
+                "work": self.other_work.pk,
+                "work_date": "2024-01-01",
+                "mileage": 6000,
+                "part_price": 0,
+                "work_price": 0,
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context["form"], "work",
+                             "The work belongs to another vehicle.")
+
+
+class WorkStatisticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.work = Work.objects.create(vehicle=cls.vehicle, title="Oil")
+        start_date = datetime.date(2024, 1, 1)
+        for index, mileage in enumerate((1000, 4000, 5500, 10000)):
+            Event.objects.create(
+                vehicle=cls.vehicle, work=cls.work, mileage=mileage,
+                work_date=start_date + datetime.timedelta(days=100 * index),
+                part_price=100 * (index + 1), work_price=50,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_work_statistics(self):
+        with self.assertNumQueries(2):
+            work_statistics = get_work_statistics(self.work.pk)
+
+        self.assertEqual(work_statistics.events_counter, 4)
+        self.assertEqual(work_statistics.average_mileage_interval, 3000)
+        self.assertEqual(work_statistics.average_day_interval, 100)
+        self.assertEqual(work_statistics.total_part_price, 1000)
+        self.assertEqual(work_statistics.average_work_price, 50)
+        self.assertEqual(
+            [item.mileage for item in work_statistics.trend],
+            [10000, 5500, 4000, 1000],
+        )
+
+    def test_cache_invalidation(self):
+        get_work_statistics(self.work.pk)
+        with self.assertNumQueries(0):
+            get_work_statistics(self.work.pk)
+
+        Event.objects.create(
+            vehicle=self.vehicle, work=self.work, mileage=13000,
+            work_date=datetime.date(2025, 3, 1),
+        )
+
+        self.assertEqual(get_work_statistics(self.work.pk).events_counter, 5)
+
+    def test_deleted_work_statistics(self):
+        work = Work.objects.create(vehicle=self.vehicle, title="Belt")
+        work_id = work.pk
+        self.assertIsNotNone(get_work_statistics(work_id))
+
+        work.delete()
+
+        self.assertIsNone(get_work_statistics(work_id))
+
+    def test_work_detail_view(self):
+        self.client.force_login(self.owner)
+
+        response = self.client.get(self.work.get_absolute_url())
+
+        self.assertContains(response, "Average mileage interval")
+        self.assertContains(
+            response, reverse("event_by_type", kwargs={"pk": self.work.pk})
+        )
+        response = self.client.get(
+            reverse("event_by_type", kwargs={"pk": self.work.pk})
+        )
+        self.assertContains(response, "Average day interval")
+
+
+class GenerateFleetCommandTest(TestCase):
+    def generate_fleet(self, seed: int, prefix: str) -> list[tuple]:
+        call_command(
+            "generate_fleet", "--owners", "2", "--vehicles", "2",
+            "--years", "2", "--seed", str(seed), "--prefix", prefix,
+            stdout=StringIO(),
+        )
+        return list(
+            Event.objects.filter(
+                vehicle__owner__username__startswith=f"{prefix}_"
+            ).order_by("pk").values_list(
+                "work__title", "work_date", "mileage"
+            )
+        )
+
+    def test_generate_fleet(self):
+        owner = User.objects.create_user(username="owner")
+        vehicle = create_vehicle(owner)
+        work = Work.objects.create(vehicle=vehicle, title="Oil")
+        Event.objects.create(
+            vehicle=vehicle, work=work, mileage=1000,
+            work_date=timezone.now().date(),
+        )
+        vehicle.refresh_from_db()
+
+        events = self.generate_fleet(1, "first")
+
+        self.assertEqual(
+            Vehicle.objects.filter(owner__username__startswith="first_")
+            .count(),
+            4,
+        )
+        self.assertEqual(
+            Work.objects.filter(vehicle__owner__username="first_0").count(),
+            26,
+        )
+        self.assertTrue(events)
+        self.assertEqual(
+            WorkDueState.objects.count(), Work.objects.count()
+        )
+        for generated_vehicle in Vehicle.objects.exclude(pk=vehicle.pk):
+            generated_vehicle.full_clean()
+        self.assertEqual(self.generate_fleet(1, "second"), events)
+        self.assertEqual(Vehicle.objects.count(), 9)
+        # The cached schedules of the existing vehicle stay valid.
+        self.assertEqual(
+            Vehicle.objects.get(pk=vehicle.pk).change_version,
+            vehicle.change_version,
+        )
+
+    def test_existing_prefix(self):
+        self.generate_fleet(0, "fleet")
+        with self.assertRaises(CommandError):
+            self.generate_fleet(0, "fleet")
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="password")
+        cls.vehicle = create_vehicle(cls.owner)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def test_server_timing(self):
+        render = SimpleTemplateResponse.render
+
+        def slow_render(response):
+            time.sleep(0.01)
+            return render(response)
+
+        # The list view renders its template inside the view when the
+        # replica is configured.
+        for replica_configured in (False, True):
+            replica_patch = mock.patch(
+                "maintenance.mixins.is_replica_configured",
+                return_value=replica_configured,
+            )
+            render_patch = mock.patch.object(
+                SimpleTemplateResponse, "render", slow_render
+            )
+            with self.subTest(replica_configured=replica_configured):
+                with replica_patch, render_patch:
+                    with self.assertLogs("maintenance.requests",
+                                         "DEBUG") as logs:
+                        response = self.client.get(reverse("index"))
+
+                timings = response["Server-Timing"].split(", ")
+                self.assertEqual(
+                    [timing.split(";")[0] for timing in timings],
+                    ["db", "view", "render", "total"],
+                )
+                record = json.loads(logs.records[0].getMessage())
+                self.assertEqual(record["path"], reverse("index"))
+                self.assertEqual(record["status"], 200)
+                self.assertGreater(record["queries"], 0)
+                self.assertIn(f'desc="{record["queries"]} queries"',
+                              timings[0])
+                self.assertGreater(record["view_ms"], 0)
+                self.assertGreaterEqual(record["render_ms"], 10)
+
+    def test_streaming_queries(self):
+        Event.objects.create(
+            vehicle=self.vehicle,
+            work=Work.objects.create(vehicle=self.vehicle, title="Oil"),
+            mileage=1000, work_date=timezone.now().date(),
+        )
+
+        with self.assertLogs("maintenance.requests", "DEBUG") as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    reverse("export_history", args=["csv"])
+                )
+                # The request is logged once its body is consumed.
+                self.assertEqual(logs.records, [])
+                content = b"".join(response.streaming_content)
+
+        self.assertIn(b"Oil", content)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["queries"], len(queries))
+
+    def test_server_timing_without_view(self):
+        metrics = RequestMetrics()
+        metrics.finished = metrics.started
+
+        self.assertIsNone(metrics.view_time)
+        self.assertIsNone(metrics.as_dict()["view_ms"])
+        self.assertNotIn("view;", metrics.get_server_timing())
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request(self):
+        with self.assertLogs("maintenance.requests", "WARNING") as logs:
+            self.client.get(reverse("index"))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record["slow"])
+        self.assertEqual(len(record["sql"]), record["queries"])
+        self.assertTrue(
+            any("maintenance_vehicle" in query["sql"]
+                for query in record["sql"])
+        )
+
+
+class VehicleScheduleApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.work = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil", interval_km=1000,
+        )
+        Event.objects.create(
+            vehicle=cls.vehicle, work=cls.work, mileage=4500,
+            work_date=timezone.now().date(),
+        )
+        cls.url = reverse("api_vehicle_schedule", args=[cls.vehicle.vin_code])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def test_schedule(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        schedule = response.json()
+        self.assertEqual(schedule["vin_code"], self.vehicle.vin_code)
+        self.assertEqual(schedule["expired_events"],
+                         {"by_date": 0, "by_mileage": 0})
+        self.assertEqual(schedule["planed_works"][0]["planed_mileage"], 5500)
+        self.assertEqual(schedule["planed_works"][0]["trigger"], "NONE")
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        Event.objects.create(
+            vehicle=self.vehicle, work=self.work, mileage=5200,
+            work_date=timezone.now().date(),
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            response.json()["planed_works"][0]["planed_mileage"], 6200
+        )
+
+    def test_foreign_vehicle(self):
+        other_owner = User.objects.create_user(username="other")
+        self.client.force_login(other_owner)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_moved_rows_bump_both_vehicles(self):
+        other_vehicle = create_vehicle(self.owner, "ZZZDEFGHJ12345678")
+        other_work = Work.objects.create(vehicle=other_vehicle, title="Oil")
+        event = Event.objects.get(work=self.work)
+        mileage_event = MileageEvent.objects.create(
+            vehicle=self.vehicle, mileage=4500,
+            mileage_date=timezone.now().date(),
+        )
+
+        for row, fields in (
+            (event, {"vehicle": other_vehicle, "work": other_work}),
+            (mileage_event, {"vehicle": other_vehicle}),
+        ):
+            versions = dict(
+                Vehicle.objects.values_list("pk", "change_version")
+            )
+            for field_name, value in fields.items():
+                setattr(row, field_name, value)
+            row.save()
+
+            for vehicle_id, version in Vehicle.objects.values_list(
+                "pk", "change_version"
+            ):
+                self.assertGreater(version, versions[vehicle_id])
+
+    def test_token_conditional_get(self):
+        _, key = ApiToken.create_token(self.owner, "mobile")
+        client = Client()
+        authorization = f"Token {key}"
+        etag = client.get(self.url, HTTP_AUTHORIZATION=authorization)["ETag"]
+
+        # The token with its user and the vehicle.
+        with self.assertNumQueries(2):
+            response = client.get(
+                self.url, HTTP_AUTHORIZATION=authorization,
+                HTTP_IF_NONE_MATCH=etag,
+            )
+        self.assertEqual(response.status_code, 304)
+
+        response = client.get(self.url, HTTP_AUTHORIZATION="Token unknown")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(client.get(self.url).status_code, 401)
+
+
+class CalendarFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        cls.today = timezone.now().date()
+        cls.work = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil, filter", interval_month=6,
+        )
+        Event.objects.create(
+            vehicle=cls.vehicle, work=cls.work, mileage=4500,
+            work_date=cls.today,
+        )
+        cls.token = get_calendar_token(cls.owner.pk)
+        cls.url = reverse("calendar_feed", args=[cls.token])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed(self):
+        response = self.client.get(
+            reverse("vehicle_calendar_feed",
+                    args=[self.token, self.vehicle.vin_code])
+        )
+
+        self.assertEqual(response["Content-Type"],
+                         "text/calendar; charset=utf-8")
+        content = response.content.decode()
+        planed_date = self.today + relativedelta(months=6)
+        self.assertIn(
+            f"DTSTART;VALUE=DATE:{planed_date:%Y%m%d}\r\n", content
+        )
+        self.assertIn("SUMMARY:Oil\\, filter - Lada Vesta Sedan 2020",
+                      content)
+        self.assertTrue(all(
+            len(line.encode()) <= 75 for line in content.split("\r\n")
+        ))
+
+    def test_unchanged_polls(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with mock.patch(
+            "maintenance.services.calendar_feed.get_cached_schedules"
+        ) as get_cached_schedules:
+            with self.assertNumQueries(1):
+                cached_response = self.client.get(self.url)
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(self.url,
+                                               HTTP_IF_NONE_MATCH=etag)
+        get_cached_schedules.assert_not_called()
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+        Event.objects.create(
+            vehicle=self.vehicle, work=self.work, mileage=5000,
+            work_date=self.today + datetime.timedelta(days=1),
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_foreign_feeds(self):
+        other_owner = User.objects.create_user(username="other")
+
+        self.assertEqual(
+            self.client.get(
+                reverse("calendar_feed", args=[f"{self.owner.pk}:forged"])
+            ).status_code,
+            404,
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse("vehicle_calendar_feed",
+                        args=[get_calendar_token(other_owner.pk),
+                              self.vehicle.vin_code])
+            ).status_code,
+            404,
+        )
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner")
+        cls.vehicle = create_vehicle(cls.owner)
+        work = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil", interval_km=1000,
+        )
+        start_date = timezone.now().date() - datetime.timedelta(days=60)
+        for index in range(60):
+            Event.objects.create(
+                vehicle=cls.vehicle, work=work, mileage=100 * index,
+                work_date=start_date + datetime.timedelta(days=index),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    async def get(self, view_class, user, query: str = "", **kwargs):
+        request = AsyncRequestFactory().get(f"/?{query}")
+        request.user = user
+        response = await view_class.as_view()(request, **kwargs)
+        if hasattr(response, "render"):
+            await sync_to_async(response.render)()
+        return response
+
+    async def test_vehicle_detail(self):
+        response = await self.get(
+            AsyncVehicleDetailView, self.owner,
+            vin_code=self.vehicle.vin_code,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data["events_count"], 60)
+        self.assertEqual(len(response.context_data["recent_events"]), 5)
+        self.assertEqual(
+            response.context_data["planed_works"][0].planed_mileage, 6900
+        )
+        self.assertContains(response, self.vehicle.vin_code)
+
+    async def test_vehicle_list(self):
+        response = await self.get(AsyncVehicleListView, self.owner)
+
+        self.assertEqual(
+            response.context_data["object_list"], [self.vehicle]
+        )
+        self.assertContains(response, self.vehicle.vin_code)
+
+    async def test_event_list_pages(self):
+        response = await self.get(
+            AsyncEventListView, self.owner, "format=json",
+            vin_code=self.vehicle.vin_code,
+        )
+        page = json.loads(response.content)
+        self.assertEqual(len(page["results"]), 50)
+
+        response = await self.get(
+            AsyncEventListView, self.owner, f"{page['next']}&format=json",
+            vin_code=self.vehicle.vin_code,
+        )
+        self.assertEqual(len(json.loads(response.content)["results"]), 10)
+
+    async def test_anonymous_user(self):
+        response = await self.get(
+            AsyncVehicleDetailView, AnonymousUser(),
+            vin_code=self.vehicle.vin_code,
+        )
+
+        self.assertEqual(response.status_code, 302)
+
+
+class FleetScanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner", email="owner@example.com"
+        )
+        cls.vehicle = create_vehicle(cls.owner, vehicle_mileage=10000)
+        cls.today = timezone.now().date()
+        cls.oil = Work.objects.create(
+            vehicle=cls.vehicle, title="Oil", interval_km=10000,
+        )
+        cls.belt = Work.objects.create(
+            vehicle=cls.vehicle, title="Belt", interval_month=12,
+        )
+        Event.objects.create(vehicle=cls.vehicle, work=cls.oil,
+                             mileage=1000, work_date=cls.today)
+        Event.objects.create(vehicle=cls.vehicle, work=cls.belt,
+                             mileage=1000, work_date=cls.today)
+
+    def test_scan_only_changed_vehicles(self):
+        other_vehicle = create_vehicle(self.owner, "ZZZDEFGHJ12345678")
+
+        report = scan_fleet(chunk_size=1)
+
+        self.assertEqual((report.chunks, report.vehicles, report.alerts),
+                         (2, 2, 0))
+        self.assertEqual(scan_fleet().vehicles, 0)
+
+        Event.objects.create(vehicle=self.vehicle, work=self.oil,
+                             mileage=1000, work_date=self.today)
+        other_vehicle.save()
+        report = scan_fleet()
+
+        self.assertEqual((report.vehicles, report.alerts), (2, 0))
+
+    def test_new_triggers(self):
+        scan_fleet()
+        MileageEvent.objects.create(vehicle=self.vehicle, mileage=11000,
+                                    mileage_date=self.today)
+
+        self.assertEqual(scan_fleet().alerts, 1)
+        alert = WorkAlert.objects.get()
+        self.assertEqual(alert.work, self.oil)
+        self.assertEqual(alert.trigger, WorkTrigger.MILEAGE.value)
+        self.assertEqual(alert.planed_mileage, 11000)
+
+        next_year = self.today + relativedelta(years=1)
+        self.assertEqual(scan_fleet(current_date=next_year).alerts, 1)
+        self.assertEqual(
+            WorkAlert.objects.latest("pk").trigger, WorkTrigger.DATE.value
+        )
+        self.assertEqual(scan_fleet(current_date=next_year).vehicles, 0)
+
+    def test_alert_digests(self):
+        other_owner = User.objects.create_user(username="other")
+        other_vehicle = create_vehicle(other_owner, "ZZZDEFGHJ12345678")
+        work = Work.objects.create(
+            vehicle=other_vehicle, title="Filter", interval_km=1000,
+        )
+        Event.objects.create(vehicle=other_vehicle, work=work,
+                             mileage=0, work_date=self.today)
+        MileageEvent.objects.create(vehicle=self.vehicle, mileage=20000,
+                                    mileage_date=self.today)
+        scan_fleet(current_date=self.today + relativedelta(years=1))
+
+        self.assertEqual(send_alert_digests(), 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["owner@example.com"])
+        self.assertIn("Oil, mileage limit 11000 km", mail.outbox[0].body)
+        self.assertIn("Belt, date limit", mail.outbox[0].body)
+        self.assertFalse(WorkAlert.objects.filter(sent_at__isnull=True))
+        self.assertEqual(send_alert_digests(), 0)
+
+    def test_alert_digests_are_claimed_before_sending(self):
+        MileageEvent.objects.create(vehicle=self.vehicle, mileage=20000,
+                                    mileage_date=self.today)
+        scan_fleet(current_date=self.today + relativedelta(years=1))
+
+        def send_claimed(messages):
+            # A crash after sending leaves no alert to send again.
+            self.assertFalse(WorkAlert.objects.filter(sent_at__isnull=True))
+            raise ConnectionError
+
+        with mock.patch("maintenance.services.fleet_scan.send_mass_mail",
+                        side_effect=send_claimed):
+            with self.assertRaises(ConnectionError):
+                send_alert_digests()
+
+        self.assertFalse(WorkAlert.objects.filter(sent_at__isnull=False))
+        self.assertEqual(send_alert_digests(), 1)
+        self.assertEqual(len(mail.outbox), 1)
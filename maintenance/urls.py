@@ -14,36 +14,69 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.urls import path
+from django.views import View
 
 from . import views
 
 
+def select_view(sync_view: type[View], async_view: type[View]) -> type[View]:
+    # ASGI deployments serve the detail and list pages by the async views.
+    return async_view if settings.ASYNC_VIEWS else sync_view
+
+
+vehicle_list_view = select_view(views.VehicleListView,
+                                views.AsyncVehicleListView)
+vehicle_detail_view = select_view(views.VehicleDetailView,
+                                  views.AsyncVehicleDetailView)
+work_list_view = select_view(views.WorkListView, views.AsyncWorkListView)
+event_list_view = select_view(views.EventListView, views.AsyncEventListView)
+mileage_list_view = select_view(views.MileageListView,
+                                views.AsyncMileageListView)
+
 urlpatterns = [
-    path('', views.VehicleListView.as_view(), name="index"),
+    path('', vehicle_list_view.as_view(), name="index"),
     path('login/', views.LoginUser.as_view(), name="login"),
 # Vehicle section
+    path('fleet/', views.FleetDashboardView.as_view(), name="fleet_dashboard"),
     path('add_vehicle/', views.VehicleCreateView.as_view(), name="add_vehicle"),
-    path('vehicle/<str:vin_code>/', views.VehicleDetailView.as_view(), name="vehicle_detail"),
+    path('vehicle/<str:vin_code>/', vehicle_detail_view.as_view(), name="vehicle_detail"),
     path('edit_vehicle/<int:pk>/', views.VehicleEditView.as_view(), name="edit_vehicle"),
     path('delete_vehicle/<int:pk>/', views.VehicleDeleteView.as_view(), name="delete_vehicle"),
 # Work section
     path('add_work/<str:vin_code>/', views.WorkCreateView.as_view(), name="add_work"),
     path('edit_work/<int:pk>/', views.WorkEditView.as_view(), name="edit_work"),
     path('delete_work/<int:pk>/', views.WorkDeleteView.as_view(), name="delete_work"),
-    path('list_of_works/<str:vin_code>/', views.WorkListView.as_view(), name="list_of_works"),
+    path('list_of_works/<str:vin_code>/', work_list_view.as_view(), name="list_of_works"),
     path('work_detail/<int:pk>/', views.WorkDetailView.as_view(), name="work_detail"),
 # Event section
     path('add_event/<str:vin_code>/', views.EventCreateView.as_view(), name="add_event"),
     path('add_current_event/<str:vin_code>/<int:work_id>/', views.CurrentEventCreateView.as_view(), name="add_current_event"),
     path('edit_event/<int:pk>/', views.EventEditView.as_view(), name="edit_event"),
     path('delete_event/<int:pk>/', views.EventDeleteView.as_view(), name="delete_event"),
-    path('events_list/<str:vin_code>/', views.EventListView.as_view(), name="events_list"),
+    path('events_list/<str:vin_code>/', event_list_view.as_view(), name="events_list"),
     path('event_detail/<int:pk>/', views.EventDetailView.as_view(), name="event_detail"),
     path('event_by_type/<int:pk>/', views.EventListByTypeView.as_view(), name="event_by_type"),
 # Mileage events section
     path('add_mileage/<str:vin_code>/', views.MileageCreateView.as_view(), name="add_mileage"),
     path('edit_mileage/<int:pk>/', views.MileageEditView.as_view(), name="edit_mileage"),
     path('delete_mileage/<int:pk>/', views.MileageDeleteView.as_view(), name="delete_mileage"),
-    path('mileage_events_list/', views.MileageListView.as_view(), name="mileage_events_list"),
+    path('mileage_events_list/<str:vin_code>/', mileage_list_view.as_view(), name="mileage_events_list"),
+# Service section
+    path('schedule_cache_stats/', views.ScheduleCacheStatsView.as_view(), name="schedule_cache_stats"),
+# API section
+    path('api/schedule/<str:vin_code>/', views.VehicleScheduleApiView.as_view(), name="api_vehicle_schedule"),
+    path('api/plan/', views.MaintenancePlanApiView.as_view(), name="api_maintenance_plan"),
+    path('api/plan/<str:vin_code>/', views.MaintenancePlanApiView.as_view(), name="api_vehicle_maintenance_plan"),
+    path('api/vehicles/', views.VehicleOnboardingApiView.as_view(), name="api_onboard_vehicles"),
+    path('api/telematics/', views.TelematicsReadingsApiView.as_view(), name="api_telematics_readings"),
+    path('api/choices/vehicles/', views.VehicleChoicesApiView.as_view(), name="api_vehicle_choices"),
+    path('api/choices/works/', views.WorkChoicesApiView.as_view(), name="api_work_choices"),
+# Calendar section
+    path('calendar/<str:token>/maintenance.ics', views.CalendarFeedView.as_view(), name="calendar_feed"),
+    path('calendar/<str:token>/<str:vin_code>.ics', views.CalendarFeedView.as_view(), name="vehicle_calendar_feed"),
+# Export section
+    path('export/<str:export_format>/', views.HistoryExportView.as_view(), name="export_history"),
+    path('export/<str:export_format>/<str:vin_code>/', views.HistoryExportView.as_view(), name="export_vehicle_history"),
 ]
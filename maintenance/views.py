@@ -1,30 +1,83 @@
+import asyncio
+import json
+from dataclasses import asdict
 from mimetypes import init
 from typing import Any
 
-from django.contrib.auth.mixins import LoginRequiredMixin
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView
+from django.db.models import Count
 from django.db.models.query import QuerySet
+from django.http import (
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views import View
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.views.generic.list import ListView
 
 from maintenance.forms import (
+    EventEditForm,
     EventForm,
     MileageEventForm,
     VehicleForm,
     WorkForm,
 )
-from maintenance.mixins import SuccessUrlMixin, TitleMixin
+from maintenance.mixins import (
+    ApiTokenRequiredMixin,
+    AsyncListMixin,
+    AsyncLoginRequiredMixin,
+    KeysetPaginationMixin,
+    ReplicaReadMixin,
+    SuccessUrlMixin,
+    TitleMixin,
+)
 from maintenance.models import Event, MileageEvent, Vehicle, Work
+from maintenance.services.calendar_feed import (
+    get_cached_calendar,
+    get_calendar_owner_id,
+    get_calendar_token,
+    get_feed_etag,
+    get_feed_last_modified,
+)
+from maintenance.services.choices import (
+    get_choices_limit,
+    search_vehicle_choices,
+    search_work_choices,
+)
+from maintenance.services.exporter import (
+    EXPORT_FORMATS,
+    iter_history_records,
+)
 from maintenance.services.maintenance import (
     CURRENT_VIEW_OPTIONS,
-    get_average_mileage_interval,
-    get_counters_of_expired_events,
-    get_maintenance_limits,
-    get_outdate_mileage_level,
+    VehicleSchedule,
+    get_recent_events,
+)
+from maintenance.services.onboarding import VehicleOnboarder
+from maintenance.services.projection import (
+    MAX_PLAN_YEARS,
+    PLAN_YEARS,
+    get_maintenance_plan,
 )
+from maintenance.services.schedule_cache import (
+    get_cached_fleet_expired_events,
+    get_cached_schedule,
+    get_schedule_cache_stats,
+    get_schedule_etag,
+)
+from maintenance.services.serializers import serialize_plan, serialize_schedule
+from maintenance.services.statistics import get_work_statistics
+from maintenance.services.telematics import ingest_readings
 
 
 class LoginUser(TitleMixin, SuccessUrlMixin, LoginView):
@@ -65,41 +118,130 @@ class VehicleDeleteView(
     title = "Vehicle deletion"
 
 
-class VehicleListView(LoginRequiredMixin, TitleMixin, ListView):
+class VehicleListView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, ListView
+):
     model = Vehicle
     title = "Vehicle list"
 
+    def get_queryset(self) -> QuerySet[Any]:
+        # The cards are cached by the change versions, which also change
+        # with the events counters.
+        return (
+            super()
+            .get_queryset()
+            .filter(owner=self.request.user)
+            .annotate(events_count=Count("events"))
+            .only(
+                "vin_code",
+                "vehicle_manufacturer",
+                "vehicle_model",
+                "vehicle_body",
+                "vehicle_year",
+                "vehicle_mileage",
+                "change_version",
+            )
+            .order_by("pk")
+        )
+
+
+class AsyncVehicleListView(AsyncListMixin, VehicleListView):
+    pass
+
+
+class FleetDashboardView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, ListView
+):
+    model = Vehicle
+    title = "Fleet dashboard"
+    template_name = "maintenance/fleet_dashboard.html"
+
     def get_queryset(self) -> QuerySet[Any]:
         return super().get_queryset().filter(owner=self.request.user)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["fleet_expired_events"] = get_cached_fleet_expired_events(
+            self.object_list
+        )
+        context["calendar_url"] = self.request.build_absolute_uri(reverse(
+            "calendar_feed", args=[get_calendar_token(self.request.user.pk)]
+        ))
+        return context
+
+
+def get_vehicle_detail_context(
+    schedule: VehicleSchedule, recent_events: list[Event], events_count: int
+) -> dict[str, Any]:
+    return {
+        "planed_works": schedule.get_planed_works(
+            CURRENT_VIEW_OPTIONS.view_only_important
+        ),
+        "outdate_mileage_level": schedule.outdate_mileage_level,
+        "expired_events": schedule.expired_events,
+        "view_options": CURRENT_VIEW_OPTIONS,
+        "recent_events": recent_events,
+        "events_count": events_count,
+    }
 
-class VehicleDetailView(LoginRequiredMixin, TitleMixin, DetailView):
+
+class VehicleDetailView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, DetailView
+):
     model = Vehicle
     title = "Vehicle details"
 
     def get_object(self, queryset: QuerySet[Any] | None = None) -> Vehicle:
         return get_object_or_404(Vehicle, vin_code=self.kwargs["vin_code"])
 
+    def get_detail_context(self) -> dict[str, Any]:
+        return get_vehicle_detail_context(
+            get_cached_schedule(self.object),
+            list(get_recent_events(self.object)),
+            self.object.events.count(),
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context.update(
-            {
-                "planed_works": get_maintenance_limits(
-                    self.object.vin_code,
-                    CURRENT_VIEW_OPTIONS.view_only_important,
-                ),
-                "outdate_mileage_level": get_outdate_mileage_level(
-                    self.object.vin_code
-                ),
-                "expired_events": get_counters_of_expired_events(
-                    self.object.vin_code
-                ),
-                "view_options": CURRENT_VIEW_OPTIONS,
-            }
-        )
+        context.update(self.get_detail_context())
         return context
 
 
+class AsyncVehicleDetailView(AsyncLoginRequiredMixin, VehicleDetailView):
+    """
+    VehicleDetailView for ASGI. The schedule, the recent events and the
+    events counter are fetched concurrently, without holding a worker.
+    """
+
+    async def get(self, request, *args: Any, **kwargs: Any):
+        try:
+            self.object = await Vehicle.objects.aget(
+                vin_code=self.kwargs["vin_code"]
+            )
+        except Vehicle.DoesNotExist:
+            raise Http404("No vehicle found")
+
+        async def fetch_recent_events() -> list[Event]:
+            return [
+                event async for event in get_recent_events(self.object)
+            ]
+
+        schedule, recent_events, events_count = await asyncio.gather(
+            sync_to_async(get_cached_schedule)(self.object),
+            fetch_recent_events(),
+            self.object.events.acount(),
+        )
+        self.detail_context = get_vehicle_detail_context(
+            schedule, recent_events, events_count
+        )
+        return self.render_to_response(
+            self.get_context_data(object=self.object)
+        )
+
+    def get_detail_context(self) -> dict[str, Any]:
+        return self.detail_context
+
+
 class WorkCreateView(
     LoginRequiredMixin, TitleMixin, SuccessUrlMixin, CreateView
 ):
@@ -129,7 +271,9 @@ class WorkDeleteView(
     title = "Work deletion"
 
 
-class WorkListView(LoginRequiredMixin, TitleMixin, ListView):
+class WorkListView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, ListView
+):
     model = Work
     title = "List of works"
 
@@ -141,10 +285,19 @@ class WorkListView(LoginRequiredMixin, TitleMixin, ListView):
         )
 
 
+class AsyncWorkListView(AsyncListMixin, WorkListView):
+    pass
+
+
 class WorkDetailView(LoginRequiredMixin, TitleMixin, DetailView):
     model = Work
     title = "Work details"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["work_statistics"] = get_work_statistics(self.object.pk)
+        return context
+
 
 class EventCreateView(
     LoginRequiredMixin, TitleMixin, SuccessUrlMixin, CreateView
@@ -153,6 +306,9 @@ class EventCreateView(
     form_class = EventForm
     title = "Add new event"
 
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "owner": self.request.user}
+
     def get_initial(self):
         initial = super().get_initial()
         vehicle_instance = get_object_or_404(
@@ -185,17 +341,12 @@ class EventEditView(
     LoginRequiredMixin, TitleMixin, SuccessUrlMixin, UpdateView
 ):
     model = Event
-    fields = [
-        "vehicle",
-        "work_date",
-        "mileage",
-        "work",
-        "part_price",
-        "work_price",
-        "note",
-    ]
+    form_class = EventEditForm
     title = "Edit event data"
 
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "owner": self.request.user}
+
 
 class EventDeleteView(
     LoginRequiredMixin, SuccessUrlMixin, TitleMixin, DeleteView
@@ -204,27 +355,48 @@ class EventDeleteView(
     title = "Event deletion"
 
 
-class EventListView(LoginRequiredMixin, TitleMixin, ListView):
+class EventListView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, KeysetPaginationMixin,
+    ListView,
+):
     model = Event
     title = "Events list"
+    keyset_field = "work_date"
+    template_fields = (
+        "mileage", "part_price", "work_price", "work", "work__title",
+    )
 
     def get_queryset(self) -> QuerySet[Any]:
         return super().get_queryset().filter(
             vehicle__vin_code=self.kwargs['vin_code']
-        )
+        ).select_related("work")
+
+
+class AsyncEventListView(AsyncListMixin, EventListView):
+    pass
 
 
-class EventListByTypeView(LoginRequiredMixin, TitleMixin, ListView):
+class EventListByTypeView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, KeysetPaginationMixin,
+    ListView,
+):
     model = Event
     title = "Events list"
     template_name = "maintenance/event_list.html"
+    keyset_field = "work_date"
+    template_fields = EventListView.template_fields
 
     def get_queryset(self) -> QuerySet[Any]:
-        return super().get_queryset().filter(work__pk=self.kwargs.get("pk"))
+        return super().get_queryset().filter(
+            work__pk=self.kwargs.get("pk")
+        ).select_related("work")
 
     def get_context_data(self, **kwargs):
         content = super().get_context_data(**kwargs)
-        content["avg_mileage"] = get_average_mileage_interval(self.object_list)
+        work_statistics = get_work_statistics(self.kwargs.get("pk"))
+        if work_statistics is None:
+            raise Http404("No work found")
+        content["work_statistics"] = work_statistics
         return content
 
 
@@ -264,6 +436,258 @@ class MileageDeleteView(
     title = "Mileage event deletion"
 
 
-class MileageListView(LoginRequiredMixin, TitleMixin, ListView):
+class MileageListView(
+    LoginRequiredMixin, ReplicaReadMixin, TitleMixin, KeysetPaginationMixin,
+    ListView,
+):
     model = MileageEvent
     title = "Mileage Events list"
+    keyset_field = "mileage_date"
+    template_fields = (
+        "mileage",
+        "period",
+        "first_date",
+        "min_mileage",
+        "readings_number",
+        "vehicle",
+        "vehicle__vehicle_manufacturer",
+        "vehicle__vehicle_model",
+        "vehicle__vehicle_body",
+        "vehicle__vehicle_year",
+    )
+
+    def get_queryset(self) -> QuerySet[Any]:
+        return (
+            super()
+            .get_queryset()
+            .filter(vehicle__vin_code=self.kwargs["vin_code"])
+            .select_related("vehicle")
+        )
+
+
+class AsyncMileageListView(AsyncListMixin, MileageListView):
+    pass
+
+
+class HistoryExportView(LoginRequiredMixin, View):
+    def get(self, request, *args: Any, **kwargs: Any):
+        export_format = self.kwargs["export_format"]
+        if export_format not in EXPORT_FORMATS:
+            raise Http404("Unknown export format")
+        iter_lines, content_type = EXPORT_FORMATS[export_format]
+
+        vehicles = Vehicle.objects.filter(owner=request.user)
+        file_name = f"history_{request.user.username}"
+        if "vin_code" in self.kwargs:
+            vehicle = get_object_or_404(
+                vehicles, vin_code=self.kwargs["vin_code"]
+            )
+            vehicles = vehicles.filter(pk=vehicle.pk)
+            file_name = f"history_{vehicle.vin_code}"
+
+        response = StreamingHttpResponse(
+            iter_lines(iter_history_records(vehicles)),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{file_name}.{export_format}"'
+        )
+        return response
+
+
+class ScheduleCacheStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args: Any, **kwargs: Any):
+        return JsonResponse(get_schedule_cache_stats())
+
+
+class VehicleScheduleApiView(ApiTokenRequiredMixin, ReplicaReadMixin, View):
+    """
+    Schedule of the vehicle as JSON. Clients revalidate it by the ETag,
+    which changes with the vehicle change version and the date, so an
+    unchanged schedule costs a single query and no computation. Polling
+    clients authenticate by API tokens, browsers by the session.
+    """
+    allow_session = True
+
+    def get(self, request, *args: Any, **kwargs: Any):
+        vehicle = get_object_or_404(
+            Vehicle, owner=request.user, vin_code=self.kwargs["vin_code"]
+        )
+        etag = get_schedule_etag(vehicle, timezone.now().date())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            schedule = get_cached_schedule(vehicle)
+            response = JsonResponse(serialize_schedule(schedule))
+            etag = get_schedule_etag(vehicle, schedule.current_date)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class VehicleChoicesApiView(LoginRequiredMixin, View):
+    """
+    Vehicles of the user for the autocomplete selects, searched by the VIN
+    prefix.
+    """
+    raise_exception = True
+
+    def get(self, request, *args: Any, **kwargs: Any):
+        results = search_vehicle_choices(
+            request.user,
+            request.GET.get("q", ""),
+            get_choices_limit(request.GET.get("limit")),
+        )
+        return JsonResponse({"results": results})
+
+
+class WorkChoicesApiView(LoginRequiredMixin, View):
+    """
+    Works of a vehicle of the user for the autocomplete selects, searched
+    by the title prefix.
+    """
+    raise_exception = True
+
+    def get(self, request, *args: Any, **kwargs: Any):
+        try:
+            vehicle_id = int(request.GET["vehicle"])
+        except (KeyError, ValueError):
+            return JsonResponse({"error": "a vehicle is expected"},
+                                status=400)
+        results = search_work_choices(
+            request.user,
+            vehicle_id,
+            request.GET.get("q", ""),
+            get_choices_limit(request.GET.get("limit")),
+        )
+        return JsonResponse({"results": results})
+
+
+class MaintenancePlanApiView(LoginRequiredMixin, ReplicaReadMixin, View):
+    """
+    Expected works and their costs per month for the given number of years
+    of the fleet of the user or of one vehicle.
+    """
+    raise_exception = True
+
+    def get(self, request, *args: Any, **kwargs: Any):
+        try:
+            years = int(request.GET.get("years", PLAN_YEARS))
+        except ValueError:
+            years = 0
+        if not 1 <= years <= MAX_PLAN_YEARS:
+            return JsonResponse(
+                {"error": f"years must be from 1 to {MAX_PLAN_YEARS}"},
+                status=400,
+            )
+        vehicles = Vehicle.objects.filter(owner=request.user)
+        if "vin_code" in self.kwargs:
+            vehicles = [
+                get_object_or_404(vehicles, vin_code=self.kwargs["vin_code"])
+                .pk
+            ]
+        plan = get_maintenance_plan(vehicles, years)
+        return JsonResponse(serialize_plan(plan))
+
+
+class CalendarFeedView(ReplicaReadMixin, View):
+    """
+    iCalendar of the planed works of the vehicles of the token owner or of
+    one of them. Calendar clients poll it without a session, an unchanged
+    feed costs a single query and no schedule computation.
+    """
+    def get(self, request, *args: Any, **kwargs: Any):
+        owner_id = get_calendar_owner_id(self.kwargs["token"])
+        if owner_id is None:
+            raise Http404
+        vehicles = Vehicle.objects.filter(owner_id=owner_id)
+        vin_code = self.kwargs.get("vin_code")
+        if vin_code:
+            vehicles = vehicles.filter(vin_code=vin_code)
+        vehicles = list(vehicles)
+        if vin_code and not vehicles:
+            raise Http404
+
+        current_date = timezone.now().date()
+        etag = get_feed_etag(vehicles, current_date)
+        last_modified = get_feed_last_modified(vehicles, current_date)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            if vin_code:
+                scope, name = f"vehicle:{vehicles[0].pk}", str(vehicles[0])
+            else:
+                scope, name = f"owner:{owner_id}", "Vehicle maintenance"
+            response = HttpResponse(
+                get_cached_calendar(scope, name, vehicles, current_date),
+                content_type="text/calendar; charset=utf-8",
+            )
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class VehicleOnboardingApiView(ApiTokenRequiredMixin, View):
+    """
+    Creates the vehicles of the JSON list for the user with their works
+    from the patterns by a few bulk queries. Invalid records are reported
+    by their positions, the valid ones are created anyway.
+    """
+
+    def post(self, request, *args: Any, **kwargs: Any):
+        try:
+            records = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"error": "invalid JSON"}, status=400)
+        if not isinstance(records, list):
+            return JsonResponse(
+                {"error": "a list of vehicles is expected"}, status=400
+            )
+
+        errors = []
+        onboarder = VehicleOnboarder(
+            request.user,
+            on_error=lambda position, message: errors.append(
+                {"position": position, "error": message}
+            ),
+        )
+        report = onboarder.run(enumerate(records))
+        return JsonResponse(
+            {**asdict(report), "errors": errors},
+            status=201 if report.vehicles_created else 200,
+        )
+
+
+class TelematicsReadingsApiView(ApiTokenRequiredMixin, View):
+    """
+    Stores the JSON list of odometer readings of the user vehicles and
+    advances their mileages. Invalid readings are reported by their
+    positions, the valid ones are stored anyway.
+    """
+
+    def post(self, request, *args: Any, **kwargs: Any):
+        try:
+            readings = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"error": "invalid JSON"}, status=400)
+        if not isinstance(readings, list):
+            return JsonResponse(
+                {"error": "a list of readings is expected"}, status=400
+            )
+
+        errors = []
+        report = ingest_readings(
+            Vehicle.objects.filter(owner=request.user),
+            enumerate(readings),
+            on_error=lambda position, message: errors.append(
+                {"position": position, "error": message}
+            ),
+        )
+        return JsonResponse(
+            {**asdict(report), "errors": errors},
+            status=201 if report.readings_stored else 200,
+        )
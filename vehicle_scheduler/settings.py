@@ -13,6 +13,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 
 from pathlib import Path
+from typing import Any
+
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'maintenance.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,14 +81,101 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'vehicle_scheduler.wsgi.application'
 
+# Serve the detail and list pages by the async views, for ASGI servers.
+ASYNC_VIEWS = int(os.environ.get('ASYNC_VIEWS', default=0))
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# The default SQLite database runs in WAL mode with IMMEDIATE transactions,
+# SQLITE_TUNING=0 leaves the SQLite defaults. DB_ENGINE=mysql switches to
+# the MariaDB/MySQL server given by the DB_* variables.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+DATABASE: dict[str, Any]
+if DB_ENGINE == 'sqlite':
+    DATABASE = {
+        'ENGINE': 'vehicle_scheduler.sqlite3',
+        'NAME': os.environ.get(
+            'DB_NAME', os.path.join(BASE_DIR, 'db', 'db.sqlite3')
+        ),
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': int(
+                    os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)
+                ),
+                'mmap_size': int(
+                    os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+                ),
+                # Negative cache size is in KiB.
+                'cache_size': -int(
+                    os.environ.get('SQLITE_CACHE_SIZE_KB', 20000)
+                ),
+            },
+        },
+    }
+    if not int(os.environ.get('SQLITE_TUNING', default=1)):
+        DATABASE['ENGINE'] = 'django.db.backends.sqlite3'
+        DATABASE['OPTIONS'] = {}
+elif DB_ENGINE == 'mysql':
+    DATABASE = {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': os.environ.get('DB_NAME', 'vehicle_scheduler'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'OPTIONS': {
+            'charset': 'utf8mb4',
+        },
+    }
+else:
+    raise ImproperlyConfigured(f'Unknown DB_ENGINE {DB_ENGINE!r}.')
+
+# Persistent connections, checked before reuse in every request.
+DATABASE['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DATABASE['CONN_HEALTH_CHECKS'] = True
+
+DATABASES: dict[str, dict[str, Any]] = {
+    'default': DATABASE,
+}
+
+# The list and schedule reads go to the replica when DB_REPLICA_HOST or
+# DB_REPLICA_NAME is set.
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASE,
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASE['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASE.get('HOST', '')),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    DATABASE_ROUTERS = ['maintenance.routers.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db', 'db.sqlite3'),
+        'BACKEND': CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+        },
     }
 }
 
@@ -148,5 +239,51 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 USE_X_FORWARDED_HOST = True
 USE_X_FORWARDED_PORT = True
 
+# Request metrics
+# Requests slower than SLOW_REQUEST_MS are logged as warnings with their SQL
+# queries, the others at DEBUG level, set REQUEST_LOG_LEVEL=DEBUG to see them.
+
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SERVER_TIMING_HEADER = int(os.environ.get('SERVER_TIMING_HEADER', 1))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'maintenance.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Email of the maintenance alert digests
+
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend'
+)
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL',
+                                    'webmaster@localhost')
+
+# Mileage readings retention
+# Raw readings older than MILEAGE_RAW_RETENTION_DAYS are compacted into
+# daily rows, daily rows older than MILEAGE_DAILY_RETENTION_DAYS into
+# monthly rows.
+
+MILEAGE_RAW_RETENTION_DAYS = int(
+    os.environ.get('MILEAGE_RAW_RETENTION_DAYS', 90)
+)
+MILEAGE_DAILY_RETENTION_DAYS = int(
+    os.environ.get('MILEAGE_DAILY_RETENTION_DAYS', 730)
+)
+
 WARNING_OUTDATE_LEVEL = 7
 OLD_OUTDATE_LEVEL = 30
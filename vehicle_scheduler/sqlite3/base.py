@@ -0,0 +1,32 @@
+"""
+SQLite backend of the production profile. The PRAGMAS option is applied
+to every new connection. The TRANSACTION_MODE option, as in Django 5.1,
+starts the transactions by BEGIN IMMEDIATE, so a transaction which reads
+before writing waits for the write lock by the busy timeout instead of
+failing with "database is locked" when it upgrades its lock.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # The options of the backend are not sqlite3.connect() arguments.
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        transaction_mode = self.settings_dict['OPTIONS'].get(
+            'transaction_mode'
+        )
+        if transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {transaction_mode}')